@@ -0,0 +1,18 @@
+"""Benchmarks, each run as a module from the backend directory
+
+Importing the app's models opens the database named by DATABASE_URL
+(./relationship_graph.db by default), creating its schema and search index and
+switching it to WAL. So benchmarks parse their arguments and call
+use_database() first, and only then import models or run.
+"""
+import os
+from argparse import ArgumentParser
+from typing import Optional
+
+
+def use_database(parser: ArgumentParser, database: Optional[str] = None):
+    """Point DATABASE_URL at `database`, or keep the one already set; exits through `parser` if there is neither"""
+    if database:
+        os.environ["DATABASE_URL"] = f"sqlite:///{database}"
+    elif not os.environ.get("DATABASE_URL"):
+        parser.error("pass --database or set DATABASE_URL; importing the app's models opens that database")
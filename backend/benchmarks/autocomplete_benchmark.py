@@ -0,0 +1,125 @@
+"""Time typeahead lookups and updates on the in-memory name index, and measure its memory
+
+Run from the backend directory:
+
+    python -m benchmarks.autocomplete_benchmark --sizes 100000 1000000
+
+Names are generated like benchmarks.synthetic names them (two to four Zipf-
+distributed words, institutions with a kind, methods ending in "Method"), and
+degrees follow a Pareto distribution, so a few nodes are hubs. Lookups replay
+names being typed one character at a time, first against an empty cache of
+common-prefix rankings and then again; typo lookups change one character of a
+word. Memory is what tracemalloc attributes to the index, not counting the node
+id strings it shares with the adjacency index.
+"""
+import argparse
+import random
+import statistics
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+
+from benchmarks.synthetic import INSTITUTION_KINDS, NODE_TYPES, SyntheticGraph
+from graph.autocomplete import NameIndex
+
+TYPED_NAMES = 300
+TYPO_QUERIES = 300
+WRITES = 2000
+
+
+def generate(size: int, seed: int) -> Tuple[List[Tuple[str, str]], Dict[str, int]]:
+    graph = SyntheticGraph(1000, seed)  # only its vocabulary is used
+    rng = random.Random(seed)
+    names, degrees = [], {}
+    for i in range(size):
+        node_type = rng.choices([t for t, _, _ in NODE_TYPES], [share for _, _, share in NODE_TYPES])[0]
+        if node_type == "Institutions":
+            name = f"{graph.title(rng, 2)} {rng.choice(INSTITUTION_KINDS)}"
+        elif node_type == "Methods":
+            name = f"{graph.title(rng, 2)} Method"
+        else:
+            name = graph.title(rng, 2 if node_type == "People" else rng.randint(1, 4))
+        node_id = f"N{i:07d}"
+        names.append((node_id, name))
+        degrees[node_id] = int(rng.paretovariate(1.2)) - 1
+    return names, degrees
+
+
+def typo(rng: random.Random, name: str) -> str:
+    words = name.split()
+    index = max(range(len(words)), key=lambda i: len(words[i]))
+    word = words[index]
+    if len(word) < 4:
+        return name
+    position = rng.randrange(1, len(word) - 1)
+    words[index] = word[:position] + word[position + 1] + word[position] + word[position + 2:]
+    return " ".join(words)
+
+
+def percentiles(samples: List[float]) -> str:
+    ordered = sorted(samples)
+    pick = lambda p: ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+    return f"p50 {pick(50):7.3f} ms   p99 {pick(99):7.3f} ms   max {ordered[-1] * 1000:7.3f} ms"
+
+
+def timed(calls) -> List[float]:
+    samples = []
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run(size: int, seed: int):
+    names, degrees = generate(size, seed)
+    index = NameIndex(lambda node_id: degrees.get(node_id, 0))
+
+    # Built twice, as tracing slows the build down
+    tracemalloc.start()
+    index.load(names)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    index.load(names)
+    build = time.perf_counter() - start
+
+    rng = random.Random(seed)
+    typed = [name for _, name in rng.sample(names, TYPED_NAMES)]
+    keystrokes = [name[:end] for name in typed for end in range(1, len(name) + 1)]
+    cold = timed(lambda q=q: index.complete(q, 10) for q in keystrokes)
+    warm = timed(lambda q=q: index.complete(q, 10) for q in keystrokes)
+    typos = [typo(rng, name) for _, name in rng.sample(names, TYPO_QUERIES)]
+    fuzzy = timed(lambda q=q: index.complete(q, 10) for q in typos)
+    found = sum(1 for q in typos if index.complete(q, 10))
+
+    def write(i: int):
+        node_id, name = names[rng.randrange(size)]
+        if i % 2:
+            index.upsert(node_id, name + " Renamed")
+        else:
+            degrees[node_id] += 1
+            index.degree_changed(node_id, grew=True)
+    writes = timed(lambda i=i: write(i) for i in range(WRITES))
+
+    print(f"\n{size} names, {len(index.suffixes)} suffixes, {len(index.words)} distinct words")
+    print(f"  build            {build:.1f} s, peak {peak / 1e6:.0f} MB while building")
+    print(f"  memory           {current / 1e6:.0f} MB ({current / size:.0f} bytes per name)")
+    print(f"  typing (cold)    {percentiles(cold)}   {len(keystrokes)} keystrokes")
+    print(f"  typing (warm)    {percentiles(warm)}   {len(index.top)} common prefixes cached")
+    print(f"  one typo         {percentiles(fuzzy)}   {found}/{len(typos)} with suggestions")
+    print(f"  writes           {percentiles(writes)}   renames and degree changes")
+    print(f"  mean keystroke   {statistics.mean(warm) * 1000:.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,493 @@
+"""Drive every API endpoint against a synthetic graph, in-process and through uvicorn
+
+Run from the backend directory:
+
+    DATABASE_URL=sqlite:////tmp/scratch.db python -m benchmarks.endpoint_benchmark --nodes 10000
+    DATABASE_URL=sqlite:////tmp/scratch.db python -m benchmarks.endpoint_benchmark --nodes 100000 --modes uvicorn --compare endpoints-<commit>-100000.json
+
+One graph is generated with benchmarks/synthetic.py (or taken from
+--database) and every mode gets its own copy of it, served from its own
+process: `inprocess` calls the app through TestClient, `uvicorn` starts a
+server and calls it over HTTP. Peak RSS is that process's high-water mark
+(for `inprocess` it includes the client).
+
+Read scenarios run first. Each one sends a single untimed request (reported as
+`first_ms`, the cold-cache latency) before the timed ones. Then the write
+scenarios create, update and delete their own nodes and links, bulk-import a
+few small batches and time how long a write takes to reach an /api/events
+subscriber. `/api/initialise-data` is not driven because it replaces the graph.
+
+Results are written as JSON together with the commit they were measured at;
+pass an earlier file to --compare to print the latency ratios against it. The
+exit status is 1 when any scenario's p95 grew by more than --threshold.
+"""
+import argparse
+import base64
+import json
+import math
+import os
+import platform
+import random
+import resource
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing, contextmanager
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from benchmarks import use_database
+from benchmarks.synthetic import DOMAIN_WORDS, write_database
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ("inprocess", "uvicorn")
+PERCENTILES = (50, 95, 99)
+# Node and link ids sampled from the graph for the per-entity scenarios
+SAMPLE_SIZE = 1000
+BULK_BATCH_SIZE = 100
+# Ids per /api/nodes:batchGet call and links per /api/links:batch call
+BATCH_SIZE = 50
+
+
+class Call(NamedTuple):
+    method: str
+    url: str
+    kwargs: dict = {}
+    # ("node" | "link", id) recorded once the call succeeds, for the scenarios that follow
+    creates: Optional[Tuple[str, str]] = None
+
+
+class Workload:
+    """Builds the calls of each scenario from sampled ids and the entities created so far"""
+
+    def __init__(self, node_ids: List[str], link_ids: List[str], seed: int):
+        self.rng = random.Random(seed)
+        self.node_ids = node_ids
+        self.link_ids = link_ids
+        self.created = {"node": [], "link": []}
+
+    def node_id(self) -> str:
+        return self.rng.choice(self.node_ids)
+
+    def cursor(self, ids: List[str]) -> str:
+        """A page cursor starting after a random sampled id, encoded like run.encode_cursor"""
+        return base64.urlsafe_b64encode(json.dumps([self.rng.choice(ids)]).encode()).decode()
+
+    def created_node(self, i: int) -> str:
+        return self.created["node"][i % len(self.created["node"])]
+
+    def node_body(self, i: int) -> dict:
+        return {"name": f"Benchmark Person {i}", "type": "People",
+                "bio": " ".join(self.rng.choices(DOMAIN_WORDS, k=60))}
+
+
+def create_node(w: Workload, i: int) -> Call:
+    node_id = f"BENCH-N{i:07d}"
+    return Call("POST", "/api/nodes", {"json": {"id": node_id, **w.node_body(i)}}, ("node", node_id))
+
+
+def create_link(w: Workload, i: int) -> Call:
+    link_id = f"BENCH-L{i:07d}"
+    body = {"id": link_id, "source_id": w.created_node(i), "target_id": w.node_id(),
+            "relationship_type": "collaborates_with", "strength": round(w.rng.random(), 2)}
+    return Call("POST", "/api/links", {"json": body}, ("link", link_id))
+
+
+def create_links(w: Workload, i: int) -> Call:
+    """Links from one created node to distinct sampled nodes
+
+    Their relationship type differs from create_link's, so no two links share
+    endpoints and type.
+    """
+    source_id = w.created_node(i)
+    links = [{"id": f"BENCH-LB{i:05d}-{j:03d}", "source_id": source_id, "target_id": target_id,
+              "relationship_type": "develops", "strength": round(w.rng.random(), 2)}
+             for j, target_id in enumerate(w.rng.sample(w.node_ids, min(BATCH_SIZE, len(w.node_ids))))]
+    return Call("POST", "/api/links:batch", {"json": {"links": links}})
+
+
+def bulk(w: Workload, i: int) -> Call:
+    rows = [{"id": f"BENCH-B{i:05d}-{j:03d}", **w.node_body(j)} for j in range(BULK_BATCH_SIZE)]
+    body = "".join(json.dumps(row) + "\n" for row in rows).encode()
+    return Call("POST", "/api/bulk", {"files": {"nodes": ("nodes.jsonl", body, "application/x-ndjson")}})
+
+
+# Scenario name -> builder of its i-th call, in the order they run; reads first
+SCENARIOS: Dict[str, Callable[[Workload, int], Call]] = {
+    "root": lambda w, i: Call("GET", "/"),
+    "graph_data": lambda w, i: Call("GET", "/api/graph-data"),
+    "graph_data_summary": lambda w, i: Call("GET", "/api/graph-data?view=summary"),
+    "graph_data_msgpack": lambda w, i: Call("GET", "/api/graph-data", {"headers": {
+        "Accept": "application/x-msgpack", "Accept-Encoding": "br"}}),
+    "graph_data_layout": lambda w, i: Call("GET", "/api/graph-data?layout=true"),
+    "graph_data_stream": lambda w, i: Call("GET", "/api/graph-data/stream"),
+    "nodes_page": lambda w, i: Call("GET", f"/api/nodes?limit=100&after={w.cursor(w.node_ids)}"),
+    "nodes_by_type": lambda w, i: Call("GET", "/api/nodes?node_type=Methods&limit=100"),
+    "nodes_page_summary": lambda w, i: Call("GET", f"/api/nodes?limit=100&view=summary&after={w.cursor(w.node_ids)}"),
+    "node": lambda w, i: Call("GET", f"/api/nodes/{w.node_id()}"),
+    "nodes_batch_get": lambda w, i: Call("POST", "/api/nodes:batchGet", {"json": {
+        "ids": w.rng.sample(w.node_ids, min(BATCH_SIZE, len(w.node_ids)))}}),
+    "node_metrics": lambda w, i: Call("GET", f"/api/nodes/{w.node_id()}?metrics=true"),
+    "neighbors": lambda w, i: Call("GET", f"/api/nodes/{w.node_id()}/neighbors"),
+    "subgraph": lambda w, i: Call("GET", f"/api/nodes/{w.node_id()}/subgraph?depth=2"),
+    "path": lambda w, i: Call("GET", f"/api/path?from={w.node_id()}&to={w.node_id()}"),
+    "path_weighted_k3": lambda w, i: Call("GET", f"/api/path?from={w.node_id()}&to={w.node_id()}&weighted=true&k=3"),
+    "links_page": lambda w, i: Call("GET", f"/api/links?limit=100&after={w.cursor(w.link_ids)}"),
+    "search": lambda w, i: Call("GET", f"/api/search?q={w.rng.choice(DOMAIN_WORDS)}&limit=20"),
+    "search_summary": lambda w, i: Call("GET", f"/api/search?q={w.rng.choice(DOMAIN_WORDS)}&limit=20&view=summary"),
+    "analytics": lambda w, i: Call("GET", "/api/analytics"),
+    "changes": lambda w, i: Call("GET", "/api/changes?since=0"),
+    "create_node": create_node,
+    "update_node": lambda w, i: Call("PUT", f"/api/nodes/{w.created_node(i)}", {"json": w.node_body(i)}),
+    "create_link": create_link,
+    "create_links": create_links,
+    "delete_link": lambda w, i: Call("DELETE", f"/api/links/{w.created['link'][i]}"),
+    "delete_node": lambda w, i: Call("DELETE", f"/api/nodes/{w.created['node'][i]}"),
+    "bulk": bulk,
+    "events": create_node,
+}
+WRITE_SCENARIOS = {
+    "create_node", "update_node", "create_link", "create_links", "delete_link", "delete_node", "bulk", "events"
+}
+# Scenarios that consume what an earlier one created, and how many calls they can make
+CONSUMERS = {
+    "update_node": "node", "create_link": "node", "create_links": "node", "delete_link": "link", "delete_node": "node"
+}
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def summarize(latencies: List[float], errors: int, sizes: int, seconds: float, first: Optional[float]) -> dict:
+    ordered = sorted(latencies)
+    stats = {"requests": len(ordered), "errors": errors, "first_ms": first}
+    if ordered:
+        for p in PERCENTILES:
+            stats[f"p{p}_ms"] = round(percentile(ordered, p) * 1000, 3)
+        stats["mean_ms"] = round(sum(ordered) / len(ordered) * 1000, 3)
+        stats["max_ms"] = round(ordered[-1] * 1000, 3)
+        stats["throughput_rps"] = round(len(ordered) / seconds, 1)
+        stats["mean_bytes"] = sizes // len(ordered)
+    return stats
+
+
+def measure(send, calls: List[Call], concurrency: int, max_seconds: float) -> Tuple[dict, List[Call]]:
+    """Send `calls` from `concurrency` threads until done or out of time; returns stats and the calls that succeeded"""
+    latencies, succeeded = [], []
+    errors = sizes = 0
+    pending = iter(calls)
+    lock = threading.Lock()
+    start = time.perf_counter()
+    deadline = start + max_seconds
+
+    def worker():
+        nonlocal errors, sizes
+        while True:
+            with lock:
+                call = next(pending, None) if time.perf_counter() < deadline else None
+            if call is None:
+                return
+            began = time.perf_counter()
+            status, size = send(call)
+            elapsed = time.perf_counter() - began
+            with lock:
+                latencies.append(elapsed)
+                sizes += size
+                if status < 400:
+                    succeeded.append(call)
+                else:
+                    errors += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, errors, sizes, time.perf_counter() - start, None), succeeded
+
+
+def measure_events(send, subscribe, calls: List[Call], max_seconds: float) -> Tuple[dict, List[Call]]:
+    """Time from sending each write until its event arrives on an /api/events subscription"""
+    latencies, succeeded = [], []
+    errors = sizes = 0
+    start = time.perf_counter()
+    with subscribe("/api/events") as receive:
+        for call in calls:
+            if time.perf_counter() > start + max_seconds:
+                break
+            began = time.perf_counter()
+            status, size = send(call)
+            if status >= 400:
+                errors += 1
+                continue
+            while receive().get("id") != call.creates[1]:
+                pass
+            latencies.append(time.perf_counter() - began)
+            sizes += size
+            succeeded.append(call)
+    return summarize(latencies, errors, sizes, time.perf_counter() - start, None), succeeded
+
+
+def wait_for_background(send, path: str, timeout: float):
+    """/api/analytics and layout=true answer 503 until their first background run finishes"""
+    deadline = time.monotonic() + timeout
+    while send(Call("GET", path))[0] == 503 and time.monotonic() < deadline:
+        time.sleep(0.5)
+
+
+def drive(send, subscribe, workload: Workload, options) -> Dict[str, dict]:
+    results = {}
+    if {"analytics", "node_metrics"} & set(options.scenarios):
+        wait_for_background(send, "/api/analytics", options.analytics_timeout)
+    if "graph_data_layout" in options.scenarios:
+        wait_for_background(send, "/api/graph-data?layout=true", options.analytics_timeout)
+    for name in options.scenarios:
+        build = SCENARIOS[name]
+        count = options.requests
+        if name in CONSUMERS:
+            count = min(count, len(workload.created[CONSUMERS[name]]))
+        elif name == "bulk":
+            count = min(count, options.bulk_batches)
+        # Ids are numbered per scenario, so offset the second batch of created nodes
+        offset = options.requests if name == "events" else 0
+        calls = [build(workload, offset + i) for i in range(count)]
+        first = None
+        if name not in WRITE_SCENARIOS and calls:
+            began = time.perf_counter()
+            send(calls[0])
+            first = round((time.perf_counter() - began) * 1000, 3)
+        if name == "events":
+            if subscribe is None:
+                results[name] = {"skipped": "no WebSocket client installed (pip install websockets)"}
+                print(f"  {name:<20}skipped: {results[name]['skipped']}", flush=True)
+                continue
+            stats, succeeded = measure_events(send, subscribe, calls, options.max_seconds)
+        else:
+            stats, succeeded = measure(send, calls, options.concurrency, options.max_seconds)
+        stats["first_ms"] = first
+        for call in succeeded:
+            if call.creates:
+                workload.created[call.creates[0]].append(call.creates[1])
+        if name == "delete_link":
+            workload.created["link"] = []
+        elif name == "delete_node":
+            workload.created["node"] = []
+        results[name] = stats
+        print(f"  {name:<20}{stats.get('p50_ms', 0):>10.2f}{stats.get('p95_ms', 0):>10.2f}"
+              f"{stats.get('p99_ms', 0):>10.2f}{stats.get('throughput_rps', 0):>10.1f}{stats['errors']:>8}", flush=True)
+    return results
+
+
+def sender(client):
+    def send(call: Call) -> Tuple[int, int]:
+        response = client.request(call.method, call.url, **call.kwargs)
+        return response.status_code, len(response.content)
+    return send
+
+
+def peak_rss_mb(usage) -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return round(usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_inprocess(workload: Workload, options) -> dict:
+    started = time.perf_counter()
+    import run
+    from fastapi.testclient import TestClient
+
+    with TestClient(run.app) as client:
+        startup = time.perf_counter() - started
+
+        @contextmanager
+        def subscribe(path: str):
+            with client.websocket_connect(path) as websocket:
+                yield websocket.receive_json
+
+        scenarios = drive(sender(client), subscribe, workload, options)
+    return {"startup_seconds": round(startup, 2), "peak_rss_mb": peak_rss_mb(resource.getrusage(resource.RUSAGE_SELF)),
+            "scenarios": scenarios}
+
+
+def free_port() -> int:
+    with closing(socket.socket()) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_uvicorn(workload: Workload, options) -> dict:
+    import httpx
+
+    port = free_port()
+    command = [sys.executable, "-m", "uvicorn", "run:app", "--host", "127.0.0.1", "--port", str(port),
+               "--log-level", "warning"]
+    started = time.perf_counter()
+    server = subprocess.Popen(command, cwd=BACKEND_DIR)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+            while True:
+                if server.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with status {server.returncode}")
+                try:
+                    client.get("/")
+                    break
+                except httpx.TransportError:
+                    if time.perf_counter() - started > options.startup_timeout:
+                        raise
+                    time.sleep(0.2)
+            startup = time.perf_counter() - started
+            scenarios = drive(sender(client), websocket_subscriber(port), workload, options)
+    finally:
+        server.terminate()
+        server.wait()
+    # The server is this process's only child, so the children's high-water mark is the server's
+    return {"startup_seconds": round(startup, 2), "peak_rss_mb": peak_rss_mb(resource.getrusage(resource.RUSAGE_CHILDREN)),
+            "scenarios": scenarios}
+
+
+def websocket_subscriber(port: int):
+    try:
+        from websockets.sync.client import connect
+    except ImportError:
+        return None
+
+    @contextmanager
+    def subscribe(path: str):
+        with connect(f"ws://127.0.0.1:{port}{path}") as websocket:
+            yield lambda: json.loads(websocket.recv())
+    return subscribe
+
+
+def run_mode(mode: str, workload: Workload, options) -> dict:
+    """Entry point of the per-mode process, which inherits DATABASE_URL pointing at its copy"""
+    print(f"\n{mode}\n  {'scenario':<20}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'errors':>8}", flush=True)
+    if mode == "inprocess":
+        return run_inprocess(workload, options)
+    return run_uvicorn(workload, options)
+
+
+def copy_database(source: str, target: str):
+    """Copy through the backup API so a database in WAL mode is copied consistently"""
+    with closing(sqlite3.connect(source)) as src, closing(sqlite3.connect(target)) as dst:
+        src.backup(dst)
+
+
+def sample_ids(database: str, table: str, count: int, rng: random.Random) -> List[str]:
+    with closing(sqlite3.connect(database)) as conn:
+        top = conn.execute(f"SELECT coalesce(max(rowid), 0) FROM {table}").fetchone()[0]
+        rowids = rng.sample(range(1, top + 1), min(count, top))
+        placeholders = ",".join("?" * len(rowids))
+        return [row[0] for row in conn.execute(f"SELECT id FROM {table} WHERE rowid IN ({placeholders})", rowids)]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(["git", "diff", "--quiet", "HEAD"], cwd=BACKEND_DIR).returncode != 0
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-dirty" if dirty else commit
+
+
+def compare(previous: dict, current: dict, threshold: float) -> int:
+    """Print p50/p95 ratios against an earlier result; returns the number of regressions"""
+    print(f"\nCompared with {previous.get('commit')} ({previous['dataset']['nodes']} nodes); ratio > 1 is slower")
+    print(f"{'mode':<11}{'scenario':<20}{'p50 ratio':>11}{'p95 ratio':>11}")
+    regressions = 0
+    for mode, result in current["modes"].items():
+        before = previous["modes"].get(mode, {}).get("scenarios", {})
+        for name, stats in result["scenarios"].items():
+            old = before.get(name, {})
+            if "p50_ms" not in stats or "p50_ms" not in old:
+                continue
+            p50, p95 = stats["p50_ms"] / old["p50_ms"], stats["p95_ms"] / old["p95_ms"]
+            flag = "  regression" if p95 > threshold else ""
+            regressions += bool(flag)
+            print(f"{mode:<11}{name:<20}{p50:>11.2f}{p95:>11.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=10000, help="Size of the generated graph")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--database", help="Benchmark a copy of this database instead of generating one")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200, help="Timed requests per scenario")
+    parser.add_argument("--max-seconds", type=float, default=20, help="Time limit per scenario")
+    parser.add_argument("--concurrency", type=int, default=4, help="Client threads per scenario (events uses one)")
+    parser.add_argument("--bulk-batches", type=int, default=10, help=f"Bulk imports of {BULK_BATCH_SIZE} nodes")
+    parser.add_argument("--analytics-timeout", type=float, default=600, help="Wait for the first analytics and layout")
+    parser.add_argument("--startup-timeout", type=float, default=600)
+    parser.add_argument("--out", help="Result file (default: endpoints-<commit>-<nodes>.json)")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="p95 ratio reported as a regression")
+    args = parser.parse_args()
+    if args.database is None:
+        use_database(parser)  # generating the graph imports the app's models
+    args.scenarios = [name for name in SCENARIOS if name in args.scenarios]
+
+    commit = git_commit()
+    with tempfile.TemporaryDirectory() as directory:
+        source = args.database
+        started = time.perf_counter()
+        if source is None:
+            source = os.path.join(directory, "graph.db")
+            write_database(source, args.nodes, args.seed)
+        generated = time.perf_counter() - started
+        rng = random.Random(args.seed)
+        with closing(sqlite3.connect(source)) as conn:
+            nodes, links = (conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0] for table in ("nodes", "links"))
+        workload = Workload(sample_ids(source, "nodes", SAMPLE_SIZE, rng), sample_ids(source, "links", SAMPLE_SIZE, rng),
+                            args.seed)
+        print(f"{nodes} nodes, {links} links, {os.path.getsize(source) / 1e6:.0f} MB"
+              + ("" if args.database else f", generated in {generated:.1f} s"))
+
+        result = {
+            "commit": commit,
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "dataset": {"nodes": nodes, "links": links, "seed": None if args.database else args.seed,
+                        "database_bytes": os.path.getsize(source)},
+            "options": {"requests": args.requests, "max_seconds": args.max_seconds,
+                        "concurrency": args.concurrency, "bulk_batches": args.bulk_batches},
+            "modes": {},
+        }
+        for mode in args.modes:
+            database = os.path.join(directory, f"{mode}.db")
+            copy_database(source, database)
+            # A fresh interpreter per mode keeps imports, caches and RSS from leaking between them; it
+            # must see DATABASE_URL before anything imports models.db
+            os.environ["DATABASE_URL"] = f"sqlite:///{database}"
+            with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as pool:
+                result["modes"][mode] = pool.submit(run_mode, mode, workload, args).result()
+            print(f"  startup {result['modes'][mode]['startup_seconds']} s, "
+                  f"peak RSS {result['modes'][mode]['peak_rss_mb']} MB")
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(database + suffix):
+                    os.remove(database + suffix)
+
+    out = args.out or f"endpoints-{(commit or 'unknown')[:12]}-{nodes}.json"
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults written to {out}")
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        if compare(previous, result, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
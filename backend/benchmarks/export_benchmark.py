@@ -0,0 +1,85 @@
+"""Compare payload size and decode time of the JSON and columnar /api/graph-data encodings
+
+Run from the backend directory:
+
+    python -m benchmarks.export_benchmark --database /tmp/scratch.db --nodes 10000 --links-per-node 3
+"""
+import argparse
+import gzip
+import os
+import tempfile
+import time
+
+import msgpack
+import numpy as np
+import orjson
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks import use_database
+from benchmarks.serialization_benchmark import populate
+
+
+def decode_columns(payload: bytes) -> dict:
+    """What a columnar client does: unpack once and view the typed arrays without copying"""
+    graph = msgpack.unpackb(payload)
+    for table in (graph["nodes"], graph["links"]):
+        for column in table["columns"].values():
+            if "data" in column:
+                column["data"] = np.frombuffer(column["data"], dtype=column["dtype"])
+            elif "codes" in column:
+                column["codes"] = np.frombuffer(column["codes"], dtype=column["dtype"])
+    return graph
+
+
+def best_of(fn, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=10000)
+    parser.add_argument("--links-per-node", type=int, default=3)
+    parser.add_argument("--text-size", type=int, default=200, help="Characters of bio and of description per node")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--database", help="Database the app opens on import (default: DATABASE_URL); "
+                                           "the benchmark runs on a scratch one")
+    args = parser.parse_args()
+    use_database(parser, args.database)
+    from models.columnar import brotli, compress, decode_graph, encode_graph
+    from models.db import Base
+    from models.serialization import LINK_COLUMNS, NODE_COLUMNS, dumps, link_dicts, node_dicts
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        populate(engine, args.nodes, args.text_size, links_per_node=args.links_per_node)
+        with sessionmaker(bind=engine)() as db:
+            node_rows = db.query(*NODE_COLUMNS).all()
+            link_rows = db.query(*LINK_COLUMNS).all()
+        engine.dispose()
+
+    as_json = dumps({"nodes": node_dicts(node_rows), "links": link_dicts(link_rows)})
+    columnar = encode_graph(node_rows, link_rows)
+    assert decode_graph(columnar) == orjson.loads(as_json), "columnar payload must round-trip"
+
+    print(f"{len(node_rows)} nodes, {len(link_rows)} links")
+    print(f"{'encoding':<10}{'raw KB':>10}{'gzip KB':>10}{'br KB':>10}{'decode ms':>11}")
+    for label, body, decode in (
+        ("json", as_json, lambda: orjson.loads(as_json)),
+        ("columnar", columnar, lambda: decode_columns(columnar)),
+        ("(to rows)", columnar, lambda: decode_graph(columnar)),
+    ):
+        sizes = [len(body), len(compress(body, "gzip"))]
+        sizes.append(len(compress(body, "br")) if brotli is not None else float("nan"))
+        decode_ms = best_of(decode, args.repeats) * 1000
+        print(f"{label:<10}" + "".join(f"{size / 1024:>10.1f}" for size in sizes) + f"{decode_ms:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
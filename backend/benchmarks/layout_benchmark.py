@@ -0,0 +1,65 @@
+"""Time the server-side force layout on synthetic graphs, cold and warm-started
+
+Run from the backend directory:
+
+    python -m benchmarks.layout_benchmark --sizes 1000 10000 100000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from graph.layout import compute_positions
+
+
+def synthetic_graph(n: int, edges_per_node: int = 2, seed: int = 0):
+    """Node ids and (source, target, strength) links with a preferential-attachment flavour"""
+    rng = np.random.default_rng(seed)
+    node_ids = [f"N{i:07d}" for i in range(n)]
+    sources = np.repeat(np.arange(1, n), edges_per_node)
+    # Targets skew towards early (hub) nodes
+    targets = (rng.random(len(sources)) ** 2 * sources).astype(np.int64)
+    strengths = rng.uniform(0.3, 1.0, len(sources))
+    links = [(node_ids[s], node_ids[t], float(w)) for s, t, w in zip(sources, targets, strengths)]
+    return node_ids, links
+
+
+def edge_length_ratio(positions, links, seed: int = 0) -> float:
+    """Mean linked-pair distance over mean random-pair distance; lower means tighter clusters"""
+    rng = np.random.default_rng(seed)
+    pos = np.array(list(positions.values()))
+    index = {node_id: i for i, node_id in enumerate(positions)}
+    pairs = np.array([(index[s], index[t]) for s, t, _ in links])
+    linked = np.linalg.norm(pos[pairs[:, 0]] - pos[pairs[:, 1]], axis=1).mean()
+    random_pairs = rng.integers(0, len(pos), size=(len(pairs), 2))
+    unlinked = np.linalg.norm(pos[random_pairs[:, 0]] - pos[random_pairs[:, 1]], axis=1).mean()
+    return linked / unlinked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    print(f"{'nodes':>8}{'links':>9}{'cold s':>9}{'warm s':>9}{'ratio':>8}")
+    for n in args.sizes:
+        node_ids, links = synthetic_graph(n)
+
+        start = time.perf_counter()
+        positions = compute_positions(node_ids, links)
+        cold = time.perf_counter() - start
+
+        # A small edit: 1% new nodes, each linked into the existing graph
+        extra = max(n // 100, 1)
+        new_ids = [f"X{i:07d}" for i in range(extra)]
+        new_links = [(new_id, node_ids[i * 7 % n], 1.0) for i, new_id in enumerate(new_ids)]
+        start = time.perf_counter()
+        positions = compute_positions(node_ids + new_ids, links + new_links, positions)
+        warm = time.perf_counter() - start
+
+        ratio = edge_length_ratio(positions, links + new_links)
+        print(f"{n:>8}{len(links):>9}{cold:>9.2f}{warm:>9.2f}{ratio:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
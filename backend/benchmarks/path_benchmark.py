@@ -0,0 +1,88 @@
+"""Time /api/path searches on the in-memory index for random node pairs
+
+Run from the backend directory:
+
+    python -m benchmarks.path_benchmark --nodes 200000 --edges-per-node 5
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+
+from benchmarks.layout_benchmark import synthetic_graph
+from graph import AdjacencyIndex
+
+# (label, k, weighted)
+SEARCHES = [("hops", 1, False), ("weighted", 1, True), ("hops k=3", 3, False), ("weighted k=3", 3, True)]
+# Pause between the link writes made while weighted k=3 searches run
+WRITE_INTERVAL = 0.005
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    return statistics.median(timings), p95, timings[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=200000)
+    parser.add_argument("--edges-per-node", type=int, default=5)
+    parser.add_argument("--pairs", type=int, default=50)
+    args = parser.parse_args()
+
+    node_ids, links = synthetic_graph(args.nodes, edges_per_node=args.edges_per_node)
+    index = AdjacencyIndex()
+    start = time.perf_counter()
+    index.load(
+        ((node_id, node_id, "People") for node_id in node_ids),
+        ((f"L{i}", s, t, "related", w) for i, (s, t, w) in enumerate(links))
+    )
+    print(f"{len(node_ids)} nodes, {len(links)} links, index loaded in {time.perf_counter() - start:.1f}s")
+
+    rng = random.Random(0)
+    pairs = [(rng.choice(node_ids), rng.choice(node_ids)) for _ in range(args.pairs)]
+    print(f"{'search':<14}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'mean hops':>11}")
+    for label, k, weighted in SEARCHES:
+        timings, hops = [], []
+        for source, target in pairs:
+            start = time.perf_counter()
+            paths = index.paths(source, target, k=k, weighted=weighted)
+            timings.append((time.perf_counter() - start) * 1000)
+            if paths:
+                hops.append(len(paths[0][2]))
+        p50, p95, worst = percentiles(timings)
+        print(f"{label:<14}{p50:>9.2f}{p95:>9.2f}{worst:>9.2f}{statistics.mean(hops) if hops else 0:>11.2f}")
+
+    # Searches run on a view of the index outside its lock, so writes should not
+    # queue behind them; each search after a write pays for a fresh view
+    searching = threading.Event()
+    writes = []
+
+    def write_links():
+        i = 0
+        while not searching.is_set():
+            source, target = rng.choice(node_ids), rng.choice(node_ids)
+            start = time.perf_counter()
+            index.add_link(f"W{i}", source, target, "related", 1.0)
+            index.remove_link(f"W{i}")
+            writes.append((time.perf_counter() - start) * 1000)
+            i += 1
+            time.sleep(WRITE_INTERVAL)
+
+    writer = threading.Thread(target=write_links)
+    writer.start()
+    timings = []
+    for source, target in pairs:
+        start = time.perf_counter()
+        index.paths(source, target, k=3, weighted=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    searching.set()
+    writer.join()
+    print(f"{'with writes':<14}" + "".join(f"{value:>9.2f}" for value in percentiles(timings)))
+    print(f"{'writes':<14}" + "".join(f"{value:>9.2f}" for value in percentiles(writes)) + f"{len(writes):>11}")
+
+
+if __name__ == "__main__":
+    main()
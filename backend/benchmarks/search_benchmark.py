@@ -0,0 +1,100 @@
+"""Compare the FTS5 search path with the old ILIKE scan on synthetic graphs
+
+Run from the backend directory:
+
+    python -m benchmarks.search_benchmark --database /tmp/scratch.db --sizes 10000 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks import use_database
+from benchmarks.synthetic import build_vocabulary, words
+
+TYPES = ["People", "Institutions", "Projects", "Methods"]
+# Common, mid-frequency, rare, multi-word, prefix and no-match queries
+QUERIES = ["art", "river", "biomaterial", "sound walking", "partic", "kalomi", "zzznomatch"]
+
+
+def populate(engine, size: int, seed: int = 42):
+    from models.db import Node
+
+    rng = random.Random(seed)
+    vocabulary, weights = build_vocabulary(rng)
+    rows = [
+        {
+            "id": f"N{i:07d}",
+            "name": words(rng, vocabulary, weights, 3).title(),
+            "type": rng.choice(TYPES),
+            "bio": words(rng, vocabulary, weights, 80),
+            "description": words(rng, vocabulary, weights, 60),
+            "methods": words(rng, vocabulary, weights, 10),
+        }
+        for i in range(size)
+    ]
+    with engine.begin() as conn:
+        conn.execute(Node.__table__.insert(), rows)
+
+
+def time_queries(search, db, repeat: int):
+    timings = {}
+    for q in QUERIES:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            search(q, 20, None, False, db)
+            samples.append((time.perf_counter() - start) * 1000)
+        timings[q] = statistics.median(samples)
+    return timings
+
+
+def count_matches(db, q: str) -> int:
+    from models.search import build_match_query
+
+    match_query = build_match_query(q)
+    return db.execute(text("SELECT count(*) FROM nodes_fts WHERE nodes_fts MATCH :q"), {"q": match_query}).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--database", help="Database the app opens on import (default: DATABASE_URL); "
+                                           "the benchmark runs on scratch ones")
+    args = parser.parse_args()
+    use_database(parser, args.database)
+    from models.db import Base
+    from models.search import create_search_index
+    import run
+
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+            Base.metadata.create_all(bind=engine)
+            populate(engine, size)
+
+            start = time.perf_counter()
+            create_search_index(engine)
+            build_ms = (time.perf_counter() - start) * 1000
+
+            db = sessionmaker(bind=engine)()
+            fts = time_queries(run.search_nodes_fts, db, args.repeat)
+            ilike = time_queries(run.search_nodes_ilike, db, args.repeat)
+            matches = {q: count_matches(db, q) for q in QUERIES}
+            db.close()
+            engine.dispose()
+
+        print(f"\n{size} nodes (index build {build_ms:.0f} ms), median ms for the first page of 20")
+        print(f"{'query':<16}{'matches':>9}{'ILIKE':>10}{'FTS5':>10}{'speedup':>10}")
+        for q in QUERIES:
+            print(f"{q:<16}{matches[q]:>9}{ilike[q]:>10.2f}{fts[q]:>10.2f}{ilike[q] / fts[q]:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
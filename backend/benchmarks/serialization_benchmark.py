@@ -0,0 +1,115 @@
+"""Compare per-row pydantic serialization of /api/graph-data with the column-tuple path
+
+Run from the backend directory:
+
+    python -m benchmarks.serialization_benchmark --database /tmp/scratch.db --nodes 20000 --text-size 2000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks import use_database
+
+NODE_TYPES = ["People", "Institutions", "Projects", "Methods"]
+RELATIONSHIP_TYPES = ["leads", "develops", "applies", "mentored_by", "supports", "collaborates_with"]
+WORDS = ["art", "river", "forest", "participatory", "sound", "walking", "ecology", "textile", "archive", "näring"]
+
+
+def populate(engine, nodes: int, text_size: int, links_per_node: int = 1, seed: int = 0):
+    from models import Node, Link
+
+    rng = random.Random(seed)
+
+    def text(size: int) -> str:
+        words, length = [], 0
+        while length < size:
+            words.append(rng.choice(WORDS))
+            length += len(words[-1]) + 1
+        return " ".join(words)
+
+    node_rows = [
+        {"id": f"N{i:06d}", "name": f"Node {i}", "type": rng.choice(NODE_TYPES), "bio": text(text_size),
+         "description": text(text_size), "website": f"https://example.org/{i}"}
+        for i in range(nodes)
+    ]
+    edges = {
+        (f"N{i % nodes:06d}", f"N{rng.randrange(nodes):06d}", rng.choice(RELATIONSHIP_TYPES))
+        for i in range(nodes * links_per_node)
+    }
+    link_rows = [
+        {"id": f"L{i:07d}", "source_id": source, "target_id": target,
+         "relationship_type": relationship_type, "strength": round(rng.random(), 2)}
+        for i, (source, target, relationship_type) in enumerate(sorted(edges))
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(Node), node_rows)
+        conn.execute(insert(Link), link_rows)
+
+
+def pydantic_path(db) -> bytes:
+    from models import Node, Link, NodeResponse, LinkResponse, GraphData
+
+    return GraphData(
+        nodes=[NodeResponse.from_orm(node) for node in db.query(Node).all()],
+        links=[LinkResponse.from_orm(link) for link in db.query(Link).all()]
+    ).model_dump_json().encode()
+
+
+def column_path(db) -> bytes:
+    from models.serialization import LINK_COLUMNS, NODE_COLUMNS, dumps, link_dicts, node_dicts
+
+    return dumps({"nodes": node_dicts(db.query(*NODE_COLUMNS)), "links": link_dicts(db.query(*LINK_COLUMNS))})
+
+
+def best_of(fn, db, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        db.expunge_all()
+        start = time.perf_counter()
+        fn(db)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=20000)
+    parser.add_argument("--text-size", type=int, default=2000, help="Characters of bio and of description per node")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--database", help="Database the app opens on import (default: DATABASE_URL); "
+                                           "the benchmark runs on a scratch one")
+    args = parser.parse_args()
+    use_database(parser, args.database)
+    from models import serialization
+    from models.db import Base
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        populate(engine, args.nodes, args.text_size)
+        db = sessionmaker(bind=engine)()
+
+        expected = pydantic_path(db)
+        assert column_path(db) == expected, "column path must produce identical bytes"
+        encoder = serialization.orjson
+        serialization.orjson = None
+        assert column_path(db) == expected, "stdlib fallback must produce identical bytes"
+        serialization.orjson = encoder
+
+        rows = args.nodes * 2
+        print(f"{rows} rows, {len(expected) / 1e6:.1f} MB of JSON")
+        print(f"{'path':<28}{'seconds':>9}{'rows/s':>12}")
+        for label, fn in (("ORM + from_orm + pydantic", pydantic_path), ("column tuples + orjson", column_path)):
+            seconds = best_of(fn, db, args.repeats)
+            print(f"{label:<28}{seconds:>9.3f}{rows / seconds:>12,.0f}")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
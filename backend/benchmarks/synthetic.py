@@ -0,0 +1,261 @@
+"""Generate a seeded synthetic relationship graph for benchmarks, from 1k to 1M nodes
+
+Run from the backend directory:
+
+    DATABASE_URL=sqlite:////tmp/scratch.db python -m benchmarks.synthetic --nodes 100000 --database /tmp/graph.db
+    python -m benchmarks.synthetic --nodes 100000 --out-dir /tmp/graph   # nodes.jsonl + links.jsonl for bulk_import.py
+
+The shape follows the sample data: half the nodes are People, then Projects,
+Institutions and Methods. Links only join the type pairs the sample data
+uses (People lead Projects, are mentored by Institutions, develop Methods and
+collaborate with each other; Institutions support Projects; Projects apply
+Methods), and their targets are drawn with Zipf-like popularity, so a few
+institutions and methods become hubs. Text fields are Zipf-distributed words
+with log-normal lengths, so most bios are a paragraph and a few run to pages.
+The same seed and size always produce the same graph.
+"""
+import argparse
+import json
+import os
+import random
+import time
+from itertools import accumulate, islice
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import create_engine, insert
+
+DOMAIN_WORDS = [
+    "art", "design", "music", "river", "forest", "climate", "participatory", "workshop", "sound",
+    "community", "storytelling", "biomaterial", "textile", "sensor", "ecology", "justice", "archive",
+    "healthcare", "immersive", "speculative", "legal", "water", "craft", "digital", "research",
+    "practice", "method", "institute", "technology", "society", "walking", "listening", "mapping",
+]
+SYLLABLES = ["ka", "lo", "mi", "ren", "tor", "vel", "sa", "qui", "dun", "ber", "ox", "ph", "ly", "gen"]
+
+# Node type, id prefix and share of all nodes
+NODE_TYPES = [("People", "P", 0.50), ("Projects", "PR", 0.25), ("Institutions", "I", 0.15), ("Methods", "M", 0.10)]
+# Source type, relationship type, target type, mean links per source node
+RELATIONSHIPS = [
+    ("People", "leads", "Projects", 0.4),
+    ("People", "mentored_by", "Institutions", 0.8),
+    ("People", "develops", "Methods", 0.3),
+    ("People", "collaborates_with", "People", 1.0),
+    ("Institutions", "supports", "Projects", 2.0),
+    ("Projects", "applies", "Methods", 1.5),
+]
+# Median word count and log-normal sigma of each long text field, per node type
+TEXT_FIELDS = {
+    "People": {"bio": (60, 0.8)},
+    "Institutions": {"bio": (45, 0.7)},
+    "Projects": {"description": (90, 0.7), "methods": (25, 0.5)},
+    "Methods": {"description": (70, 0.7), "steps": (120, 0.8), "challenges": (40, 0.6), "conditions": (30, 0.6)},
+}
+INSTITUTION_KINDS = ["Institute", "Lab", "Foundation", "Collective", "University", "Centre", "Studio"]
+METHOD_CATEGORIES = ["Participatory", "Speculative", "Sensory", "Ecological", "Digital", "Material", "Narrative"]
+BUDGETS = ["5,000 Euros", "8,000 Euros", "12,000 Euros", "20,000 Euros", "50,000 Euros"]
+# Exponent of the Zipf-like popularity of link targets; higher means bigger hubs
+HUB_EXPONENT = 0.8
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def build_vocabulary(rng: random.Random, size: int = 20000):
+    """Pseudo-words sampled with Zipf-like frequencies, domain words placed at mid ranks
+
+    A domain word at rank r ends up in very roughly 1400/r percent of the nodes,
+    from a few percent for "art" down to a fraction of a percent.
+    """
+    vocabulary = []
+    seen = set(DOMAIN_WORDS)
+    while len(vocabulary) < size - len(DOMAIN_WORDS):
+        word = "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            vocabulary.append(word)
+    for i, word in enumerate(DOMAIN_WORDS):
+        vocabulary.insert(300 + i * 150, word)
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    return vocabulary, weights
+
+
+def words(rng: random.Random, vocabulary, weights, count: int) -> str:
+    return " ".join(rng.choices(vocabulary, weights=weights, k=count))
+
+
+class Popularity:
+    """Zipf-like sampler over the nodes of one type, with hub ranks shuffled across the id range"""
+
+    def __init__(self, rng: random.Random, count: int):
+        self.count = count
+        self.order = list(range(count))
+        rng.shuffle(self.order)
+        self.cum_weights = list(accumulate(1.0 / (rank + 1) ** HUB_EXPONENT for rank in range(count)))
+
+    def sample(self, rng: random.Random, k: int) -> List[int]:
+        return [self.order[rank] for rank in rng.choices(range(self.count), cum_weights=self.cum_weights, k=k)]
+
+
+class GraphShape(NamedTuple):
+    counts: Dict[str, int]
+    prefixes: Dict[str, str]
+
+    def node_id(self, node_type: str, index: int) -> str:
+        return f"{self.prefixes[node_type]}{index + 1:07d}"
+
+
+def graph_shape(nodes: int) -> GraphShape:
+    """Nodes per type; rounding leftovers go to People"""
+    counts = {node_type: max(1, int(nodes * share)) for node_type, _, share in NODE_TYPES}
+    counts["People"] += nodes - sum(counts.values())
+    return GraphShape(counts, {node_type: prefix for node_type, prefix, _ in NODE_TYPES})
+
+
+class SyntheticGraph:
+    """Streams the rows of one seeded graph; nodes first, then links"""
+
+    def __init__(self, nodes: int, seed: int = 0):
+        self.shape = graph_shape(nodes)
+        self.seed = seed
+        rng = random.Random(seed)
+        self.vocabulary, weights = build_vocabulary(rng)
+        self.cum_weights = list(accumulate(weights))
+        self.institution_names = [self._institution_name(i) for i in range(self.shape.counts["Institutions"])]
+
+    def text(self, rng: random.Random, median: float, sigma: float) -> str:
+        count = max(3, int(rng.lognormvariate(0, sigma) * median))
+        return " ".join(rng.choices(self.vocabulary, cum_weights=self.cum_weights, k=count))
+
+    def title(self, rng: random.Random, count: int) -> str:
+        return " ".join(rng.choices(self.vocabulary, cum_weights=self.cum_weights, k=count)).title()
+
+    def _institution_name(self, index: int) -> str:
+        rng = random.Random(f"{self.seed}:I:{index}")
+        return f"{self.title(rng, 2)} {rng.choice(INSTITUTION_KINDS)}"
+
+    def node(self, rng: random.Random, node_type: str, index: int) -> dict:
+        node_id = self.shape.node_id(node_type, index)
+        row = {"id": node_id, "type": node_type}
+        if node_type == "People":
+            row["name"] = self.title(rng, 2)
+            row["website"] = f"https://example.org/people/{node_id.lower()}"
+            institution = rng.randrange(self.shape.counts["Institutions"])
+            row["connections"] = f"{self.institution_names[institution]} (Lead Mentor)"
+        elif node_type == "Institutions":
+            row["name"] = self.institution_names[index]
+            row["website"] = f"https://{node_id.lower()}.example.org/"
+        elif node_type == "Projects":
+            row["name"] = self.title(rng, rng.randint(1, 4))
+            row["budget"] = rng.choice(BUDGETS)
+            institutions = rng.sample(range(self.shape.counts["Institutions"]),
+                                      min(rng.randint(1, 4), self.shape.counts["Institutions"]))
+            row["involved_institutions"] = ", ".join(self.institution_names[i] for i in institutions)
+        else:
+            row["name"] = f"{self.title(rng, 2)} Method"
+            row["category"] = rng.choice(METHOD_CATEGORIES)
+        for field, (median, sigma) in TEXT_FIELDS[node_type].items():
+            row[field] = self.text(rng, median, sigma)
+        return row
+
+    def nodes(self) -> Iterator[dict]:
+        for node_type, _, _ in NODE_TYPES:
+            rng = random.Random(f"{self.seed}:{node_type}")
+            for index in range(self.shape.counts[node_type]):
+                yield self.node(rng, node_type, index)
+
+    def links(self) -> Iterator[dict]:
+        rng = random.Random(f"{self.seed}:links")
+        counts = self.shape.counts
+        popularity = {node_type: Popularity(rng, count) for node_type, count in counts.items()}
+        number = 0
+        for source_type, relationship_type, target_type, mean in RELATIONSHIPS:
+            for source in range(counts[source_type]):
+                k = int(rng.expovariate(1 / mean) + 0.5)
+                if not k:
+                    continue
+                source_id = self.shape.node_id(source_type, source)
+                targets = set(popularity[target_type].sample(rng, k))
+                if source_type == target_type:
+                    targets.discard(source)
+                for target in sorted(targets):
+                    number += 1
+                    yield {
+                        "id": f"L{number:08d}",
+                        "source_id": source_id,
+                        "target_id": self.shape.node_id(target_type, target),
+                        "relationship_type": relationship_type,
+                        "strength": round(rng.betavariate(2, 2), 2),
+                    }
+
+
+def chunked(rows: Iterator[dict], size: int) -> Iterator[List[dict]]:
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_database(path: str, nodes: int, seed: int = 0, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tuple[int, int]:
+    """Create a new SQLite database at `path` holding the graph; returns (nodes, links)
+
+    The search index is not built here; the API builds it from the rows on first start.
+    Importing the models opens DATABASE_URL too, so callers set it to another database first.
+    """
+    if os.path.exists(path):
+        raise FileExistsError(path)
+    from models.db import Base, Link, Node
+    from models.migrations import stamp
+
+    graph = SyntheticGraph(nodes, seed)
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    stamp(engine)
+    totals = {}
+    for table, rows in ((Node, graph.nodes()), (Link, graph.links())):
+        totals[table] = 0
+        # executemany needs every row to carry the same keys
+        columns = dict.fromkeys(column.name for column in table.__table__.columns)
+        for chunk in chunked(rows, chunk_size):
+            with engine.begin() as conn:
+                conn.execute(insert(table), [{**columns, **row} for row in chunk])
+            totals[table] += len(chunk)
+    engine.dispose()
+    return totals[Node], totals[Link]
+
+
+def write_jsonl(directory: str, nodes: int, seed: int = 0) -> Tuple[int, int]:
+    """Write nodes.jsonl and links.jsonl into `directory` in the bulk import format"""
+    os.makedirs(directory, exist_ok=True)
+    graph = SyntheticGraph(nodes, seed)
+    totals = []
+    for name, rows in (("nodes.jsonl", graph.nodes()), ("links.jsonl", graph.links())):
+        count = 0
+        with open(os.path.join(directory, name), "w", encoding="utf-8") as out:
+            for row in rows:
+                out.write(json.dumps(row, ensure_ascii=False) + "\n")
+                count += 1
+        totals.append(count)
+    return totals[0], totals[1]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--database", help="New SQLite file to create")
+    target.add_argument("--out-dir", help="Directory for nodes.jsonl and links.jsonl")
+    args = parser.parse_args(argv)
+    if args.database and not os.environ.get("DATABASE_URL"):
+        parser.error("set DATABASE_URL to another database; writing --database imports the app's models, "
+                     "which open it")
+
+    start = time.perf_counter()
+    if args.database:
+        nodes, links = write_database(args.database, args.nodes, args.seed)
+    else:
+        nodes, links = write_jsonl(args.out_dir, args.nodes, args.seed)
+    print(f"{nodes} nodes, {links} links in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""Measure how API throughput scales with the number of uvicorn worker processes
+
+Run from the backend directory:
+
+    DATABASE_URL=sqlite:////tmp/scratch.db python -m benchmarks.worker_benchmark --nodes 100000 --workers 1 2 4 8
+
+For each worker count a copy of one synthetic graph is served by
+`uvicorn run:app --workers N`, and client processes drive a mix of reads
+(single nodes, neighbours, a page of one node type, search, stats) with a small
+share of node updates from as many threads as --clients x --threads. The
+writes land on one worker at a time, so the others keep catching up with
+them through the change log while they serve reads; that is the cost this
+benchmark is meant to include. The load runs for --warmup seconds untimed,
+so every worker has loaded its index and caches, and then for --seconds.
+
+Client processes share the machine with the server, so give them enough
+cores (--clients) to saturate it but not so many that they starve it; on a
+box with C cores, workers up to about C/2 give the clearest picture.
+
+With --snapshot the server shares a memory-mapped graph snapshot between its
+workers (API_SNAPSHOT). The server's memory is reported as the proportional
+set size (PSS) of all its processes, measured after the load, which counts
+pages shared between workers once rather than once per worker (Linux only).
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks import use_database
+from benchmarks.endpoint_benchmark import (
+    BACKEND_DIR, PERCENTILES, SAMPLE_SIZE, copy_database, free_port, git_commit, percentile, sample_ids
+)
+from benchmarks.synthetic import DOMAIN_WORDS, write_database
+
+# Request kinds and their share of the read mix
+READ_MIX = [("node", 0.35), ("neighbors", 0.25), ("nodes_page", 0.15), ("search", 0.15), ("stats", 0.10)]
+
+
+def request_for(kind: str, rng: random.Random, node_ids: List[str]) -> str:
+    if kind == "node":
+        return f"/api/nodes/{rng.choice(node_ids)}"
+    if kind == "neighbors":
+        return f"/api/nodes/{rng.choice(node_ids)}/neighbors"
+    if kind == "nodes_page":
+        return "/api/nodes?node_type=Methods&limit=50"
+    if kind == "search":
+        return f"/api/search?q={rng.choice(DOMAIN_WORDS)}&limit=20"
+    return "/api/stats"
+
+
+def client_load(port: int, client: int, threads: int, node_ids: List[str], write_ratio: float, warmup: float,
+                seconds: float, seed: int) -> Tuple[Dict[str, List[float]], int]:
+    """One client process: `threads` threads sending requests until the time is up
+
+    Returns the latencies of the timed requests per kind, and the error count.
+    """
+    import httpx
+
+    kinds = [kind for kind, _ in READ_MIX]
+    weights = [share for _, share in READ_MIX]
+    latencies: Dict[str, List[float]] = {kind: [] for kind in kinds + ["update"]}
+    errors = 0
+    lock = threading.Lock()
+    start = time.perf_counter()
+    timed_from, deadline = start + warmup, start + warmup + seconds
+
+    def worker(number: int):
+        nonlocal errors
+        rng = random.Random(f"{seed}:{client}:{number}")
+        node_id = f"BENCH-W{client:03d}-{number:03d}"
+        own: Dict[str, List[float]] = {kind: [] for kind in latencies}
+        failed = 0
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=None) as http:
+            http.post("/api/nodes", json={"id": node_id, "name": node_id, "type": "People"})
+            updates = 0
+            while True:
+                began = time.perf_counter()
+                if began >= deadline:
+                    break
+                if rng.random() < write_ratio:
+                    kind = "update"
+                    updates += 1
+                    response = http.put(f"/api/nodes/{node_id}", json={
+                        "name": node_id, "type": "People", "bio": f"update {updates}"})
+                else:
+                    kind = rng.choices(kinds, weights)[0]
+                    response = http.get(request_for(kind, rng, node_ids))
+                if began >= timed_from:
+                    own[kind].append(time.perf_counter() - began)
+                    failed += response.status_code >= 400
+        with lock:
+            for kind, values in own.items():
+                latencies[kind].extend(values)
+            errors += failed
+
+    pool = [threading.Thread(target=worker, args=(number,)) for number in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return latencies, errors
+
+
+def start_server(database: str, workers: int, timeout: float, snapshot: Optional[str] = None
+                 ) -> Tuple[subprocess.Popen, int]:
+    import httpx
+
+    port = free_port()
+    command = [sys.executable, "-m", "uvicorn", "run:app", "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(workers), "--log-level", "warning"]
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{database}"}
+    if snapshot:
+        env["API_SNAPSHOT"] = snapshot
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+    started = time.perf_counter()
+    while True:
+        if server.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with status {server.returncode}")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=5)
+            return server, port
+        except httpx.TransportError:
+            if time.perf_counter() - started > timeout:
+                server.terminate()
+                raise
+            time.sleep(0.2)
+
+
+def process_tree_pss_mb(pid: int) -> Optional[float]:
+    """Proportional set size of a process and all its descendants, None where /proc lacks it"""
+    total, pending = 0, [pid]
+    try:
+        while pending:
+            current = pending.pop()
+            with open(f"/proc/{current}/smaps_rollup") as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith("Pss:"))
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pending.extend(int(child) for child in f.read().split())
+    except (OSError, StopIteration):
+        return None
+    return round(total / 1024, 1)
+
+
+def summarize(latencies: Dict[str, List[float]], errors: int, seconds: float) -> dict:
+    every = sorted(value for values in latencies.values() for value in values)
+    stats = {"requests": len(every), "errors": errors, "throughput_rps": round(len(every) / seconds, 1)}
+    for p in PERCENTILES:
+        stats[f"p{p}_ms"] = round(percentile(every, p) * 1000, 3) if every else None
+    stats["by_kind_p50_ms"] = {
+        kind: round(percentile(sorted(values), 50) * 1000, 3) for kind, values in latencies.items() if values
+    }
+    return stats
+
+
+def run_workers(source: str, directory: str, workers: int, node_ids: List[str], args) -> dict:
+    database = os.path.join(directory, f"workers-{workers}.db")
+    copy_database(source, database)
+    snapshot = database + ".snapshot" if args.snapshot else None
+    server, port = start_server(database, workers, args.startup_timeout, snapshot)
+    try:
+        with ProcessPoolExecutor(args.clients, mp_context=get_context("spawn")) as pool:
+            futures = [
+                pool.submit(client_load, port, client, args.threads, node_ids, args.write_ratio, args.warmup,
+                            args.seconds, args.seed)
+                for client in range(args.clients)
+            ]
+            latencies: Dict[str, List[float]] = {}
+            errors = 0
+            for future in futures:
+                part, failed = future.result()
+                for kind, values in part.items():
+                    latencies.setdefault(kind, []).extend(values)
+                errors += failed
+        pss = process_tree_pss_mb(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+    for suffix in ("", "-wal", "-shm", ".snapshot", ".snapshot.lock"):
+        if os.path.exists(database + suffix):
+            os.remove(database + suffix)
+    return {**summarize(latencies, errors, args.seconds), "server_pss_mb": pss}
+
+
+def main(argv: Optional[List[str]] = None):
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=10000, help="Size of the generated graph")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--database", help="Benchmark copies of this database instead of generating one")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=[n for n in (1, 2, 4, 8, 16) if n <= max(1, cpus // 2)] or [1])
+    parser.add_argument("--clients", type=int, default=max(1, cpus // 2), help="Client processes")
+    parser.add_argument("--threads", type=int, default=8, help="Threads per client process")
+    parser.add_argument("--write-ratio", type=float, default=0.02, help="Share of requests that update a node")
+    parser.add_argument("--warmup", type=float, default=5, help="Untimed seconds of load before measuring")
+    parser.add_argument("--seconds", type=float, default=15, help="Timed seconds of load per worker count")
+    parser.add_argument("--snapshot", action="store_true", help="Share a memory-mapped graph snapshot between workers")
+    parser.add_argument("--startup-timeout", type=float, default=600)
+    parser.add_argument("--out", help="Result file (default: workers-<commit>-<nodes>.json)")
+    args = parser.parse_args(argv)
+    if args.database is None:
+        use_database(parser)  # generating the graph imports the app's models
+
+    commit = git_commit()
+    with tempfile.TemporaryDirectory() as directory:
+        source = args.database
+        if source is None:
+            source = os.path.join(directory, "graph.db")
+            write_database(source, args.nodes, args.seed)
+        with closing(sqlite3.connect(source)) as conn:
+            nodes, links = (conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0] for table in ("nodes", "links"))
+        node_ids = sample_ids(source, "nodes", SAMPLE_SIZE, random.Random(args.seed))
+        print(f"{nodes} nodes, {links} links; {args.clients} client processes x {args.threads} threads, "
+              f"{args.write_ratio:.0%} writes, {cpus} CPUs{', shared snapshot' if args.snapshot else ''}")
+        print(f"{'workers':>8}{'req/s':>10}{'speedup':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}"
+              f"{'PSS MB':>9}", flush=True)
+
+        results = {}
+        for workers in args.workers:
+            stats = results[workers] = run_workers(source, directory, workers, node_ids, args)
+            speedup = stats["throughput_rps"] / results[args.workers[0]]["throughput_rps"]
+            print(f"{workers:>8}{stats['throughput_rps']:>10.1f}{speedup:>9.2f}{stats['p50_ms']:>9.2f}"
+                  f"{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}{stats['errors']:>8}"
+                  f"{stats['server_pss_mb'] if stats['server_pss_mb'] is not None else '-':>9}", flush=True)
+
+    out = args.out or f"workers-{(commit or 'unknown')[:12]}-{nodes}.json"
+    with open(out, "w") as f:
+        json.dump({
+            "commit": commit,
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "cpus": cpus,
+            "dataset": {"nodes": nodes, "links": links, "seed": None if args.database else args.seed},
+            "options": {"clients": args.clients, "threads": args.threads, "write_ratio": args.write_ratio,
+                        "warmup": args.warmup, "seconds": args.seconds, "snapshot": args.snapshot},
+            "workers": results,
+        }, f, indent=2)
+    print(f"\nResults written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""Bulk-load nodes and links from JSONL or CSV files
+
+Usage (from the backend directory):
+
+    python bulk_import.py --nodes nodes.csv --links links.jsonl
+
+Rows are validated and inserted in chunks, each chunk in its own transaction,
+so a bad row is reported without aborting the rest of the file. A running API
+server notices the import's resync entry in the change log on its next
+request and reloads what it holds in memory; clients polling /api/changes
+are told to resync.
+"""
+import argparse
+import csv
+import json
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import select, tuple_
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+# (line number, parsed row or None, parse error or None)
+RawRow = Tuple[int, Optional[dict], Optional[str]]
+
+
+@dataclass
+class ImportReport:
+    inserted: Dict[str, int] = field(default_factory=lambda: {"node": 0, "link": 0})
+    failed: Dict[str, int] = field(default_factory=lambda: {"node": 0, "link": 0})
+    errors: List[dict] = field(default_factory=list)
+    seq: Optional[int] = None  # the resync entry recorded in the change log, if anything was inserted
+
+    def fail(self, kind: str, line: int, row_id: Optional[str], message: str):
+        self.failed[kind] += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"kind": kind, "line": line, "id": row_id, "error": message})
+
+    @property
+    def errors_truncated(self) -> bool:
+        return sum(self.failed.values()) > len(self.errors)
+
+
+def detect_format(filename: Optional[str]) -> str:
+    return "csv" if filename and filename.lower().endswith(".csv") else "jsonl"
+
+
+def read_rows(stream: TextIO, fmt: str) -> Iterator[RawRow]:
+    """Parse rows one at a time so files of any size are read in constant memory"""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, "Expected a JSON object"
+            continue
+        yield line_number, row, None
+
+
+def _clean(row: dict) -> dict:
+    # CSV has no nulls: treat empty cells as missing so defaults apply
+    return {key: value for key, value in row.items() if key and value not in ("", None)}
+
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in error.errors())
+
+
+def _validate(kind: str, schema, chunk: Iterable[RawRow], report: ImportReport) -> Dict[str, Tuple[int, dict]]:
+    """Schema-check a chunk, returning {id: (line, values)} for rows that pass"""
+    valid = {}
+    for line, row, error in chunk:
+        if error:
+            report.fail(kind, line, None, error)
+            continue
+        try:
+            values = schema.model_validate(_clean(row)).model_dump()
+        except ValidationError as e:
+            report.fail(kind, line, row.get("id"), _describe(e))
+            continue
+        if values["id"] in valid:
+            report.fail(kind, line, values["id"], "Duplicate ID in file")
+            continue
+        valid[values["id"]] = (line, values)
+    return valid
+
+
+def _insert(engine: Engine, table, kind: str, rows: List[Tuple[int, dict]], report: ImportReport):
+    """Insert a validated chunk with one executemany; on a conflict, retry row by row"""
+    if not rows:
+        return
+    try:
+        with engine.begin() as conn:
+            conn.execute(table.insert(), [values for _, values in rows])
+        report.inserted[kind] += len(rows)
+        return
+    except IntegrityError:
+        pass
+
+    for line, values in rows:
+        try:
+            with engine.begin() as conn:
+                conn.execute(table.insert(), values)
+            report.inserted[kind] += 1
+        except IntegrityError:
+            report.fail(kind, line, values["id"], "Conflicts with an existing row")
+
+
+def _import_node_chunk(engine: Engine, chunk: List[RawRow], report: ImportReport):
+    from models import Node, NodeCreate
+
+    valid = _validate("node", NodeCreate, chunk, report)
+    with engine.connect() as conn:
+        existing = conn.execute(select(Node.id).where(Node.id.in_(list(valid)))).scalars().all()
+    for node_id in existing:
+        line, _ = valid.pop(node_id)
+        report.fail("node", line, node_id, "Node with this ID already exists")
+    _insert(engine, Node.__table__, "node", list(valid.values()), report)
+
+
+def _existing_edges(conn: Connection, edges: List[Tuple[str, str, str]]) -> set:
+    from models import Link
+
+    key = tuple_(Link.source_id, Link.target_id, Link.relationship_type)
+    return set(conn.execute(
+        select(Link.source_id, Link.target_id, Link.relationship_type).where(key.in_(edges))
+    ).tuples())
+
+
+def _import_link_chunk(engine: Engine, chunk: List[RawRow], report: ImportReport):
+    from models import Node, Link, LinkCreate
+
+    valid = _validate("link", LinkCreate, chunk, report)
+    endpoints = {v["source_id"] for _, v in valid.values()} | {v["target_id"] for _, v in valid.values()}
+    edges = [(v["source_id"], v["target_id"], v["relationship_type"]) for _, v in valid.values()]
+
+    # One query per check for the whole chunk instead of one per row
+    with engine.connect() as conn:
+        known_nodes = set(conn.execute(select(Node.id).where(Node.id.in_(list(endpoints)))).scalars())
+        existing_ids = set(conn.execute(select(Link.id).where(Link.id.in_(list(valid)))).scalars())
+        existing_edges = _existing_edges(conn, edges) if edges else set()
+
+    rows = []
+    seen_edges = set()
+    for link_id, (line, values) in valid.items():
+        edge = (values["source_id"], values["target_id"], values["relationship_type"])
+        if values["source_id"] not in known_nodes or values["target_id"] not in known_nodes:
+            report.fail("link", line, link_id, "Source or target node does not exist")
+        elif link_id in existing_ids:
+            report.fail("link", line, link_id, "Link with this ID already exists")
+        elif edge in existing_edges or edge in seen_edges:
+            report.fail("link", line, link_id, "Link with the same endpoints and relationship type already exists")
+        else:
+            seen_edges.add(edge)
+            rows.append((line, values))
+    _insert(engine, Link.__table__, "link", rows, report)
+
+
+def _chunks(rows: Iterator[RawRow], size: int) -> Iterator[List[RawRow]]:
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def import_graph(
+    engine: Engine,
+    nodes: Optional[TextIO] = None,
+    links: Optional[TextIO] = None,
+    nodes_format: str = "jsonl",
+    links_format: str = "jsonl",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> ImportReport:
+    """Import nodes, then links, reporting per-row failures instead of aborting"""
+    from models.changes import record_resync
+
+    report = ImportReport()
+    if nodes is not None:
+        for chunk in _chunks(read_rows(nodes, nodes_format), chunk_size):
+            _import_node_chunk(engine, chunk, report)
+    if links is not None:
+        for chunk in _chunks(read_rows(links, links_format), chunk_size):
+            _import_link_chunk(engine, chunk, report)
+    if sum(report.inserted.values()):
+        # Too many rows to list in the change log; clients polling /api/changes refetch instead
+        with engine.begin() as conn:
+            report.seq = record_resync(conn)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load nodes and links from JSONL or CSV files")
+    parser.add_argument("--nodes", help="Nodes file (.csv, otherwise JSON lines)")
+    parser.add_argument("--links", help="Links file (.csv, otherwise JSON lines)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+    if not args.nodes and not args.links:
+        parser.error("nothing to import; pass --nodes and/or --links")
+
+    # Importing the models opens (and creates) the database, so this module imports them where
+    # they are used, after the arguments are checked
+    from models.db import engine
+
+    with ExitStack() as stack:
+        nodes_file = stack.enter_context(open(args.nodes, encoding="utf-8", newline="")) if args.nodes else None
+        links_file = stack.enter_context(open(args.links, encoding="utf-8", newline="")) if args.links else None
+        report = import_graph(
+            engine,
+            nodes=nodes_file,
+            links=links_file,
+            nodes_format=detect_format(args.nodes),
+            links_format=detect_format(args.links),
+            chunk_size=args.chunk_size,
+        )
+
+    for kind in ("node", "link"):
+        print(f"{kind}s: {report.inserted[kind]} inserted, {report.failed[kind]} failed")
+    for error in report.errors:
+        print(f"  {error['kind']} line {error['line']} ({error['id']}): {error['error']}")
+    if report.errors_truncated:
+        print(f"  ... only the first {MAX_REPORTED_ERRORS} errors are shown")
+
+
+if __name__ == "__main__":
+    main()
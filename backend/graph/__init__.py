@@ -0,0 +1,9 @@
+from .cache import GraphVersion, ResponseCache, CachedResponse
+from .index import AdjacencyIndex, IndexedNode, IndexedLink
+from .autocomplete import NameIndex, MAX_SUGGESTIONS
+from .layout import Layout, LayoutWorker, compute_positions
+from .analytics import AnalyticsWorker, GraphMetrics, compute_metrics, METRICS
+from .events import EventBroker, Subscription, resync_event
+from .stats import FacetCounters, STRENGTH_BINS, strength_bin
+from .sync import ChangeFollower
+from .snapshot import GraphSnapshot, SharedSnapshot, SnapshotData
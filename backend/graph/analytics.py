@@ -0,0 +1,219 @@
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+logger = logging.getLogger(__name__)
+
+PAGERANK_DAMPING = 0.85
+PAGERANK_TOLERANCE = 1e-10
+PAGERANK_MAX_ITERATIONS = 100
+# Betweenness is estimated from shortest paths out of this many sampled sources
+BETWEENNESS_SAMPLES = 64
+BETWEENNESS_BATCH = 32
+
+METRICS = ("degree", "weighted_degree", "pagerank", "betweenness")
+
+
+@dataclass
+class GraphMetrics:
+    """Per-node metrics for one graph version, aligned with `node_ids`
+
+    Links are treated as undirected. Components are numbered by size, 0 being
+    the largest.
+    """
+    version: int
+    node_ids: List[str]
+    link_count: int
+    degree: np.ndarray
+    weighted_degree: np.ndarray
+    pagerank: np.ndarray
+    betweenness: np.ndarray
+    component: np.ndarray
+    component_sizes: np.ndarray
+
+    def __post_init__(self):
+        self.position = {node_id: i for i, node_id in enumerate(self.node_ids)}
+
+    def node(self, node_id: str) -> Optional[dict]:
+        i = self.position.get(node_id)
+        if i is None:
+            return None
+        return {
+            "degree": int(self.degree[i]),
+            "weighted_degree": float(self.weighted_degree[i]),
+            "pagerank": float(self.pagerank[i]),
+            "betweenness": float(self.betweenness[i]),
+            "component": int(self.component[i]),
+        }
+
+    def top(self, metric: str, limit: int) -> List[Tuple[str, float]]:
+        """The `limit` highest-scoring node ids for a metric, ties broken by id"""
+        values = getattr(self, metric)
+        order = np.lexsort((np.arange(len(values)), -values))[:limit]
+        return [(self.node_ids[i], float(values[i])) for i in order]
+
+
+def adjacency_matrices(
+    node_ids: Sequence[str], links: Sequence[Tuple[str, str, float]]
+) -> Tuple[sparse.csr_matrix, sparse.csr_matrix, int]:
+    """Symmetric weighted and 0/1 adjacency matrices, plus the number of links used
+
+    Parallel links between the same pair add their strengths; self-loops are dropped.
+    """
+    n = len(node_ids)
+    index = {node_id: i for i, node_id in enumerate(node_ids)}
+    pairs = [(index[s], index[t], 1.0 if w is None else w) for s, t, w in links if s in index and t in index]
+    rows = np.array([s for s, _, _ in pairs], dtype=np.int64)
+    cols = np.array([t for _, t, _ in pairs], dtype=np.int64)
+    strength = np.array([w for _, _, w in pairs], dtype=np.float64)
+    keep = rows != cols
+    rows, cols, strength = rows[keep], cols[keep], strength[keep]
+
+    weighted = sparse.coo_matrix(
+        (np.concatenate([strength, strength]), (np.concatenate([rows, cols]), np.concatenate([cols, rows]))),
+        shape=(n, n),
+    ).tocsr()
+    weighted.sum_duplicates()
+    binary = weighted.copy()
+    binary.data[:] = 1.0
+    return weighted, binary, len(pairs)
+
+
+def pagerank(weighted: sparse.csr_matrix) -> np.ndarray:
+    """Weighted PageRank by power iteration; dangling nodes spread their rank uniformly"""
+    n = weighted.shape[0]
+    if n == 0:
+        return np.zeros(0)
+    out_weight = np.asarray(weighted.sum(axis=1)).ravel()
+    dangling = out_weight == 0
+    inverse = np.divide(1.0, out_weight, out=np.zeros(n), where=~dangling)
+    # Column-stochastic transition matrix, so rank flows along each edge in proportion to strength
+    transition = (sparse.diags(inverse) @ weighted).T.tocsr()
+
+    rank = np.full(n, 1.0 / n)
+    for _ in range(PAGERANK_MAX_ITERATIONS):
+        spread = PAGERANK_DAMPING * (transition @ rank + rank[dangling].sum() / n)
+        updated = spread + (1.0 - PAGERANK_DAMPING) / n
+        converged = np.abs(updated - rank).sum() < PAGERANK_TOLERANCE
+        rank = updated
+        if converged:
+            break
+    return rank / rank.sum()
+
+
+def approximate_betweenness(binary: sparse.csr_matrix, samples: int = BETWEENNESS_SAMPLES, seed: int = 0) -> np.ndarray:
+    """Normalized hop-count betweenness estimated from sampled sources (Brandes-Pich)
+
+    Each batch of sources runs one level-synchronous BFS as sparse matrix
+    products, counting shortest paths on the way out and accumulating
+    dependencies on the way back.
+    """
+    n = binary.shape[0]
+    if n < 3:
+        return np.zeros(n)
+    rng = np.random.default_rng(seed)
+    sources = np.arange(n) if n <= samples else rng.choice(n, size=samples, replace=False)
+
+    total = np.zeros(n)
+    for start in range(0, len(sources), BETWEENNESS_BATCH):
+        batch = sources[start:start + BETWEENNESS_BATCH]
+        columns = np.arange(len(batch))
+        sigma = np.zeros((n, len(batch)))
+        level = np.full((n, len(batch)), -1, dtype=np.int64)
+        sigma[batch, columns] = 1.0
+        level[batch, columns] = 0
+
+        frontier = sigma.copy()
+        depth = 0
+        while frontier.any():
+            reached = binary @ frontier
+            new = (reached > 0) & (level < 0)
+            depth += 1
+            level[new] = depth
+            sigma[new] = reached[new]
+            frontier = np.where(new, sigma, 0.0)
+
+        delta = np.zeros_like(sigma)
+        for d in range(depth, 0, -1):
+            at_level = level == d
+            share = np.divide(1.0 + delta, sigma, out=np.zeros_like(sigma), where=at_level)
+            parents = level == d - 1
+            delta[parents] += (sigma * (binary @ share))[parents]
+        delta[batch, columns] = 0.0
+        total += delta.sum(axis=1)
+
+    # Scale the sample up to all sources, count each undirected pair once, normalize to [0, 1]
+    total *= n / len(sources) / 2.0
+    return total / ((n - 1) * (n - 2) / 2.0)
+
+
+def compute_metrics(version: int, node_ids: List[str], links: Sequence[Tuple[str, str, float]]) -> GraphMetrics:
+    weighted, binary, link_count = adjacency_matrices(node_ids, links)
+    count, labels = connected_components(binary, directed=False)
+    sizes = np.bincount(labels, minlength=count)
+    # Renumber components largest first
+    rank_of = np.empty(count, dtype=np.int64)
+    rank_of[np.lexsort((np.arange(count), -sizes))] = np.arange(count)
+
+    return GraphMetrics(
+        version=version,
+        node_ids=list(node_ids),
+        link_count=link_count,
+        degree=np.diff(binary.indptr).astype(np.float64),
+        weighted_degree=np.asarray(weighted.sum(axis=1), dtype=np.float64).ravel(),
+        pagerank=pagerank(weighted),
+        betweenness=approximate_betweenness(binary),
+        component=rank_of[labels],
+        component_sizes=np.sort(sizes)[::-1],
+    )
+
+
+class AnalyticsWorker:
+    """Keeps the latest GraphMetrics, recomputing on a background thread
+
+    `request(version)` never blocks on a computation: it returns whatever result
+    is available (possibly for an older version, or None before the first run)
+    and schedules a recompute when that result is out of date.
+    """
+
+    def __init__(self, load_graph: Callable[[], Tuple[List[str], Sequence[Tuple[str, str, float]]]]):
+        self._load_graph = load_graph
+        self.result: Optional[GraphMetrics] = None
+        self._wanted: Optional[int] = None
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def request(self, version: int) -> Optional[GraphMetrics]:
+        with self._condition:
+            current = self.result is not None and self.result.version == version
+            if not current and self._wanted != version:
+                self._wanted = version
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="graph-analytics", daemon=True)
+                    self._thread.start()
+                self._condition.notify()
+            return self.result
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._wanted is None:
+                    self._condition.wait()
+                version = self._wanted
+            try:
+                node_ids, links = self._load_graph()
+                result = compute_metrics(version, node_ids, links)
+            except Exception:
+                logger.exception("Graph analytics failed for version %s", version)
+                result = None
+            with self._condition:
+                if result is not None:
+                    self.result = result
+                # A newer version may have been requested while this one ran
+                if self._wanted == version:
+                    self._wanted = None
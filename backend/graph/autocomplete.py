@@ -0,0 +1,487 @@
+"""Typeahead over node names: word prefixes from a sorted suffix array, typos through trigrams
+
+Names are normalised (case-folded, accents and punctuation dropped, words
+joined by single spaces) and indexed once per word, as the rest of the name
+from that word on. A query matches a name when each of its words starts one of
+successive words of the name: "riv col" finds "Mivelren River Collective". The
+suffixes are one sorted array of packed (slot, offset) integers into the
+normalised names, which are held once per node, so the names completing a
+one-word query are found with two binary searches, and a write moves part of
+one array. The earlier words of a longer query are first expanded to the
+indexed words they start ("riv col" to "river col", "riviera col", ...), each
+expansion again one range of the array.
+
+Matches are ranked by quality (the whole name, the start of the name, the
+start of a later word, then typo corrections) and then by degree. A prefix
+shared by more than SCAN_LIMIT suffixes is too common to rank by scanning on
+every keystroke: its range is narrowed with numpy over a per-slot degree array
+to the few names that can make the top, and the resulting ranking is cached
+and adjusted in place as names and degrees change.
+"""
+import re
+import unicodedata
+from array import array
+from collections import OrderedDict
+from heapq import nsmallest
+from itertools import islice, product
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+# Suggestions returned at most, and the length of each cached ranking
+MAX_SUGGESTIONS = 20
+# Prefixes matching more suffixes than this are ranked once and then kept up to date
+SCAN_LIMIT = 256
+# Common prefixes whose rankings are kept, least recently used dropped first
+TOP_CACHE_SIZE = 8192
+# Expansions of the earlier words of a query that are ranked; the walk stops after this many
+MAX_EXPANSIONS = 64
+# Words shorter than FUZZY_MIN_LENGTH are too ambiguous to correct; shorter than
+# FUZZY_LONG_WORD they may have one typo, longer ones two
+FUZZY_MIN_LENGTH = 3
+FUZZY_LONG_WORD = 8
+# Vocabulary words sharing the most trigrams with a misspelt word that are checked
+# by edit distance, corrections kept per word, and corrected queries tried per request
+FUZZY_CANDIDATES = 32
+FUZZY_CORRECTIONS = 3
+FUZZY_QUERIES = 9
+
+# Match kinds, best first; a ranking starts with the kind's position here
+MATCHES = ("exact", "prefix", "word", "fuzzy")
+
+_OFFSET_BITS = 16
+_OFFSET_MASK = (1 << _OFFSET_BITS) - 1
+_LAST_ENTRY = (1 << 63) - 1
+# Sorts after every character, so `prefix + _LAST` bounds the suffixes starting with `prefix`
+_LAST = "\U0010ffff"
+_WORD = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    """Case-fold, drop accents and punctuation, and join the words with single spaces"""
+    text = text.casefold()
+    if not text.isascii():
+        text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return " ".join(_WORD.findall(text))
+
+
+def word_starts(key: str) -> List[int]:
+    """Offsets of the words in a normalised name (words past 64K characters are not indexed)"""
+    starts = [0] if key else []
+    position = key.find(" ")
+    while 0 <= position < _OFFSET_MASK:
+        starts.append(position + 1)
+        position = key.find(" ", position + 1)
+    return starts
+
+
+def trigrams(word: str) -> Set[str]:
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def prefix_typos(word: str, other: str, limit: int) -> int:
+    """Fewest edits (insertions, deletions, substitutions, swaps of neighbours) turning
+    `word` into `other` or a prefix of it, or limit + 1 when that takes more than `limit`"""
+    other = other[:len(word) + limit]
+    width, over = len(other), limit + 1
+    # Only cells within `limit` of the diagonal can stay within `limit`
+    previous2, previous = None, [j if j <= limit else over for j in range(width + 1)]
+    for i in range(1, len(word) + 1):
+        current = [over] * (width + 1)
+        if i <= limit:
+            current[0] = i
+        letter, before = word[i - 1], word[i - 2] if i > 1 else None
+        best = current[0]
+        for j in range(max(1, i - limit), min(width, i + limit) + 1):
+            value = previous[j - 1] if letter == other[j - 1] else previous[j - 1] + 1
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if j > 1 and letter == other[j - 2] and before == other[j - 1] and previous2[j - 2] + 1 < value:
+                value = previous2[j - 2] + 1
+            current[j] = value if value < over else over
+            if value < best:
+                best = value
+        if best > limit:
+            return over
+        previous2, previous = previous, current
+    return min(min(previous[max(0, len(word) - limit):]), over)
+
+
+class NameIndex:
+    """Node names for typeahead lookups, updated one node at a time
+
+    `degree` gives a node's current degree by id; call `degree_changed` after it
+    changes so cached rankings stay right. Not thread-safe on its own.
+    """
+
+    def __init__(self, degree: Callable[[str], int]):
+        self.degree = degree
+        self.clear()
+
+    def clear(self):
+        self.ids: List[Optional[str]] = []  # node id per slot, None for a free slot
+        self.keys: List[str] = []  # normalised name per slot
+        self.slots: Dict[str, int] = {}
+        self.free: List[int] = []
+        self.slot_degrees = array("i")  # degree per slot, as of the last degree_changed
+        self.suffixes = array("q")  # slot << _OFFSET_BITS | offset, ordered by (suffix, value)
+        self.words: Dict[str, int] = {}  # names containing each word, counted per occurrence
+        self.word_ids: Dict[str, int] = {}
+        self.vocabulary: List[Optional[str]] = []  # word per word id, None for a free id
+        self.free_words: List[int] = []
+        self.word_lengths = array("i")  # length per word id, 0 for a free id
+        self.trigrams: Dict[str, Set[int]] = {}  # ids of the vocabulary words containing each trigram
+        self.postings: Dict[str, np.ndarray] = {}  # trigrams' word ids as arrays, built when first needed
+        self.top: "OrderedDict[str, list]" = OrderedDict()  # rankings of common prefixes
+        self.heads: "OrderedDict[str, List[Tuple[str, int, int]]]" = OrderedDict()  # expansions of earlier words
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def load(self, names: Iterable[Tuple[str, str]]):
+        """Replace the contents with (node id, name) pairs"""
+        self.clear()
+        buckets: Dict[str, List[int]] = {}
+        for node_id, name in names:
+            key = normalize(name)
+            slot = len(self.ids)
+            self.ids.append(node_id)
+            self.keys.append(key)
+            self.slot_degrees.append(self.degree(node_id))
+            self.slots[node_id] = slot
+            for offset in word_starts(key):
+                buckets.setdefault(key[offset], []).append(slot << _OFFSET_BITS | offset)
+            self._count_words(key, 1)
+        # Sorting one leading character at a time bounds the temporary suffix strings;
+        # the sort is stable, so equal suffixes stay in ascending value order
+        keys = self.keys
+        for first in sorted(buckets):
+            bucket = buckets.pop(first)
+            bucket.sort(key=lambda entry: keys[entry >> _OFFSET_BITS][entry & _OFFSET_MASK:])
+            self.suffixes.extend(bucket)
+
+    # Mutations
+
+    def upsert(self, node_id: str, name: str):
+        slot = self.slots.get(node_id)
+        key = normalize(name)
+        if slot is not None:
+            if self.keys[slot] == key:
+                return
+            self.remove(node_id)
+        slot = self.free.pop() if self.free else len(self.ids)
+        if slot == len(self.ids):
+            self.ids.append(node_id)
+            self.keys.append(key)
+            self.slot_degrees.append(0)
+        else:
+            self.ids[slot], self.keys[slot] = node_id, key
+        self.slot_degrees[slot] = self.degree(node_id)
+        self.slots[node_id] = slot
+        for offset in word_starts(key):
+            entry = slot << _OFFSET_BITS | offset
+            self.suffixes.insert(self._bisect(key[offset:], entry), entry)
+        self._count_words(key, 1)
+        self.heads.clear()
+        self._offer(slot)
+
+    def remove(self, node_id: str):
+        slot = self.slots.pop(node_id, None)
+        if slot is None:
+            return
+        key = self.keys[slot]
+        self._forget(slot)
+        for offset in word_starts(key):
+            del self.suffixes[self._bisect(key[offset:], slot << _OFFSET_BITS | offset)]
+        self._count_words(key, -1)
+        self.heads.clear()
+        self.ids[slot], self.keys[slot] = None, ""
+        self.free.append(slot)
+
+    def degree_changed(self, node_id: str, grew: bool):
+        slot = self.slots.get(node_id)
+        if slot is None:
+            return
+        self.slot_degrees[slot] = self.degree(node_id)
+        if grew:
+            self._offer(slot)
+        else:
+            self._forget(slot)
+
+    # Queries
+
+    def complete(self, q: str, limit: int) -> List[Tuple[str, str, int]]:
+        """(node id, match kind, degree) for the best `limit` names completing `q`"""
+        query = normalize(q)
+        if not query:
+            return []
+        limit = min(limit, MAX_SUGGESTIONS)
+        ranked = self._ranked(query, limit)
+        suggestions = [(rank[-1], MATCHES[rank[0]], -rank[1]) for rank in ranked]
+        if len(suggestions) < limit:
+            seen = {node_id for node_id, _, _ in suggestions}
+            for rank in self._fuzzy(query, limit):
+                node_id = rank[-1]
+                if node_id not in seen:
+                    seen.add(node_id)
+                    suggestions.append((node_id, MATCHES[rank[0]], -rank[3]))
+                    if len(suggestions) == limit:
+                        break
+        return suggestions
+
+    # Internals
+
+    def _bisect(self, suffix: str, entry: int, lo: int = 0, hi: Optional[int] = None) -> int:
+        """Position of (suffix, entry) in the sorted suffix array, or in its part from `lo` to `hi`"""
+        keys, suffixes = self.keys, self.suffixes
+        if hi is None:
+            hi = len(suffixes)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            other = suffixes[mid]
+            other_suffix = keys[other >> _OFFSET_BITS][other & _OFFSET_MASK:]
+            if other_suffix < suffix or (other_suffix == suffix and other < entry):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _range(self, prefix: str, lo: int = 0, hi: Optional[int] = None) -> Tuple[int, int]:
+        lo = self._bisect(prefix, -1, lo, hi)
+        return lo, self._bisect(prefix + _LAST, -1, lo, hi)
+
+    def _rank(self, slot: int, prefix: str) -> tuple:
+        """Sort key of a name matching `prefix`: match kind, degree, shorter names, then name and id"""
+        key = self.keys[slot]
+        kind = 0 if key == prefix else 1 if key.startswith(prefix) else 2
+        return kind, -self.slot_degrees[slot], len(key), key, self.ids[slot]
+
+    def _ranked(self, query: str, limit: int) -> list:
+        """Rankings of the best `limit` names whose successive words start with the words of `query`"""
+        if " " not in query:
+            return self._ranked_prefix(query, limit)
+        split = query.rfind(" ") + 1
+        best: Dict[str, tuple] = {}
+        for head, lo, hi in self._expansions(query[:split]):
+            prefix = head + query[split:]
+            if prefix == query:
+                ranking = self._ranked_prefix(prefix, limit, lo, hi)
+            else:
+                # Names equal to the expansion rank as exact matches of it, but only start with
+                # the query: rank them as such, scanning the range when they crowd out the rest
+                ranking = self._ranked_prefix(prefix, MAX_SUGGESTIONS, lo, hi)
+                exact = sum(1 for rank in ranking if rank[0] == 0)
+                if exact and len(ranking) == MAX_SUGGESTIONS and MAX_SUGGESTIONS - exact < limit:
+                    lo, hi = self._range(prefix, lo, hi)
+                    slots = {entry >> _OFFSET_BITS for entry in self.suffixes[lo:hi]}
+                    ranking = [self._rank(slot, prefix) for slot in slots]
+                ranking = [(1,) + rank[1:] if rank[0] == 0 else rank for rank in ranking]
+            for rank in ranking:
+                if rank[-1] not in best or rank < best[rank[-1]]:
+                    best[rank[-1]] = rank
+        return nsmallest(limit, best.values())
+
+    def _expansions(self, words: str) -> List[Tuple[str, int, int]]:
+        """(head, lo, hi) for each way to complete every one of `words` (each followed by a space)
+        to an indexed word, where lo and hi bound the suffixes starting with the head
+
+        Only combinations that some name holds as successive words are kept, so
+        appending the query's last word to a head gives one range of suffixes,
+        found within the head's. A word that starts more than MAX_EXPANSIONS
+        indexed words is expanded to the first of them.
+        """
+        heads = self.heads.get(words)
+        if heads is None:
+            heads = [("", 0, len(self.suffixes))]
+            for word in words.split():
+                heads = [
+                    expansion for stem, lo, hi in heads
+                    for expansion in islice(self._completions(stem + word, lo, hi), MAX_EXPANSIONS)
+                ][:MAX_EXPANSIONS]
+            self.heads[words] = heads
+            if len(self.heads) > TOP_CACHE_SIZE:
+                self.heads.popitem(last=False)
+        else:
+            self.heads.move_to_end(words)
+        return heads
+
+    def _completions(self, start: str, lo: int, hi: int) -> Iterator[Tuple[str, int, int]]:
+        """(`start` with its last word completed and a space added, lo, hi) for each completion some suffix
+        continues, looking between `lo` and `hi`
+
+        The suffixes beginning with one completion sort together, those ending
+        with it first, so the walk jumps from one completion to the next.
+        """
+        keys, suffixes = self.keys, self.suffixes
+        position, end = self._range(start, lo, hi)
+        while position < end:
+            entry = suffixes[position]
+            suffix = keys[entry >> _OFFSET_BITS][entry & _OFFSET_MASK:]
+            word_end = suffix.find(" ", len(start))
+            stem = suffix if word_end < 0 else suffix[:word_end]
+            first, position = position, self._bisect(stem + " " + _LAST, -1, position, end)
+            entry = suffixes[position - 1]
+            if len(keys[entry >> _OFFSET_BITS]) - (entry & _OFFSET_MASK) > len(stem):
+                yield stem + " ", first, position
+
+    def _ranked_prefix(self, prefix: str, limit: int, lo: int = 0, hi: Optional[int] = None) -> list:
+        """Rankings of the best `limit` names with a suffix starting with `prefix`, all of them between `lo` and `hi`"""
+        lo, hi = self._range(prefix, lo, hi)
+        if hi - lo <= SCAN_LIMIT:
+            slots = {entry >> _OFFSET_BITS for entry in self.suffixes[lo:hi]}
+            return nsmallest(limit, (self._rank(slot, prefix) for slot in slots))
+        ranking = self.top.get(prefix)
+        if ranking is None:
+            ranking = self.top[prefix] = self._best(lo, hi, prefix)
+            if len(self.top) > TOP_CACHE_SIZE:
+                self.top.popitem(last=False)
+        else:
+            self.top.move_to_end(prefix)
+        return ranking[:limit]
+
+    def _best(self, lo: int, hi: int, prefix: str) -> list:
+        """The MAX_SUGGESTIONS best names in a long range, ranking only those that can make it
+
+        Names whose ranking key could beat the cut-off are found by (starts the
+        name, degree) alone; exact matches, which beat every other kind, sort
+        first in the range and are added by hand.
+        """
+        entries = np.frombuffer(self.suffixes[lo:hi], dtype=np.int64)
+        slots = entries >> _OFFSET_BITS
+        later = (entries & _OFFSET_MASK) != 0
+        score = (later.astype(np.int64) << 32) - np.frombuffer(self.slot_degrees, dtype=np.int32)[slots]
+        position = MAX_SUGGESTIONS
+        while True:
+            # Everything tied with the cut-off is kept, so the ranking below stays exact
+            cutoff = np.partition(score, min(position, len(score)) - 1)[min(position, len(score)) - 1]
+            candidates = set(slots[score <= cutoff].tolist())
+            if len(candidates) >= MAX_SUGGESTIONS or position >= len(score):
+                break
+            position *= 2
+        exact_hi = self._bisect(prefix, _LAST_ENTRY, lo, hi)
+        candidates.update(entry >> _OFFSET_BITS for entry in self.suffixes[lo:exact_hi] if not entry & _OFFSET_MASK)
+        return nsmallest(MAX_SUGGESTIONS, (self._rank(slot, prefix) for slot in candidates))
+
+    def _cached_prefixes(self, slot: int) -> Iterator[str]:
+        """Prefixes with a cached ranking that the name in `slot` matches"""
+        if not self.top:
+            return
+        key, found = self.keys[slot], set()
+        for offset in word_starts(key):
+            for end in range(offset + 1, len(key) + 1):
+                prefix = key[offset:end]
+                if prefix in self.top and prefix not in found:
+                    found.add(prefix)
+                    yield prefix
+
+    def _offer(self, slot: int):
+        """Re-rank a node that is new or better connected in the cached rankings it matches"""
+        node_id = self.ids[slot]
+        for prefix in list(self._cached_prefixes(slot)):
+            rank = self._rank(slot, prefix)
+            ranking = [other for other in self.top[prefix] if other[-1] != node_id]
+            if len(ranking) < MAX_SUGGESTIONS or rank < ranking[-1]:
+                ranking.append(rank)
+                ranking.sort()
+                del ranking[MAX_SUGGESTIONS:]
+            self.top[prefix] = ranking
+
+    def _forget(self, slot: int):
+        """Drop the cached rankings a node leaves or falls in; the next lookup ranks them again"""
+        node_id = self.ids[slot]
+        for prefix in list(self._cached_prefixes(slot)):
+            if any(rank[-1] == node_id for rank in self.top[prefix]):
+                del self.top[prefix]
+
+    def _count_words(self, key: str, change: int):
+        for word in key.split():
+            count = self.words.get(word, 0) + change
+            if count > 0:
+                if word not in self.words:
+                    self._add_word(word)
+                self.words[word] = count
+            else:
+                del self.words[word]
+                self._drop_word(word)
+
+    def _add_word(self, word: str):
+        word_id = self.free_words.pop() if self.free_words else len(self.vocabulary)
+        if word_id == len(self.vocabulary):
+            self.vocabulary.append(word)
+            self.word_lengths.append(len(word))
+        else:
+            self.vocabulary[word_id], self.word_lengths[word_id] = word, len(word)
+        self.word_ids[word] = word_id
+        for gram in trigrams(word):
+            self.trigrams.setdefault(gram, set()).add(word_id)
+            self.postings.pop(gram, None)
+
+    def _drop_word(self, word: str):
+        word_id = self.word_ids.pop(word)
+        for gram in trigrams(word):
+            holders = self.trigrams[gram]
+            holders.discard(word_id)
+            if not holders:
+                del self.trigrams[gram]
+            self.postings.pop(gram, None)
+        self.vocabulary[word_id], self.word_lengths[word_id] = None, 0
+        self.free_words.append(word_id)
+
+    def _posting(self, gram: str) -> np.ndarray:
+        posting = self.postings.get(gram)
+        if posting is None:
+            posting = self.postings[gram] = np.fromiter(self.trigrams[gram], dtype=np.int32)
+        return posting
+
+    def _corrections(self, word: str) -> List[Tuple[int, str]]:
+        """(typos, vocabulary word) for the words `word` is a misspelling of, or of the start of, best first"""
+        limit = 1 if len(word) < FUZZY_LONG_WORD else 2
+        postings = [self._posting(gram) for gram in trigrams(word) if gram in self.trigrams]
+        if not postings:
+            return []
+        # Trigrams shared with each vocabulary word long enough to be within `limit`
+        shared = np.bincount(np.concatenate(postings), minlength=len(self.vocabulary))
+        shared[np.frombuffer(self.word_lengths, dtype=np.int32) < len(word) - limit] = 0
+        candidates = np.flatnonzero(shared)
+        if len(candidates) > FUZZY_CANDIDATES:
+            cutoff = -np.partition(-shared[candidates], FUZZY_CANDIDATES - 1)[FUZZY_CANDIDATES - 1]
+            candidates = candidates[shared[candidates] >= cutoff]
+        found = []
+        for word_id in candidates[np.argsort(-shared[candidates], kind="stable")][:FUZZY_CANDIDATES].tolist():
+            other = self.vocabulary[word_id]
+            typos = prefix_typos(word, other, limit)
+            if typos <= limit:
+                found.append((typos, -self.words[other], other))
+        return [(typos, other) for typos, _, other in sorted(found)[:FUZZY_CORRECTIONS]]
+
+    def _fuzzy(self, query: str, limit: int) -> list:
+        """Rankings of names matching `query` once its unknown words are replaced by close ones
+
+        A word is unknown when no indexed word starts with it. The rankings are
+        those of the corrected queries, led by the "fuzzy" kind and the number
+        of typos corrected.
+        """
+        options = []
+        for word in query.split():
+            lo, hi = self._range(word)
+            if lo < hi:
+                options.append([(0, word)])
+            elif len(word) >= FUZZY_MIN_LENGTH:
+                corrections = self._corrections(word)
+                if not corrections:
+                    return []
+                options.append(corrections)
+            else:
+                return []
+        if all(choices[0][0] == 0 and choices[0][1] == word for choices, word in zip(options, query.split())):
+            return []
+        ranked = []
+        for choice in islice(product(*options), FUZZY_QUERIES):
+            typos = sum(count for count, _ in choice)
+            for rank in self._ranked(" ".join(word for _, word in choice), limit):
+                ranked.append((len(MATCHES) - 1, typos) + rank)
+        ranked.sort()
+        return ranked
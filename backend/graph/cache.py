@@ -0,0 +1,114 @@
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, Optional
+
+
+class GraphVersion:
+    """Monotonic counter bumped by every write to the graph"""
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    @property
+    def current(self) -> int:
+        return self._value
+
+    def bump(self) -> int:
+        with self._lock:
+            self._value += 1
+            return self._value
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    version: int
+    etag: str
+    body: bytes
+
+
+ETAG_DIGEST_SIZE = 16
+
+
+def etag_of(digest) -> str:
+    """Strong ETag from a blake2b digest (of ETAG_DIGEST_SIZE bytes) of the response bytes, possibly fed in pieces"""
+    return '"%s"' % digest.hexdigest()
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag derived from the exact response bytes"""
+    return etag_of(hashlib.blake2b(body, digest_size=ETAG_DIGEST_SIZE))
+
+
+# Cached bodies may add up to this many bytes; filtered /api/graph-data variants can each be tens of MB
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class ResponseCache:
+    """Serialized response bodies keyed by request, valid for one graph version
+
+    Bounded both by entry count and by the total size of the bodies, so many
+    large variants of one request cannot hold max_entries full copies of the graph.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: Dict[Hashable, CachedResponse] = {}
+        self._lock = threading.Lock()
+        self.size = 0  # bytes of the bodies held
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, version: int) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None or entry.version != version:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, key: Hashable, version: int, body: bytes) -> CachedResponse:
+        entry = CachedResponse(version=version, etag=make_etag(body), body=body)
+        if len(body) > self.max_bytes:
+            # Served once, never kept; caching it would evict everything else
+            self.discard(key)
+            return entry
+        with self._lock:
+            self._remove(key)
+            # Drop stale versions first, then the oldest keys until the entry fits
+            if self._full(len(body)):
+                for stale in [k for k, e in self._entries.items() if e.version != version]:
+                    self._remove(stale)
+            while self._full(len(body)):
+                self._remove(next(iter(self._entries)))
+            self._entries[key] = entry
+            self.size += len(body)
+        return entry
+
+    def _full(self, incoming: int) -> bool:
+        return len(self._entries) >= self.max_entries or self.size + incoming > self.max_bytes
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry.body)
+
+    def get_or_build(self, key: Hashable, version: int, build: Callable[[], bytes]) -> CachedResponse:
+        entry = self.get(key, version)
+        if entry is None:
+            entry = self.put(key, version, build())
+        return entry
+
+    def discard(self, key: Hashable):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
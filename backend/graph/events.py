@@ -0,0 +1,81 @@
+import asyncio
+import threading
+from typing import Optional, Set
+
+# Events a subscriber may fall behind by before its backlog is dropped
+EVENT_QUEUE_SIZE = 256
+
+
+def resync_event(seq: Optional[int], reason: str) -> dict:
+    """Tell a subscriber to catch up through /api/changes from the last seq it applied"""
+    return {"op": "resync", "seq": seq, "reason": reason}
+
+
+class Subscription:
+    """One subscriber's bounded queue, owned by the event loop serving its connection"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, types: Optional[Set[str]], max_queue: int):
+        self.loop = loop
+        self.types = types
+        self.queue: asyncio.Queue = asyncio.Queue(max_queue)
+        self.dropped = 0
+
+    def matches(self, event: dict) -> bool:
+        # Events whose node types are unknown (None) go to every subscriber
+        if self.types is None or event["op"] == "resync" or event.get("types") is None:
+            return True
+        return any(node_type in self.types for node_type in event["types"])
+
+    def offer(self, event: dict):
+        """Queue an event; a full queue is discarded and replaced by a single resync event"""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+                self.dropped += 1
+            self.dropped += 1
+            self.queue.put_nowait(resync_event(event.get("seq"), "overflow"))
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+
+class EventBroker:
+    """In-process fan-out of graph mutation events to connected subscribers
+
+    `publish` may be called from any thread (the write endpoints run in the
+    threadpool); each event is handed to the subscriber's own event loop.
+    """
+
+    def __init__(self, max_queue: int = EVENT_QUEUE_SIZE):
+        self.max_queue = max_queue
+        self._subscriptions: Set[Subscription] = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, types: Optional[Set[str]] = None) -> Subscription:
+        """Register a subscriber; must be called from the event loop that will consume it"""
+        subscription = Subscription(asyncio.get_running_loop(), types, self.max_queue)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscriptions)
+
+    def publish(self, event: dict):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if not subscription.matches(event):
+                continue
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # The subscriber's loop has shut down without unsubscribing
+                self.unsubscribe(subscription)
@@ -0,0 +1,234 @@
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .autocomplete import NameIndex
+from .paths import shortest_paths
+
+
+@dataclass
+class IndexedNode:
+    id: str
+    name: str
+    type: str
+
+
+@dataclass
+class IndexedLink:
+    id: str
+    source_id: str
+    target_id: str
+    relationship_type: str
+    strength: float
+
+
+class AdjacencyIndex:
+    """In-memory adjacency lists over the links table, kept in step with the write endpoints
+
+    The index is loaded lazily on first use. Mutations that arrive before that are
+    ignored, since the eventual load reads the committed state anyway.
+
+    Path searches run outside the lock on a view: shallow copies of the three
+    dicts, taken at most once between writes. The link sets in a view are shared
+    with the index, so a write copies a node's set before its first change after
+    a view was taken, and readers never see a set change under them.
+    """
+
+    def __init__(self):
+        self.nodes: Dict[str, IndexedNode] = {}
+        self.links: Dict[str, IndexedLink] = {}
+        self.adjacency: Dict[str, Set[str]] = {}
+        self.names = NameIndex(self.degree)
+        self.loaded = False
+        self._lock = threading.RLock()
+        self._view: Optional[Tuple[Dict[str, IndexedNode], Dict[str, IndexedLink], Dict[str, Set[str]]]] = None
+        self._shared = False  # whether link sets may be shared with a view still in use
+        self._copied: Set[str] = set()  # nodes whose link sets were copied since the last view
+
+    def load(self, nodes: Iterable[Tuple], links: Iterable[Tuple]):
+        """Replace the index contents with (id, name, type) and (id, source, target, type, strength) rows"""
+        with self._lock:
+            self.nodes = {}
+            self.links = {}
+            self.adjacency = {}
+            self._unshare()
+            for row in nodes:
+                self._add_node(IndexedNode(*row))
+            for row in links:
+                self._add_link(IndexedLink(*row))
+            self.names.load((node.id, node.name) for node in self.nodes.values())
+            self.loaded = True
+
+    def reset(self):
+        with self._lock:
+            self.nodes = {}
+            self.links = {}
+            self.adjacency = {}
+            self._unshare()
+            self.names.clear()
+            self.loaded = False
+
+    def _unshare(self):
+        self._view, self._shared, self._copied = None, False, set()
+
+    # Mutations
+
+    def _incident(self, node_id: str) -> Set[str]:
+        """A node's link set, ready to change in place"""
+        self._view = None
+        incident = self.adjacency.get(node_id)
+        if incident is None:
+            incident = self.adjacency[node_id] = set()
+        elif self._shared and node_id not in self._copied:
+            incident = self.adjacency[node_id] = set(incident)
+            self._copied.add(node_id)
+        return incident
+
+    def _add_node(self, node: IndexedNode):
+        self._view = None
+        self.nodes[node.id] = node
+        self.adjacency.setdefault(node.id, set())
+
+    def _add_link(self, link: IndexedLink):
+        if link.strength is None:
+            link.strength = 1.0
+        self.links[link.id] = link
+        self._incident(link.source_id).add(link.id)
+        self._incident(link.target_id).add(link.id)
+
+    def upsert_node(self, node_id: str, name: str, node_type: str):
+        with self._lock:
+            if self.loaded:
+                self._add_node(IndexedNode(node_id, name, node_type))
+                self.names.upsert(node_id, name)
+
+    def remove_node(self, node_id: str):
+        """Remove a node together with every link touching it"""
+        with self._lock:
+            if not self.loaded:
+                return
+            self.names.remove(node_id)
+            for link_id in list(self.adjacency.get(node_id, ())):
+                self._remove_link(link_id)
+            self._view = None
+            self.adjacency.pop(node_id, None)
+            self.nodes.pop(node_id, None)
+
+    def add_link(self, link_id: str, source_id: str, target_id: str, relationship_type: str, strength: float):
+        with self._lock:
+            if self.loaded:
+                self._add_link(IndexedLink(link_id, source_id, target_id, relationship_type, strength))
+                self.names.degree_changed(source_id, grew=True)
+                self.names.degree_changed(target_id, grew=True)
+
+    def _remove_link(self, link_id: str):
+        link = self.links.pop(link_id, None)
+        if link is None:
+            return
+        self._view = None
+        for node_id in (link.source_id, link.target_id):
+            if node_id in self.adjacency:
+                self._incident(node_id).discard(link_id)
+            self.names.degree_changed(node_id, grew=False)
+
+    def remove_link(self, link_id: str):
+        with self._lock:
+            if self.loaded:
+                self._remove_link(link_id)
+
+    # Queries
+
+    def degree(self, node_id: str) -> int:
+        return len(self.adjacency.get(node_id, ()))
+
+    def complete(self, q: str, limit: int) -> List[Tuple[IndexedNode, str, int]]:
+        """(node, match kind, degree) for the names best completing `q`, see graph/autocomplete.py"""
+        with self._lock:
+            return [(self.nodes[node_id], match, degree) for node_id, match, degree in self.names.complete(q, limit)]
+
+    def neighbors(self, node_id: str) -> List[Tuple[IndexedLink, IndexedNode]]:
+        """Links incident to a node paired with the node on the other end"""
+        with self._lock:
+            result = []
+            for link_id in sorted(self.adjacency.get(node_id, ())):
+                link = self.links[link_id]
+                other_id = link.target_id if link.source_id == node_id else link.source_id
+                other = self.nodes.get(other_id)
+                if other is not None:
+                    result.append((link, other))
+            return result
+
+    def subgraph(
+        self,
+        node_id: str,
+        depth: int = 1,
+        types: Optional[Set[str]] = None,
+        min_strength: Optional[float] = None,
+    ) -> Tuple[List[IndexedNode], List[IndexedLink]]:
+        """Nodes within `depth` hops of `node_id` and the links among them
+
+        Traversal only passes through links with at least `min_strength` and through
+        nodes whose type is in `types`; the start node is always included.
+        """
+        with self._lock:
+            def allowed(link: IndexedLink) -> bool:
+                return min_strength is None or link.strength >= min_strength
+
+            visited = {node_id}
+            frontier = deque([(node_id, 0)])
+            while frontier:
+                current, distance = frontier.popleft()
+                if distance == depth:
+                    continue
+                for link_id in self.adjacency.get(current, ()):
+                    link = self.links[link_id]
+                    if not allowed(link):
+                        continue
+                    other_id = link.target_id if link.source_id == current else link.source_id
+                    if other_id in visited:
+                        continue
+                    other = self.nodes.get(other_id)
+                    if other is None or (types and other.type not in types):
+                        continue
+                    visited.add(other_id)
+                    frontier.append((other_id, distance + 1))
+
+            links = {}
+            for current in visited:
+                for link_id in self.adjacency.get(current, ()):
+                    link = self.links[link_id]
+                    if allowed(link) and link.source_id in visited and link.target_id in visited:
+                        links[link_id] = link
+            nodes = [self.nodes[n] for n in sorted(visited) if n in self.nodes]
+            return nodes, [links[link_id] for link_id in sorted(links)]
+
+    def paths(
+        self, source_id: str, target_id: str, k: int = 1, weighted: bool = False
+    ) -> List[Tuple[float, List[IndexedNode], List[IndexedLink]]]:
+        """Up to `k` cheapest loopless paths between two nodes as (cost, nodes, links)
+
+        The search runs on a view of the index as of the last write, without
+        holding the lock, so writes are not held up by long searches.
+        """
+        nodes, links, adjacency = self._read_view()
+        return [
+            (path.cost, [nodes[n] for n in path.node_ids], [links[l] for l in path.link_ids])
+            for path in shortest_paths(adjacency, links, source_id, target_id, k=k, weighted=weighted)
+        ]
+
+    def _read_view(self) -> Tuple[Dict[str, IndexedNode], Dict[str, IndexedLink], Dict[str, Set[str]]]:
+        with self._lock:
+            if self._view is None:
+                self._view = (dict(self.nodes), dict(self.links), dict(self.adjacency))
+                self._shared, self._copied = True, set()
+            return self._view
+
+    def snapshot(self) -> Tuple[List[str], List[Tuple[str, str, float]]]:
+        """Sorted node ids and (source_id, target_id, strength) for every link, read consistently"""
+        with self._lock:
+            edges = [
+                (link.source_id, link.target_id, link.strength)
+                for _, link in sorted(self.links.items())
+            ]
+            return sorted(self.nodes), edges
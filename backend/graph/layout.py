@@ -0,0 +1,225 @@
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Graphs up to this size get exact pairwise repulsion; larger ones use the FFT mesh
+EXACT_REPULSION_LIMIT = 500
+COLD_ITERATIONS = 200
+WARM_ITERATIONS = 40
+# Output coordinates are in units of the ideal edge length times this factor
+LAYOUT_SCALE = 40.0
+GRAVITY = 0.02
+
+Positions = Dict[str, Tuple[float, float]]
+
+
+def _exact_repulsion(pos: np.ndarray, block: int = 1024) -> np.ndarray:
+    """Fruchterman-Reingold repulsion k^2/d between every pair of nodes (k = 1)"""
+    x, y = pos[:, 0], pos[:, 1]
+    force = np.empty_like(pos)
+    for start in range(0, len(pos), block):
+        dx = x[start:start + block, None] - x[None, :]
+        dy = y[start:start + block, None] - y[None, :]
+        inverse = dx * dx + dy * dy
+        np.maximum(inverse, 1e-4, out=inverse)
+        np.reciprocal(inverse, out=inverse)
+        force[start:start + block, 0] = np.einsum("ij,ij->i", dx, inverse)
+        force[start:start + block, 1] = np.einsum("ij,ij->i", dy, inverse)
+    return force
+
+
+class _MeshRepulsion:
+    """Approximate all-pairs repulsion by convolving a density grid with the force kernel
+
+    A particle-mesh stand-in for Barnes-Hut: nodes are binned onto a G x G grid,
+    the field is one FFT convolution with r / |r|^2, and each node reads the
+    force at its cell. Cost per iteration is O(n + G^2 log G).
+    """
+
+    def __init__(self, n: int):
+        self.size = int(np.clip(2 ** round(np.log2(max(np.sqrt(n), 1))), 32, 512))
+        g = self.size
+        # Kernel over cell offsets in [-(g-1), g-1], zero-padded for a linear convolution
+        offsets = np.fft.fftfreq(2 * g, 1.0 / (2 * g))
+        dx, dy = np.meshgrid(offsets, offsets, indexing="ij")
+        dist2 = dx * dx + dy * dy
+        dist2[0, 0] = 1.0
+        self.kernel_x = np.fft.rfft2(np.where(dist2 > 0, dx / dist2, 0.0))
+        self.kernel_y = np.fft.rfft2(np.where(dist2 > 0, dy / dist2, 0.0))
+
+    def __call__(self, pos: np.ndarray) -> np.ndarray:
+        g = self.size
+        low = pos.min(axis=0)
+        cell = max(float((pos.max(axis=0) - low).max()) / (g - 1), 1e-9)
+        ij = np.clip(((pos - low) / cell).astype(np.int64), 0, g - 1)
+        flat = ij[:, 0] * g + ij[:, 1]
+        density = np.bincount(flat, minlength=g * g).reshape(g, g).astype(np.float64)
+
+        spectrum = np.fft.rfft2(density, s=(2 * g, 2 * g))
+        field_x = np.fft.irfft2(spectrum * self.kernel_x, s=(2 * g, 2 * g))[:g, :g]
+        field_y = np.fft.irfft2(spectrum * self.kernel_y, s=(2 * g, 2 * g))[:g, :g]
+        # Kernel distances are in cells; k^2 / d in layout units scales by 1 / cell
+        force = np.stack([field_x.ravel()[flat], field_y.ravel()[flat]], axis=1) / cell
+
+        # Nodes sharing a cell see no mesh force from each other; push them apart from the cell centre
+        centre = low + (ij + 0.5) * cell
+        crowded = density.ravel()[flat] > 1
+        force[crowded] += (pos[crowded] - centre[crowded]) / (cell * cell * 0.25)
+        return force
+
+
+def force_layout(
+    n: int,
+    edges: np.ndarray,
+    weights: Optional[np.ndarray] = None,
+    initial: Optional[np.ndarray] = None,
+    iterations: Optional[int] = None,
+    seed: int = 0,
+) -> np.ndarray:
+    """Fruchterman-Reingold layout of `n` nodes, returned as an (n, 2) array
+
+    `edges` is an (m, 2) array of node indices and `weights` scales their pull.
+    Rows of `initial` that are not NaN warm-start those nodes; the rest are
+    placed next to already positioned neighbours.
+    """
+    if n == 0:
+        return np.zeros((0, 2))
+    rng = np.random.default_rng(seed)
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    weights = np.ones(len(edges)) if weights is None else np.asarray(weights, dtype=np.float64)
+    side = np.sqrt(n)
+
+    warm = initial is not None and not np.isnan(initial).all()
+    if warm:
+        pos = _place_new_nodes(np.array(initial, dtype=np.float64) / LAYOUT_SCALE, edges, rng)
+        iterations = WARM_ITERATIONS if iterations is None else iterations
+        temperature = 0.05 * side
+    else:
+        pos = rng.uniform(0, side, size=(n, 2))
+        iterations = COLD_ITERATIONS if iterations is None else iterations
+        temperature = 0.1 * side
+
+    repulsion = _exact_repulsion if n <= EXACT_REPULSION_LIMIT else _MeshRepulsion(n)
+    source, target = edges[:, 0], edges[:, 1]
+    for step in range(iterations):
+        force = repulsion(pos)
+
+        delta = pos[target] - pos[source]
+        dist = np.sqrt(np.einsum("ij,ij->i", delta, delta)) + 1e-9
+        pull = delta * (dist * weights)[:, None]  # d^2 / k along the edge direction
+        for axis in (0, 1):
+            force[:, axis] += np.bincount(source, pull[:, axis], minlength=n)
+            force[:, axis] -= np.bincount(target, pull[:, axis], minlength=n)
+
+        force -= GRAVITY * (pos - pos.mean(axis=0))
+
+        # Move each node along its force, at most `step_size` far
+        magnitude = np.sqrt(np.einsum("ij,ij->i", force, force)) + 1e-9
+        step_size = temperature * (1.0 - step / iterations)
+        pos += force * (np.minimum(magnitude, step_size) / magnitude)[:, None]
+
+    pos -= pos.mean(axis=0)
+    return pos * LAYOUT_SCALE
+
+
+def _place_new_nodes(pos: np.ndarray, edges: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Put NaN rows at the mean of their positioned neighbours, or at random inside the layout"""
+    missing = np.isnan(pos[:, 0])
+    if not missing.any():
+        return pos
+    known = ~missing
+    low, high = pos[known].min(axis=0), pos[known].max(axis=0)
+    both = np.concatenate([edges, edges[:, ::-1]])
+    usable = both[missing[both[:, 0]] & known[both[:, 1]]]
+    total = np.zeros_like(pos)
+    count = np.bincount(usable[:, 0], minlength=len(pos)).astype(np.float64)
+    for axis in (0, 1):
+        total[:, axis] = np.bincount(usable[:, 0], pos[usable[:, 1], axis], minlength=len(pos))
+    anchored = missing & (count > 0)
+    pos[anchored] = total[anchored] / count[anchored, None] + rng.normal(0, 0.5, size=(anchored.sum(), 2))
+    floating = missing & (count == 0)
+    pos[floating] = rng.uniform(low, high + 1e-9, size=(floating.sum(), 2))
+    return pos
+
+
+@dataclass
+class Layout:
+    """Positions by node id, computed for one graph version"""
+    version: int
+    positions: Positions
+
+
+class LayoutWorker:
+    """Keeps the latest layout, recomputing on a background thread
+
+    Like AnalyticsWorker, `request(version)` never waits for a run: it returns
+    the last finished layout (possibly for an older version, or None before the
+    first run) and schedules a recompute when that is out of date. A recompute
+    starts from the previous positions, so after a small edit only a short warm
+    run is needed.
+    """
+
+    def __init__(self, load_graph: Callable[[], Tuple[List[str], Sequence[Tuple[str, str, float]]]]):
+        self._load_graph = load_graph
+        self.result: Optional[Layout] = None
+        self._wanted: Optional[int] = None
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def request(self, version: int) -> Optional[Layout]:
+        with self._condition:
+            current = self.result is not None and self.result.version == version
+            if not current and self._wanted != version:
+                self._wanted = version
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="graph-layout", daemon=True)
+                    self._thread.start()
+                self._condition.notify()
+            return self.result
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._wanted is None:
+                    self._condition.wait()
+                version = self._wanted
+                previous = self.result.positions if self.result is not None else None
+            try:
+                node_ids, links = self._load_graph()
+                result = Layout(version, compute_positions(node_ids, links, previous))
+            except Exception:
+                logger.exception("Graph layout failed for version %s", version)
+                result = None
+            with self._condition:
+                if result is not None:
+                    self.result = result
+                # A newer version may have been requested while this one ran
+                if self._wanted == version:
+                    self._wanted = None
+
+
+def compute_positions(
+    node_ids: List[str],
+    links: Sequence[Tuple[str, str, float]],
+    previous: Optional[Positions] = None,
+) -> Positions:
+    """Lay out nodes by id from (source_id, target_id, strength) links, reusing `previous` positions"""
+    index = {node_id: i for i, node_id in enumerate(node_ids)}
+    pairs = [(index[s], index[t], w if w is not None else 1.0) for s, t, w in links if s in index and t in index]
+    edges = np.array([(s, t) for s, t, _ in pairs], dtype=np.int64).reshape(-1, 2)
+    weights = np.array([w for _, _, w in pairs], dtype=np.float64)
+
+    initial = None
+    if previous:
+        initial = np.full((len(node_ids), 2), np.nan)
+        for node_id, i in index.items():
+            if node_id in previous:
+                initial[i] = previous[node_id]
+
+    pos = force_layout(len(node_ids), edges, weights, initial=initial)
+    return {node_id: (float(pos[i, 0]), float(pos[i, 1])) for node_id, i in index.items()}
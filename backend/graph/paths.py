@@ -0,0 +1,192 @@
+import heapq
+from typing import Dict, Iterator, List, Mapping, NamedTuple, Optional, Set, Tuple
+
+# Links are traversed in either direction. Weighted searches treat a link's
+# cost as 1 / strength, so the best path runs along the strongest relationships;
+# links with no positive strength are never used.
+
+
+class Path(NamedTuple):
+    cost: float
+    node_ids: List[str]
+    link_ids: List[str]
+
+
+class _Graph:
+    """Read-only view over AdjacencyIndex maps with nodes and links optionally masked out"""
+
+    def __init__(
+        self,
+        adjacency: Mapping[str, Set[str]],
+        links: Mapping,
+        weighted: bool,
+        banned_nodes: Set[str] = frozenset(),
+        banned_links: Set[str] = frozenset(),
+    ):
+        self.adjacency = adjacency
+        self.links = links
+        self.weighted = weighted
+        self.banned_nodes = banned_nodes
+        self.banned_links = banned_links
+
+    def cost(self, link) -> Optional[float]:
+        if not self.weighted:
+            return 1.0
+        return 1.0 / link.strength if link.strength > 0 else None
+
+    def edges(self, node_id: str) -> Iterator[Tuple[str, str, float]]:
+        """(link_id, other node, cost) for every usable link at `node_id`"""
+        for link_id in self.adjacency.get(node_id, ()):
+            if link_id in self.banned_links:
+                continue
+            link = self.links[link_id]
+            other = link.target_id if link.source_id == node_id else link.source_id
+            if other in self.banned_nodes:
+                continue
+            cost = self.cost(link)
+            if cost is not None:
+                yield link_id, other, cost
+
+
+Parents = Dict[str, Optional[Tuple[str, str]]]  # node -> (previous node, link) or None at the start
+
+
+def _join(meet: str, forward: Parents, backward: Parents) -> Tuple[List[str], List[str]]:
+    nodes, links = [meet], []
+    node = meet
+    while forward[node] is not None:
+        node, link_id = forward[node]
+        nodes.append(node)
+        links.append(link_id)
+    nodes.reverse()
+    links.reverse()
+    node = meet
+    while backward[node] is not None:
+        node, link_id = backward[node]
+        nodes.append(node)
+        links.append(link_id)
+    return nodes, links
+
+
+def _bidirectional_bfs(graph: _Graph, source: str, target: str) -> Optional[Tuple[List[str], List[str]]]:
+    """Fewest-hop path, growing whichever search frontier is smaller one level at a time"""
+    forward: Parents = {source: None}
+    backward: Parents = {target: None}
+    depth = {source: 0}, {target: 0}
+    frontiers = [source], [target]
+    while frontiers[0] and frontiers[1]:
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        mine, other = (forward, backward) if side == 0 else (backward, forward)
+        best = None
+        next_frontier = []
+        for node in frontiers[side]:
+            for link_id, neighbor, _ in graph.edges(node):
+                if neighbor in mine:
+                    continue
+                mine[neighbor] = (node, link_id)
+                depth[side][neighbor] = depth[side][node] + 1
+                next_frontier.append(neighbor)
+                if neighbor in other:
+                    hops = depth[side][neighbor] + depth[1 - side][neighbor]
+                    if best is None or hops < best[0]:
+                        best = (hops, neighbor)
+        # Finish the level before stopping, so the shortest meeting point wins
+        if best is not None:
+            return _join(best[1], forward, backward)
+        if side == 0:
+            frontiers = next_frontier, frontiers[1]
+        else:
+            frontiers = frontiers[0], next_frontier
+    return None
+
+
+def _bidirectional_dijkstra(graph: _Graph, source: str, target: str) -> Optional[Tuple[List[str], List[str]]]:
+    """Cheapest path, alternating forward and backward Dijkstra until they cannot improve"""
+    parents: Tuple[Parents, Parents] = ({source: None}, {target: None})
+    distances: Tuple[Dict[str, float], Dict[str, float]] = ({source: 0.0}, {target: 0.0})
+    settled: Tuple[Set[str], Set[str]] = (set(), set())
+    queues = [(0.0, source)], [(0.0, target)]
+    best_cost, meet = float("inf"), None
+
+    while queues[0] and queues[1]:
+        # Stop once no unsettled pair of nodes can beat the best meeting found
+        if queues[0][0][0] + queues[1][0][0] >= best_cost:
+            break
+        # Any alternation keeps the stopping rule valid; growing the smaller search is cheapest
+        side = 0 if len(queues[0]) <= len(queues[1]) else 1
+        distance, node = heapq.heappop(queues[side])
+        if node in settled[side]:
+            continue
+        settled[side].add(node)
+        for link_id, neighbor, cost in graph.edges(node):
+            candidate = distance + cost
+            if candidate < distances[side].get(neighbor, float("inf")):
+                distances[side][neighbor] = candidate
+                parents[side][neighbor] = (node, link_id)
+                heapq.heappush(queues[side], (candidate, neighbor))
+            if neighbor in distances[1 - side]:
+                total = distances[side][neighbor] + distances[1 - side][neighbor]
+                if total < best_cost:
+                    best_cost, meet = total, neighbor
+
+    if meet is None:
+        return None
+    return _join(meet, parents[0], parents[1])
+
+
+def _search(graph: _Graph, source: str, target: str) -> Optional[Path]:
+    if source == target:
+        return Path(0.0, [source], [])
+    found = (_bidirectional_dijkstra if graph.weighted else _bidirectional_bfs)(graph, source, target)
+    if found is None:
+        return None
+    node_ids, link_ids = found
+    return Path(sum(graph.cost(graph.links[link_id]) for link_id in link_ids), node_ids, link_ids)
+
+
+def shortest_paths(
+    adjacency: Mapping[str, Set[str]],
+    links: Mapping,
+    source: str,
+    target: str,
+    k: int = 1,
+    weighted: bool = False,
+) -> List[Path]:
+    """Up to `k` loopless paths from `source` to `target`, cheapest first
+
+    Yen's algorithm with Lawler's refinement: a path only needs spurs from the
+    node where it left its parent path, since earlier spurs were already tried.
+    """
+    graph = _Graph(adjacency, links, weighted)
+    first = _search(graph, source, target)
+    if first is None:
+        return []
+
+    found = [first]
+    deviations = [0]
+    seen = {tuple(first.link_ids)}
+    candidates: List[Tuple[float, int, int, Path]] = []
+    while len(found) < k:
+        previous = found[-1]
+        for i in range(deviations[-1], len(previous.link_ids)):
+            # Deviate from the previous path at its i-th node, keeping the prefix
+            root_nodes = previous.node_ids[:i + 1]
+            root_links = previous.link_ids[:i]
+            banned_links = {p.link_ids[i] for p in found if p.node_ids[:i + 1] == root_nodes and len(p.link_ids) > i}
+            spur_graph = _Graph(adjacency, links, weighted, set(root_nodes[:-1]), banned_links)
+            spur = _search(spur_graph, root_nodes[-1], target)
+            if spur is None:
+                continue
+            link_ids = root_links + spur.link_ids
+            if tuple(link_ids) in seen:
+                continue
+            seen.add(tuple(link_ids))
+            cost = sum(graph.cost(links[link_id]) for link_id in root_links) + spur.cost
+            path = Path(cost, root_nodes[:-1] + spur.node_ids, link_ids)
+            heapq.heappush(candidates, (cost, len(link_ids), i, path))
+        if not candidates:
+            break
+        _, _, deviation, path = heapq.heappop(candidates)
+        found.append(path)
+        deviations.append(deviation)
+    return found
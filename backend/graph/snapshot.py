@@ -0,0 +1,326 @@
+"""Read-only graph snapshot in one memory-mapped file, shared by every worker process
+
+The file holds the nodes (id, name, type), the links (id, endpoints, type,
+strength), the adjacency lists in compressed sparse row form, and opaque
+byte sections such as pre-encoded response bodies:
+
+    sections, each 8-byte aligned | JSON header | header length (<u4) | magic (8 bytes)
+
+The header comes last so that byte sections can be streamed into the file
+without knowing their length up front. It gives the change-log `seq` the
+snapshot reflects, the node and link counts, the type dictionaries, the
+etag of each byte section and the [offset, length] of every section. Node
+and link rows are sorted by id, so a node is found by binary search and each
+node's adjacency slice lists its links in id order. Strings are stored as an
+<i8 offsets array (count + 1 entries) over one UTF-8 data section.
+
+Workers map the file and read numpy views and memoryview slices straight out
+of the page cache, which the kernel shares between them, so the graph costs
+each worker close to nothing. A new snapshot is written to a temporary file
+and renamed over the old one; a reader keeps its mapping of the old file
+until it notices the rename, so it never sees a half-written snapshot.
+"""
+import hashlib
+import json
+import logging
+import math
+import mmap
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import (
+    BinaryIO, Callable, ContextManager, Dict, Hashable, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+)
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # no cross-process lock on Windows; a slower builder may then replace a newer snapshot
+    fcntl = None
+
+from .cache import ETAG_DIGEST_SIZE, etag_of
+from .index import IndexedLink, IndexedNode
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"GRAPHSN1"
+ALIGNMENT = 8
+# After a rewrite taking t seconds the next one waits at least this many times t,
+# so rewrites take at most a fifth of a core however often the graph changes
+REWRITE_SPACING = 4
+
+ARRAY_DTYPES = {
+    "node_id_offsets": "<i8",
+    "node_name_offsets": "<i8",
+    "node_type": "<i4",
+    "link_id_offsets": "<i8",
+    "link_source": "<i4",  # node row, -1 for an id that has no node
+    "link_target": "<i4",
+    "link_relationship_type": "<i4",
+    "link_strength": "<f8",  # NaN for null
+    "adjacency_offsets": "<i8",
+    "adjacency_links": "<i4",  # link rows, sliced per node by adjacency_offsets
+}
+
+
+class SnapshotData(NamedTuple):
+    """Everything one snapshot is written from, read in one database transaction"""
+    seq: int
+    nodes: Sequence[Tuple[str, str, str]]  # (id, name, type)
+    links: Sequence[Tuple[str, str, str, str, Optional[float]]]  # (id, source_id, target_id, relationship_type, strength)
+    # Named byte sections such as response bodies, in pieces, so a large one is never held whole
+    blobs: Dict[str, Iterable[bytes]]
+
+
+def _strings(values: Sequence[bytes]) -> Tuple[np.ndarray, bytes]:
+    offsets = np.zeros(len(values) + 1, dtype="<i8")
+    np.cumsum([len(value) for value in values], out=offsets[1:])
+    return offsets, b"".join(values)
+
+
+def _codes(values: Sequence[str]) -> Tuple[np.ndarray, List[str]]:
+    dictionary: Dict[str, int] = {}
+    codes = np.array([dictionary.setdefault(value, len(dictionary)) for value in values], dtype="<i4")
+    return codes, list(dictionary)
+
+
+def encode_graph(nodes: Sequence[Tuple[str, str, str]], links: Sequence[Tuple]) -> Tuple[Dict[str, bytes], dict]:
+    """The node, link and adjacency sections, and the header fields describing them"""
+    nodes = sorted(((node_id.encode(), name, node_type) for node_id, name, node_type in nodes))
+    links = sorted(((link[0].encode(),) + tuple(link[1:]) for link in links))
+    row_of = {node_id: row for row, (node_id, _, _) in enumerate(nodes)}
+
+    sections: Dict[str, bytes] = {}
+    offsets, sections["node_ids"] = _strings([node_id for node_id, _, _ in nodes])
+    arrays = {"node_id_offsets": offsets}
+    arrays["node_name_offsets"], sections["node_names"] = _strings([name.encode() for _, name, _ in nodes])
+    arrays["node_type"], node_types = _codes([node_type for _, _, node_type in nodes])
+    arrays["link_id_offsets"], sections["link_ids"] = _strings([link[0] for link in links])
+    source = np.array([row_of.get(link[1].encode(), -1) for link in links], dtype="<i4")
+    target = np.array([row_of.get(link[2].encode(), -1) for link in links], dtype="<i4")
+    arrays["link_source"], arrays["link_target"] = source, target
+    arrays["link_relationship_type"], relationship_types = _codes([link[3] for link in links])
+    arrays["link_strength"] = np.array([math.nan if link[4] is None else link[4] for link in links], dtype="<f8")
+
+    # Each link is listed under both of its endpoints, a self-loop once
+    rows = np.arange(len(links), dtype="<i4")
+    at_target = (target >= 0) & (target != source)
+    owners = np.concatenate([source[source >= 0], target[at_target]])
+    incident = np.concatenate([rows[source >= 0], rows[at_target]])
+    order = np.lexsort((incident, owners))
+    arrays["adjacency_links"] = incident[order]
+    adjacency_offsets = np.zeros(len(nodes) + 1, dtype="<i8")
+    np.cumsum(np.bincount(owners, minlength=len(nodes)), out=adjacency_offsets[1:])
+    arrays["adjacency_offsets"] = adjacency_offsets
+
+    for name, dtype in ARRAY_DTYPES.items():
+        sections[name] = np.ascontiguousarray(arrays[name], dtype=dtype).tobytes()
+    return sections, {
+        "nodes": len(nodes),
+        "links": len(links),
+        "node_types": node_types,
+        "relationship_types": relationship_types,
+    }
+
+
+def _write_section(f: BinaryIO, pieces: Iterable[bytes]) -> Tuple[List[int], "hashlib.blake2b"]:
+    """Append one section, padded to the alignment; its [offset, length] and a digest of its bytes"""
+    start = f.tell()
+    digest = hashlib.blake2b(digest_size=ETAG_DIGEST_SIZE)
+    for piece in pieces:
+        f.write(piece)
+        digest.update(piece)
+    length = f.tell() - start
+    f.write(bytes(-length % ALIGNMENT))
+    return [start, length], digest
+
+
+def write_snapshot(path: str, data: SnapshotData):
+    """Write a snapshot next to `path` and rename it into place"""
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".graph-snapshot-")
+    try:
+        with os.fdopen(descriptor, "wb") as f:
+            layout, etags = {}, {}
+            for name, pieces in data.blobs.items():
+                layout[name], digest = _write_section(f, pieces)
+                etags[name] = etag_of(digest)
+            sections, header = encode_graph(data.nodes, data.links)
+            for name, body in sections.items():
+                layout[name], _ = _write_section(f, [body])
+            header = json.dumps({"seq": data.seq, **header, "etags": etags, "sections": layout}).encode()
+            f.write(header + len(header).to_bytes(4, "little") + MAGIC)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+class GraphSnapshot:
+    """One snapshot file, mapped read-only
+
+    Answers the same membership and neighbour queries as AdjacencyIndex.
+    The mapping is never closed explicitly: memoryviews handed out by
+    `section()` may still be in use, and it is released with the last of them.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        end = len(self._mmap) - len(MAGIC)
+        if end < 4 or self._mmap[end:] != MAGIC:
+            raise ValueError(f"{path} is not a graph snapshot")
+        length = int.from_bytes(self._mmap[end - 4:end], "little")
+        header = json.loads(self._mmap[end - 4 - length:end - 4])
+        self._sections: Dict[str, List[int]] = header["sections"]
+        self.seq: int = header["seq"]
+        self.node_count: int = header["nodes"]
+        self.link_count: int = header["links"]
+        self.node_types: List[str] = header["node_types"]
+        self.relationship_types: List[str] = header["relationship_types"]
+        self.etags: Dict[str, str] = header["etags"]
+        for name, dtype in ARRAY_DTYPES.items():
+            offset, size = self._sections[name]
+            setattr(self, name, np.frombuffer(self._mmap, dtype=dtype, count=size // np.dtype(dtype).itemsize,
+                                              offset=offset))
+
+    def section(self, name: str) -> memoryview:
+        """A byte section, sliced out of the mapping without copying"""
+        offset, size = self._sections[name]
+        return memoryview(self._mmap)[offset:offset + size]
+
+    def _string(self, section: str, offsets: np.ndarray, row: int) -> bytes:
+        base = self._sections[section][0]
+        return self._mmap[base + int(offsets[row]):base + int(offsets[row + 1])]
+
+    def node_row(self, node_id: str) -> Optional[int]:
+        key = node_id.encode()
+        low, high = 0, self.node_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._string("node_ids", self.node_id_offsets, middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.node_count and self._string("node_ids", self.node_id_offsets, low) == key:
+            return low
+        return None
+
+    def __contains__(self, node_id: str) -> bool:
+        return self.node_row(node_id) is not None
+
+    def node(self, row: int) -> IndexedNode:
+        return IndexedNode(
+            self._string("node_ids", self.node_id_offsets, row).decode(),
+            self._string("node_names", self.node_name_offsets, row).decode(),
+            self.node_types[self.node_type[row]],
+        )
+
+    def neighbors(self, node_id: str) -> List[Tuple[IndexedLink, IndexedNode]]:
+        """Links incident to a node paired with the node on the other end, in link id order"""
+        row = self.node_row(node_id)
+        if row is None:
+            return []
+        result = []
+        for link_row in self.adjacency_links[self.adjacency_offsets[row]:self.adjacency_offsets[row + 1]].tolist():
+            source, target = int(self.link_source[link_row]), int(self.link_target[link_row])
+            other_row = target if source == row else source
+            if other_row < 0:
+                continue
+            other = self.node(other_row)
+            strength = float(self.link_strength[link_row])
+            link = IndexedLink(
+                self._string("link_ids", self.link_id_offsets, link_row).decode(),
+                node_id if source == row else other.id,
+                node_id if target == row else other.id,
+                self.relationship_types[self.link_relationship_type[link_row]],
+                # As in AdjacencyIndex, a missing strength counts as 1
+                1.0 if math.isnan(strength) else strength,
+            )
+            result.append((link, other))
+        return result
+
+
+class SharedSnapshot:
+    """The snapshot at `path` as seen by one process, reopened whenever the file is replaced
+
+    `start()` runs a thread that rewrites the file after each batch of
+    commits: every `interval` seconds it compares a database change stamp
+    (PRAGMA data_version) with the last one it saw. Every worker runs one; a
+    lock file next to the snapshot makes them take turns, and a worker that
+    finds the file already at the latest change-log seq leaves it alone.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._snapshot: Optional[GraphSnapshot] = None
+        self._identity: Optional[Tuple[int, int, int]] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def current(self) -> Optional[GraphSnapshot]:
+        """The latest snapshot on disk, or None before the first one is written"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if identity != self._identity:
+            with self._lock:
+                if identity != self._identity:
+                    self._snapshot = GraphSnapshot(self.path)
+                    self._identity = identity
+        return self._snapshot
+
+    @contextmanager
+    def _exclusive(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def refresh(self, latest_seq: Callable[[], int], fetch: Callable[[], ContextManager[SnapshotData]]) -> bool:
+        """Rewrite the snapshot unless it is already at `latest_seq()`; True if it was rewritten
+
+        `fetch()` is entered for the duration of the write, so the data can be
+        streamed out of an open database transaction.
+        """
+        with self._exclusive():
+            snapshot = self.current()
+            if snapshot is not None and snapshot.seq == latest_seq():
+                return False
+            with fetch() as data:
+                write_snapshot(self.path, data)
+            return True
+
+    def start(self, stamp: Callable[[], Optional[Hashable]], latest_seq: Callable[[], int],
+              fetch: Callable[[], ContextManager[SnapshotData]], interval: float):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(stamp, latest_seq, fetch, interval),
+                                            name="graph-snapshot", daemon=True)
+            self._thread.start()
+
+    def _run(self, stamp, latest_seq, fetch, interval):
+        # A database without a change stamp (not an SQLite file) is snapshotted once
+        seen = object()
+        while True:
+            pause = interval
+            current = stamp()
+            if current != seen:
+                seen = current
+                try:
+                    started = time.perf_counter()
+                    if self.refresh(latest_seq, fetch):
+                        elapsed = time.perf_counter() - started
+                        logger.info("Wrote graph snapshot %s in %.2f s", self.path, elapsed)
+                        pause = max(interval, REWRITE_SPACING * elapsed)
+                except Exception:
+                    logger.exception("Writing graph snapshot %s failed", self.path)
+            time.sleep(pause)
@@ -0,0 +1,105 @@
+import threading
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Strength histogram: bins of width 0.1 over [0, 1], values outside clamped into the end bins
+STRENGTH_BINS = 10
+STRENGTH_EDGES = [round(i / STRENGTH_BINS, 1) for i in range(STRENGTH_BINS + 1)]
+
+# (relationship type, source node type, target node type, strength bin); node types are
+# None for a dangling endpoint and the bin is None for a null strength
+LinkFacet = Tuple[str, Optional[str], Optional[str], Optional[int]]
+
+
+def strength_bin(strength: Optional[float]) -> Optional[int]:
+    """Histogram bin of a strength; keep in step with the CASE in run.link_facet_counts"""
+    if strength is None:
+        return None
+    return min(max(int(strength * STRENGTH_BINS), 0), STRENGTH_BINS - 1)
+
+
+class FacetCounters:
+    """Node and link counts by type, relationship type, type pair and strength
+
+    Rebuilt in one pass from (type, count) and (LinkFacet, count) aggregates,
+    then adjusted in place by the write endpoints after they commit. Each
+    adjustment carries the change-log sequence number of its write, so one that
+    the rebuild's snapshot already contains is not counted twice. Adjustments
+    that arrive before the first rebuild are dropped; the rebuild reads them.
+    """
+
+    def __init__(self):
+        self.nodes: Counter = Counter()
+        self.links: Counter = Counter()
+        self.seq = 0
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def ensure_loaded(self, fetch: Callable[[], Tuple[int, Iterable[Tuple[str, int]], Iterable[Tuple[LinkFacet, int]]]]):
+        """Rebuild from `fetch() -> (seq, node type counts, link facet counts)` unless already loaded
+
+        The lock is held while fetching, so writes committed after the snapshot
+        wait and are applied on top of it.
+        """
+        with self._lock:
+            if self.loaded:
+                return
+            seq, nodes, links = fetch()
+            self.nodes = Counter(dict(nodes))
+            self.links = Counter(dict(links))
+            self.seq = seq
+            self.loaded = True
+
+    def reset(self):
+        """Forget everything after a bulk change; the next reader rebuilds"""
+        with self._lock:
+            self.nodes = Counter()
+            self.links = Counter()
+            self.loaded = False
+
+    def apply(self, seq: int, nodes: Iterable[Tuple[str, int]] = (), links: Iterable[Tuple[LinkFacet, int]] = ()):
+        """Add signed counts from the write that committed as change `seq`"""
+        with self._lock:
+            if not self.loaded or seq <= self.seq:
+                return
+            for node_type, delta in nodes:
+                self.nodes[node_type] += delta
+            for facet, delta in links:
+                self.links[facet] += delta
+            self.nodes = +self.nodes
+            self.links = +self.links
+
+    def summary(self) -> dict:
+        """Marginal counts and histograms, shaped like the GraphStats response model"""
+        with self._lock:
+            nodes = dict(self.nodes)
+            links = list(self.links.items())
+        relationship_types: Counter = Counter()
+        type_pairs: Counter = Counter()
+        histogram = [0] * STRENGTH_BINS
+        by_relationship: Dict[str, List[int]] = {}
+        missing: Counter = Counter()
+        for (relationship_type, source_type, target_type, bin_), count in links:
+            relationship_types[relationship_type] += count
+            type_pairs[(source_type, target_type)] += count
+            counts = by_relationship.setdefault(relationship_type, [0] * STRENGTH_BINS)
+            if bin_ is None:
+                missing[relationship_type] += count
+            else:
+                histogram[bin_] += count
+                counts[bin_] += count
+        return {
+            "node_count": sum(nodes.values()),
+            "link_count": sum(relationship_types.values()),
+            "node_types": dict(sorted(nodes.items())),
+            "relationship_types": dict(sorted(relationship_types.items())),
+            "type_pairs": [
+                {"source_type": source_type, "target_type": target_type, "count": count}
+                for (source_type, target_type), count in sorted(type_pairs.items(), key=lambda item: (-item[1], str(item[0])))
+            ],
+            "strength": {"edges": STRENGTH_EDGES, "counts": histogram, "missing": sum(missing.values())},
+            "strength_by_relationship_type": {
+                relationship_type: {"edges": STRENGTH_EDGES, "counts": counts, "missing": missing[relationship_type]}
+                for relationship_type, counts in sorted(by_relationship.items())
+            },
+        }
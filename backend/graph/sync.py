@@ -0,0 +1,49 @@
+import threading
+from typing import Hashable, List, Optional, Set
+
+
+class ChangeFollower:
+    """Tells the change-log entries written by this process apart from those of other writers
+
+    SQLite serializes writers and the log's sequence numbers are allocated
+    consecutively in commit order, whichever process commits. So every number
+    up to the latest one that this process did not report through `local()`
+    was written by another worker, or by a script such as bulk_import.py.
+
+    `stamp` holds the database's change counter (PRAGMA data_version) as of
+    the last check, so that a check can skip reading the log when nothing
+    was committed. `lock` is held by a check while it applies other writers'
+    changes to the in-memory state, and by a local write from its commit until
+    it has applied its own, so neither sees the other half done.
+    """
+
+    def __init__(self):
+        self.seq: Optional[int] = None
+        self.stamp: Optional[Hashable] = None
+        self.lock = threading.Lock()
+        self._local: Set[int] = set()
+        self._local_lock = threading.Lock()
+
+    def local(self, first: int, last: Optional[int] = None):
+        """Report the entries `first`..`last` as committed by this process"""
+        with self._local_lock:
+            self._local.update(range(first, (first if last is None else last) + 1))
+
+    def foreign(self, latest: int) -> Optional[List[int]]:
+        """Sequence numbers up to `latest` that other writers committed since the last call
+
+        The first call only records where the log stands; in-memory state
+        loaded after startup already reflects everything before it. None means
+        the log went backwards (the database file was replaced), so nothing
+        held in memory can be trusted.
+        """
+        with self._local_lock:
+            if self.seq is None:
+                foreign = []
+            elif latest < self.seq:
+                foreign = None
+            else:
+                foreign = [seq for seq in range(self.seq + 1, latest + 1) if seq not in self._local]
+            self._local = {seq for seq in self._local if seq > latest}
+            self.seq = latest
+        return foreign
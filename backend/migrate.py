@@ -0,0 +1,41 @@
+import argparse
+import logging
+
+from models.db import engine
+from models.migrations import HEAD, MIGRATIONS, current_version, stamp, upgrade
+from models.search import create_search_index, rebuild_search_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the relationship graph database schema")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="Show applied and pending migrations")
+    upgrade_parser = commands.add_parser("upgrade", help="Apply pending migrations")
+    upgrade_parser.add_argument("--to", type=int, default=HEAD, help="Target version (default: latest)")
+    stamp_parser = commands.add_parser("stamp", help="Mark migrations as applied without running them")
+    stamp_parser.add_argument("version", type=int)
+    commands.add_parser("reindex", help="Rebuild the full-text search index (needed after a VACUUM)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.command == "status":
+        version = current_version(engine)
+        for migration in MIGRATIONS:
+            state = "applied" if migration.version <= version else "pending"
+            print(f"{migration.version:>4}  {state:<8} {migration.description}")
+    elif args.command == "upgrade":
+        applied = upgrade(engine, args.to)
+        print(f"Applied {len(applied)} migration(s); schema is at version {current_version(engine)}")
+    elif args.command == "stamp":
+        stamp(engine, args.version)
+        print(f"Schema stamped at version {args.version}")
+    elif args.command == "reindex":
+        if not create_search_index(engine):
+            parser.exit(1, "This database does not support full-text search (FTS5)\n")
+        rebuild_search_index(engine)
+        print("Search index rebuilt")
+
+
+if __name__ == "__main__":
+    main()
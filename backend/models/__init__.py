@@ -1,2 +1,12 @@
-from .db import Node, Link
-from .response import NodeResponse, NodeBase, NodeCreate, LinkResponse, LinkBase, LinkCreate, GraphData
\ No newline at end of file
+from .db import Node, Link, Change
+from .response import (
+    NodeResponse, NodeBase, NodeCreate, LinkResponse, LinkBase, LinkCreate, GraphData,
+    MAX_BATCH_SIZE, NodeBatchGet, NodeBatch, LinkBatchCreate, LinkBatch,
+    PositionedNode, PositionedGraphData,
+    NodePage, LinkPage, SearchHit, SearchPage,
+    NodeSummary, Neighbor, Neighborhood, Subgraph, Suggestion, Suggestions,
+    BulkImportError, BulkImportResult,
+    NodeMetrics, NodeWithMetrics, RankedNode, GraphAnalytics,
+    GraphPath, PathSearch, GraphChanges,
+    TypePairCount, StrengthHistogram, GraphStats
+)
@@ -0,0 +1,114 @@
+"""Append-only change log for incremental client refresh
+
+Every write records (entity, id, op) in the `changes` table inside its own
+transaction, so a sequence number is visible exactly when its data is.
+Clients poll /api/changes?since=<seq> and apply the returned delta.
+
+Events that touch too much to list (sample-data resets, bulk imports) record
+a single `resync` marker instead; compaction leaves one behind as well. A
+client whose `since` is older than the latest marker must refetch the graph.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, Set
+
+from sqlalchemy import func, insert, select, text
+
+from .db import Change
+
+# Sequence numbers kept in the log; clients further behind than this resync
+CHANGE_LOG_RETENTION = 10000
+# Compact once every this many appended entries
+COMPACTION_INTERVAL = 1000
+# Deltas touching more entities than this are answered with a resync instead
+MAX_DELTA_ENTITIES = 5000
+
+
+def record_changes(db, entity: str, op: str, entity_ids: Iterable[str]) -> int:
+    """Append one entry per id; `db` is a Session or Connection inside the write's transaction
+
+    Returns the sequence number of the last entry. Writers hold the database
+    write lock for the whole transaction, so the entries are numbered
+    consecutively in order.
+    """
+    rows = [{"entity": entity, "entity_id": entity_id, "op": op} for entity_id in entity_ids]
+    if rows:
+        db.execute(insert(Change), rows)
+    return _appended(db, len(rows))
+
+
+def record_change(db, entity: str, entity_id: str, op: str) -> int:
+    return record_changes(db, entity, op, [entity_id])
+
+
+def record_resync(db) -> int:
+    """Tell every client holding an older sequence number to refetch the whole graph"""
+    db.execute(insert(Change), {"entity": "graph", "entity_id": None, "op": "resync"})
+    return _appended(db, 1)
+
+
+def latest_seq(db) -> int:
+    return db.execute(select(func.coalesce(func.max(Change.seq), 0))).scalar()
+
+
+def _appended(db, count: int) -> int:
+    seq = latest_seq(db)
+    if seq // COMPACTION_INTERVAL > (seq - count) // COMPACTION_INTERVAL:
+        compact_changes(db, seq)
+    return seq
+
+
+def compact_changes(db, seq: Optional[int] = None, retention: int = CHANGE_LOG_RETENTION):
+    """Drop superseded entries, then truncate the log to the last `retention` sequence numbers
+
+    Only the latest entry per entity matters to a client, so the first step
+    loses nothing. Truncation leaves a resync marker at the cut-off.
+    """
+    seq = latest_seq(db) if seq is None else seq
+    db.execute(text(
+        "DELETE FROM changes WHERE seq < ("
+        "SELECT max(later.seq) FROM changes AS later "
+        "WHERE later.entity = changes.entity AND later.entity_id IS changes.entity_id)"
+    ))
+    cutoff = seq - retention
+    if cutoff <= 0:
+        return
+    truncated = db.execute(text("DELETE FROM changes WHERE seq <= :cutoff"), {"cutoff": cutoff}).rowcount
+    if truncated:
+        db.execute(insert(Change), {"seq": cutoff, "entity": "graph", "entity_id": None, "op": "resync"})
+
+
+@dataclass
+class Delta:
+    """Net effect of the log after `since`: ids to refetch and ids to drop, per entity"""
+    seq: int
+    resync: bool = False
+    upserted: Dict[str, Set[str]] = field(default_factory=lambda: {"node": set(), "link": set()})
+    deleted: Dict[str, Set[str]] = field(default_factory=lambda: {"node": set(), "link": set()})
+
+
+def changes_since(db, since: int) -> Delta:
+    """Collapse log entries after `since` to the last operation on each entity"""
+    seq = latest_seq(db)
+    floor = db.execute(select(func.max(Change.seq)).where(Change.entity == "graph")).scalar() or 0
+    # A cursor from the future belongs to another database (or a rebuilt one)
+    if since < floor or since > seq:
+        return Delta(seq=seq, resync=True)
+
+    latest = (
+        select(Change.entity, Change.entity_id, func.max(Change.seq).label("seq"))
+        .where(Change.seq > since)
+        .group_by(Change.entity, Change.entity_id)
+        .subquery()
+    )
+    rows = db.execute(
+        select(Change.entity, Change.entity_id, Change.op)
+        .join(latest, Change.seq == latest.c.seq)
+        .limit(MAX_DELTA_ENTITIES + 1)
+    ).all()
+    if len(rows) > MAX_DELTA_ENTITIES:
+        return Delta(seq=seq, resync=True)
+
+    delta = Delta(seq=seq)
+    for entity, entity_id, op in rows:
+        (delta.deleted if op == "delete" else delta.upserted)[entity].add(entity_id)
+    return delta
@@ -0,0 +1,161 @@
+"""Columnar MessagePack encoding of the whole graph, served by /api/graph-data
+
+The payload is one MessagePack map:
+
+    {"format": 1,
+     "nodes": {"count": n, "columns": {name: column, ...}},
+     "links": {"count": m, "columns": {name: column, ...}}}
+
+Each column is one of:
+
+    {"values": [...]}                                   plain list, nulls as nil
+    {"dictionary": [...], "codes": <bytes>, "dtype": "<u1"}  dictionary-encoded strings
+    {"data": <bytes>, "dtype": "<i4" | "<f8"}           little-endian typed array
+
+Node `type` and link `relationship_type` are dictionary-encoded. Links store
+`source` and `target` as int32 row numbers into the node columns (-1 for an id
+that has no node), and `strength` as float64 with NaN for null. The typed
+arrays can be wrapped directly by Int32Array/Float64Array or numpy.frombuffer.
+"""
+import gzip
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import msgpack
+import numpy as np
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; clients then get gzip
+    brotli = None
+
+from .serialization import LINK_FIELDS, NODE_FIELDS
+
+FORMAT_VERSION = 1
+MEDIA_TYPE = "application/x-msgpack"
+MEDIA_TYPES = (MEDIA_TYPE, "application/msgpack", "application/vnd.msgpack")
+
+NODE_DICTIONARY_COLUMNS = {"type"}
+LINK_DICTIONARY_COLUMNS = {"relationship_type"}
+
+
+def _dictionary_column(values: Sequence[Optional[str]]) -> dict:
+    dictionary: Dict[Optional[str], int] = {}
+    codes = [dictionary.setdefault(value, len(dictionary)) for value in values]
+    dtype = "<u1" if len(dictionary) <= 0xFF else "<u2" if len(dictionary) <= 0xFFFF else "<u4"
+    return {"dictionary": list(dictionary), "codes": np.array(codes, dtype=dtype).tobytes(), "dtype": dtype}
+
+
+def _typed_column(values, dtype: str) -> dict:
+    return {"data": np.asarray(values, dtype=dtype).tobytes(), "dtype": dtype}
+
+
+def encode_graph(
+    node_rows: Sequence[Sequence],
+    link_rows: Sequence[Sequence],
+    positions: Optional[Dict[str, Tuple[float, float]]] = None,
+    node_fields: Sequence[str] = NODE_FIELDS,
+) -> bytes:
+    """Encode column tuples (in `node_fields` / LINK_FIELDS order) into the columnar payload
+
+    With `positions`, nodes also get float64 `x` and `y` columns. `node_fields`
+    must include the id.
+    """
+    node_columns = list(zip(*node_rows)) if node_rows else [()] * len(node_fields)
+    nodes = {}
+    for field, values in zip(node_fields, node_columns):
+        nodes[field] = _dictionary_column(values) if field in NODE_DICTIONARY_COLUMNS else {"values": list(values)}
+    node_ids = node_columns[list(node_fields).index("id")]
+    if positions is not None:
+        xy = [positions.get(node_id, (0.0, 0.0)) for node_id in node_ids]
+        nodes["x"] = _typed_column([x for x, _ in xy], "<f8")
+        nodes["y"] = _typed_column([y for _, y in xy], "<f8")
+
+    row_of = {node_id: i for i, node_id in enumerate(node_ids)}
+    link_columns = dict(zip(LINK_FIELDS, zip(*link_rows) if link_rows else [()] * len(LINK_FIELDS)))
+    links = {
+        "id": {"values": list(link_columns["id"])},
+        "source": _typed_column([row_of.get(node_id, -1) for node_id in link_columns["source_id"]], "<i4"),
+        "target": _typed_column([row_of.get(node_id, -1) for node_id in link_columns["target_id"]], "<i4"),
+        "strength": _typed_column([float("nan") if s is None else s for s in link_columns["strength"]], "<f8"),
+    }
+    for field in LINK_FIELDS:
+        if field in LINK_DICTIONARY_COLUMNS:
+            links[field] = _dictionary_column(link_columns[field])
+        elif field not in links and field not in ("source_id", "target_id"):
+            links[field] = {"values": list(link_columns[field])}
+
+    return msgpack.packb({
+        "format": FORMAT_VERSION,
+        "nodes": {"count": len(node_ids), "columns": nodes},
+        "links": {"count": len(link_columns["id"]), "columns": links},
+    })
+
+
+def _decode_column(column: dict) -> list:
+    if "values" in column:
+        return column["values"]
+    if "dictionary" in column:
+        dictionary = column["dictionary"]
+        return [dictionary[code] for code in np.frombuffer(column["codes"], dtype=column["dtype"]).tolist()]
+    return np.frombuffer(column["data"], dtype=column["dtype"]).tolist()
+
+
+def decode_graph(payload: bytes) -> Dict[str, List[dict]]:
+    """Rebuild the /api/graph-data JSON shape from a columnar payload"""
+    graph = msgpack.unpackb(payload)
+    nodes = {name: _decode_column(column) for name, column in graph["nodes"]["columns"].items()}
+    links = {name: _decode_column(column) for name, column in graph["links"]["columns"].items()}
+    node_ids = nodes["id"]
+
+    node_fields = [field for field in nodes if field in NODE_FIELDS or field in ("x", "y")]
+    node_fields.sort(key=lambda field: (NODE_FIELDS + ("x", "y")).index(field))
+    links["source_id"] = [node_ids[i] if i >= 0 else None for i in links.pop("source")]
+    links["target_id"] = [node_ids[i] if i >= 0 else None for i in links.pop("target")]
+    links["strength"] = [None if s != s else s for s in links["strength"]]
+    return {
+        "nodes": [dict(zip(node_fields, row)) for row in zip(*(nodes[f] for f in node_fields))],
+        "links": [dict(zip(LINK_FIELDS, row)) for row in zip(*(links[f] for f in LINK_FIELDS))],
+    }
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=9)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=9, mtime=0)
+    return body
+
+
+def _qualities(header: str) -> Dict[str, float]:
+    """Parse an Accept or Accept-Encoding header into {token: q}"""
+    offered = {}
+    for part in header.split(","):
+        token, *params = [piece.strip() for piece in part.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if token:
+            offered[token.lower()] = quality
+    return offered
+
+
+def wants_columnar(accept: str) -> bool:
+    """True when Accept prefers a MessagePack media type at least as much as JSON"""
+    offered = _qualities(accept)
+    columnar = max((offered.get(media_type, 0.0) for media_type in MEDIA_TYPES), default=0.0)
+    return columnar > 0 and columnar >= offered.get("application/json", 0.0)
+
+
+def choose_encoding(accept_encoding: str) -> str:
+    """Pick br, then gzip, then identity from an Accept-Encoding header"""
+    offered = _qualities(accept_encoding)
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if offered.get(encoding, offered.get("*", 0.0)) > 0:
+            return encoding
+    return "identity"
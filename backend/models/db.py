@@ -1,14 +1,123 @@
-from sqlalchemy import create_engine, Column, String, Text, Float, ForeignKey
+import logging
+import sqlite3
+import threading
+from typing import Optional
+
+from sqlalchemy import create_engine, event, inspect, make_url, Column, Integer, String, Text, Float, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session, relationship
 
+from .metrics import instrument_engine
+from .migrations import HEAD, current_version, stamp
+from .search import create_search_index
+from .settings import DatabaseSettings
+
+logger = logging.getLogger(__name__)
+
 
 # Database setup
-SQLALCHEMY_DATABASE_URL = "sqlite:///./relationship_graph.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+settings = DatabaseSettings.from_env()
+SQLALCHEMY_DATABASE_URL = settings.url
+
+
+def configure_sqlite(engine, begin: str = "BEGIN", query_only: bool = False):
+    """Apply the configured pragmas to each new connection and open transactions with `begin`
+
+    pysqlite normally starts transactions lazily and never for SELECTs; taking
+    over BEGIN gives multi-query reads one consistent snapshot and lets writers
+    take the lock up front with BEGIN IMMEDIATE instead of failing on upgrade.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        if settings.journal_mode and ":memory:" not in settings.url:
+            cursor.execute(f"PRAGMA journal_mode = {settings.journal_mode}")
+        cursor.execute(f"PRAGMA synchronous = {settings.synchronous}")
+        cursor.execute(f"PRAGMA cache_size = {int(settings.cache_size)}")
+        cursor.execute(f"PRAGMA mmap_size = {int(settings.mmap_size)}")
+        cursor.execute(f"PRAGMA busy_timeout = {int(settings.connect_timeout * 1000)}")
+        if query_only:
+            cursor.execute("PRAGMA query_only = ON")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def on_begin(conn):
+        conn.exec_driver_sql(begin)
+
+
+connect_args = {"check_same_thread": False, "timeout": settings.connect_timeout}
+
+# All writes go through a single pooled connection, so they are serialized in-process
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args=connect_args, pool_size=1, max_overflow=0,
+                       pool_timeout=settings.pool_timeout)
+configure_sqlite(engine, begin="BEGIN IMMEDIATE")
+instrument_engine(engine, "write", settings.slow_query_ms / 1000)
+# Objects are not expired on commit: reading one back would BEGIN IMMEDIATE again
+# and hold the write lock until the session closes
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# Readers get their own pool of query-only connections
+read_engine_options = dict(
+    pool_size=settings.pool_size,
+    max_overflow=settings.max_overflow,
+    pool_timeout=settings.pool_timeout,
+)
+read_engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args=connect_args, **read_engine_options)
+configure_sqlite(read_engine, query_only=True)
+instrument_engine(read_engine, "read", settings.slow_query_ms / 1000)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+
+
+class DataVersion:
+    """SQLite's PRAGMA data_version, read on a connection of its own
+
+    The value changes whenever any other connection, in this process or in
+    another one, commits to the database file. Reading it costs a few
+    microseconds and no disk I/O, so it can be checked on every request.
+    """
+
+    def __init__(self, url: str):
+        self._connection = None
+        self._lock = threading.Lock()
+        database = make_url(url).database if url.startswith("sqlite") else None
+        if database and database != ":memory:":
+            self._connection = sqlite3.connect(database, check_same_thread=False, isolation_level=None)
+
+    def read(self) -> Optional[int]:
+        """The current value; None for databases other than an SQLite file, whose changes are not tracked"""
+        if self._connection is None:
+            return None
+        with self._lock:
+            return self._connection.execute("PRAGMA data_version").fetchone()[0]
+
+
+# Lets every worker process notice commits made by the others
+data_version = DataVersion(SQLALCHEMY_DATABASE_URL)
+
 Base = declarative_base()
 
+# Read endpoints use an aiosqlite engine with the same pool settings when DB_MODE=async
+async_engine = None
+AsyncSessionLocal = None
+if settings.mode == "async":
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+    async_engine = create_async_engine(
+        settings.async_url,
+        connect_args={"timeout": settings.connect_timeout},
+        poolclass=AsyncAdaptedQueuePool,
+        **read_engine_options
+    )
+    configure_sqlite(async_engine.sync_engine, query_only=True)
+    instrument_engine(async_engine.sync_engine, "async_read", settings.slow_query_ms / 1000)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 
 # Database Models
 class Node(Base):
@@ -16,7 +125,7 @@ class Node(Base):
 
     id = Column(String, primary_key=True)
     name = Column(String, nullable=False)
-    type = Column(String, nullable=False)  # People, Institutions, Projects, Methods
+    type = Column(String, nullable=False, index=True)  # People, Institutions, Projects, Methods
     bio = Column(Text)
     description = Column(Text)
     website = Column(String)
@@ -40,13 +149,42 @@ class Link(Base):
 
     id = Column(String, primary_key=True)
     source_id = Column(String, ForeignKey("nodes.id"), nullable=False)
-    target_id = Column(String, ForeignKey("nodes.id"), nullable=False)
-    relationship_type = Column(String, nullable=False)  # leads, develops, applies, etc.
+    target_id = Column(String, ForeignKey("nodes.id"), nullable=False, index=True)
+    relationship_type = Column(String, nullable=False, index=True)  # leads, develops, applies, etc.
     strength = Column(Float, default=1.0)
 
+    # One edge per (source, target, relationship type); also serves lookups by source_id
+    __table_args__ = (
+        Index("uq_links_edge", "source_id", "target_id", "relationship_type", unique=True),
+    )
+
     # Relationships
     source = relationship("Node", foreign_keys=[source_id], back_populates="source_links")
     target = relationship("Node", foreign_keys=[target_id], back_populates="target_links")
 
 
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
+class Change(Base):
+    """Append-only log of graph mutations, read by /api/changes (see models/changes.py)"""
+    __tablename__ = "changes"
+
+    seq = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False)  # node, link, or graph for whole-graph events
+    entity_id = Column(String)
+    op = Column(String, nullable=False)  # create, update, delete or resync (upsert in older entries)
+
+    __table_args__ = (
+        Index("ix_changes_entity", "entity", "entity_id", "seq"),
+        # AUTOINCREMENT: sequence numbers are never reused, even after compaction
+        {"sqlite_autoincrement": True},
+    )
+
+
+# New databases get the current schema directly; existing ones are upgraded with `python migrate.py`
+_fresh_database = not inspect(engine).has_table("nodes")
+Base.metadata.create_all(bind=engine)
+if _fresh_database:
+    stamp(engine)
+elif current_version(engine) < HEAD:
+    logger.warning("Database schema is behind (version %d of %d); run `python migrate.py upgrade`",
+                   current_version(engine), HEAD)
+SEARCH_INDEX_ENABLED = create_search_index(engine)
@@ -0,0 +1,312 @@
+"""Request and SQL instrumentation, exposed by /metrics in the Prometheus text format
+
+`MetricsMiddleware` times every HTTP request and labels it with its route
+template (`/api/nodes/{node_id}`, not the raw path), so the number of series
+stays bounded. `instrument_engine` hooks the cursor events of an engine: each
+statement is timed per engine and statement kind, and charged to the request
+that issued it through a context variable, which follows the request into
+threadpool workers and aiosqlite greenlets. The per-request statement count
+histogram is what shows N+1 query patterns. Statements slower than
+DB_SLOW_QUERY_MS are logged with their parameters.
+"""
+import contextvars
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+from .profiler import SamplingProfiler
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# Characters of SQL, and of its parameters, kept in a slow-query log line
+SLOW_QUERY_LOG_CHARS = 1000
+PROFILE_HEADER = b"x-profile"
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Labels = (), amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def lines(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}" for labels, value in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: Labels = (), amount: float = 1.0):
+        self.inc(labels, -amount)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket (last one is +Inf), sum]
+        self._series: Dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Labels, value: float):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            series[1] += value
+
+    def lines(self) -> List[str]:
+        with self._lock:
+            series = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        lines = []
+        names = self.labels + ("le",)
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(names, labels + (_format_value(bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}")
+        return lines
+
+
+class Collected:
+    """A counter or gauge read from a callback at scrape time"""
+
+    def __init__(self, name: str, documentation: str, kind: str, read: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.read = read
+
+    def lines(self) -> List[str]:
+        return [f"{self.name} {_format_value(self.read())}"]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str], buckets: Sequence[float]) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def collect(self, name: str, documentation: str, read: Callable[[], float], kind: str = "gauge") -> Collected:
+        return self._register(Collected(name, documentation, kind, read))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.lines())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+http_requests = REGISTRY.counter(
+    "http_requests_total", "HTTP requests by method, route and status", ("method", "route", "status"))
+http_requests_in_progress = REGISTRY.gauge("http_requests_in_progress", "HTTP requests being served")
+http_request_duration = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route"), LATENCY_BUCKETS)
+http_response_size = REGISTRY.histogram(
+    "http_response_size_bytes", "HTTP response body size", ("method", "route"), SIZE_BUCKETS)
+http_request_statements = REGISTRY.histogram(
+    "http_request_sql_statements", "SQL statements executed per HTTP request", ("method", "route"), STATEMENT_BUCKETS)
+http_request_sql_duration = REGISTRY.histogram(
+    "http_request_sql_duration_seconds", "Time spent in SQL per HTTP request", ("method", "route"), LATENCY_BUCKETS)
+sql_statement_duration = REGISTRY.histogram(
+    "sql_statement_duration_seconds", "SQL statement latency by engine and statement kind", ("engine", "kind"),
+    LATENCY_BUCKETS)
+sql_slow_statements = REGISTRY.counter(
+    "sql_slow_statements_total", "SQL statements slower than DB_SLOW_QUERY_MS", ("engine",))
+
+
+class RequestStats:
+    __slots__ = ("statements", "sql_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.sql_seconds = 0.0
+
+
+# The request being served, shared with the threads and greenlets it runs queries on
+current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "current_request", default=None)
+
+TRANSACTION_KEYWORDS = {"BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE"}
+
+
+def statement_kind(statement: str) -> str:
+    keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    if keyword in ("SELECT", "WITH"):
+        return "select"
+    if keyword in ("INSERT", "UPDATE", "DELETE"):
+        return keyword.lower()
+    return "transaction" if keyword in TRANSACTION_KEYWORDS else "other"
+
+
+def _shorten(value) -> str:
+    text = value if isinstance(value, str) else repr(value)
+    return text if len(text) <= SLOW_QUERY_LOG_CHARS else text[:SLOW_QUERY_LOG_CHARS] + "..."
+
+
+def instrument_engine(engine, name: str, slow_query_seconds: float):
+    """Time every statement run on `engine` (a sync Engine; pass `async_engine.sync_engine`)"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["statement_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info.pop("statement_started", time.perf_counter())
+        kind = statement_kind(statement)
+        sql_statement_duration.observe((name, kind), elapsed)
+        stats = current_request.get()
+        if stats is not None and kind != "transaction":
+            stats.statements += 1
+            stats.sql_seconds += elapsed
+        if elapsed >= slow_query_seconds:
+            sql_slow_statements.inc((name,))
+            logger.warning("Slow %s on the %s engine (%.1f ms): %s; parameters: %s",
+                           kind, name, elapsed * 1000, _shorten(" ".join(statement.split())), _shorten(parameters))
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, response size and SQL use per route
+
+    With `profiling` on, a request carrying an `X-Profile` header is run under
+    the sampling profiler and answered with the collapsed stacks instead of its
+    own body; its original status is in `X-Profiled-Status`.
+    """
+
+    def __init__(self, app, profiling: bool = False):
+        self.app = app
+        self.profiling = profiling
+        self._routes: Optional[Dict[Callable, str]] = None
+
+    def route(self, scope) -> str:
+        """The matched route's path template; the router stores its endpoint in the scope"""
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._routes is None:
+            self._routes = {route.endpoint: route.path for route in scope["app"].routes if hasattr(route, "endpoint")}
+        return self._routes.get(endpoint, "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if self.profiling and any(name == PROFILE_HEADER for name, _ in scope["headers"]):
+            await self.profile(scope, receive, send)
+            return
+
+        status = 500
+        size = 0
+
+        async def send_measured(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        http_requests_in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_measured)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_progress.dec()
+            current_request.reset(token)
+            labels = (scope["method"], self.route(scope))
+            http_requests.inc(labels + (str(status),))
+            http_request_duration.observe(labels, elapsed)
+            http_response_size.observe(labels, size)
+            http_request_statements.observe(labels, stats.statements)
+            http_request_sql_duration.observe(labels, stats.sql_seconds)
+
+    async def profile(self, scope, receive, send):
+        status = 500
+
+        async def send_discarded(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_discarded)
+        finally:
+            profiler.stop()
+        body = profiler.collapsed().encode()
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"text/plain; charset=utf-8"),
+            (b"content-length", str(len(body)).encode()),
+            (b"x-profiled-status", str(status).encode()),
+            (b"x-profile-samples", str(profiler.samples).encode()),
+        ]})
+        await send({"type": "http.response.body", "body": body})
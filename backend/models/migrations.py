@@ -0,0 +1,99 @@
+import logging
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+def _index_lookups(conn: Connection):
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_nodes_type ON nodes (type)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_links_target_id ON links (target_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_links_relationship_type ON links (relationship_type)"))
+
+
+def _unique_edges(conn: Connection):
+    # Keep the first copy of each duplicated edge; the unique index also serves source_id lookups
+    removed = conn.execute(text(
+        "DELETE FROM links WHERE rowid NOT IN ("
+        "SELECT min(rowid) FROM links GROUP BY source_id, target_id, relationship_type)"
+    )).rowcount
+    if removed:
+        logger.warning("Removed %d duplicate links", removed)
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_links_edge ON links (source_id, target_id, relationship_type)"
+    ))
+
+
+def _change_log(conn: Connection):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS changes ("
+        "seq INTEGER PRIMARY KEY AUTOINCREMENT, entity VARCHAR NOT NULL, entity_id VARCHAR, op VARCHAR NOT NULL)"
+    ))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_changes_entity ON changes (entity, entity_id, seq)"))
+
+
+# Append new migrations here; versions must be consecutive and never change once released
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Index node type, link target and relationship type", _index_lookups),
+    Migration(2, "Remove duplicate links and make (source, target, relationship type) unique", _unique_edges),
+    Migration(3, "Add the changes table for /api/changes", _change_log),
+]
+
+HEAD = MIGRATIONS[-1].version
+
+
+def _ensure_version_table(conn: Connection):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, description VARCHAR NOT NULL, applied_at VARCHAR NOT NULL)"
+    ))
+
+
+def current_version(engine: Engine) -> int:
+    if not inspect(engine).has_table("schema_migrations"):
+        return 0
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT coalesce(max(version), 0) FROM schema_migrations")).scalar()
+
+
+def _record(conn: Connection, migration: Migration):
+    conn.execute(
+        text("INSERT INTO schema_migrations (version, description, applied_at) VALUES (:v, :d, :t)"),
+        {"v": migration.version, "d": migration.description, "t": datetime.utcnow().isoformat()}
+    )
+
+
+def upgrade(engine: Engine, target: Optional[int] = None) -> List[Migration]:
+    """Apply pending migrations up to `target` (default: all), each in its own transaction"""
+    target = HEAD if target is None else target
+    applied = []
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+    for migration in MIGRATIONS:
+        if migration.version <= current_version(engine) or migration.version > target:
+            continue
+        with engine.begin() as conn:
+            migration.upgrade(conn)
+            _record(conn, migration)
+        logger.info("Applied migration %d: %s", migration.version, migration.description)
+        applied.append(migration)
+    return applied
+
+
+def stamp(engine: Engine, version: int = HEAD):
+    """Mark migrations up to `version` as applied without running them (for freshly created schemas)"""
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        for migration in MIGRATIONS:
+            if migration.version <= version:
+                conn.execute(text("DELETE FROM schema_migrations WHERE version = :v"), {"v": migration.version})
+                _record(conn, migration)
@@ -0,0 +1,68 @@
+"""Sampling profiler for single requests, behind API_PROFILING=1 and an X-Profile header
+
+A background thread snapshots every other thread's Python stack with
+`sys._current_frames()` at a fixed interval and counts identical stacks. The
+result is in the collapsed-stack format read by flamegraph.pl and
+speedscope. All threads are sampled, because the request may run on the
+event loop or on a threadpool worker, so profile on an otherwise idle server.
+Threads parked in the event loop's selector, waiting on a lock or queue, or
+idling in an aiosqlite connection thread are left out.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+# Seconds between samples; the sampler needs the GIL, so CPU-bound code is
+# sampled at most once per sys.getswitchinterval() (5 ms by default)
+DEFAULT_INTERVAL = 0.001
+# Stacks whose innermost frame is in one of these modules are threads waiting for work
+IDLE_MODULES = ("selectors.py", "threading.py", "queue.py")
+IDLE_FUNCTIONS = {"_connection_worker_thread"}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = DEFAULT_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.is_set():
+            for thread_id, frame in sys._current_frames().items():
+                if (thread_id == own or frame.f_code.co_filename.endswith(IDLE_MODULES)
+                        or frame.f_code.co_name in IDLE_FUNCTIONS):
+                    continue
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+    def collapsed(self) -> str:
+        """One `thread;outermost;...;innermost count` line per distinct stack, most frequent first"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
@@ -1,7 +1,12 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
 
 # Pydantic models for API
+
+# Ids or links accepted by one batch request
+MAX_BATCH_SIZE = 1000
+
+
 class NodeBase(BaseModel):
     name: str
     type: str
@@ -48,6 +53,182 @@ class LinkResponse(LinkBase):
         from_attributes = True
 
 
+class NodeBatchGet(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class NodeBatch(BaseModel):
+    items: List[NodeResponse]  # in request order, each id once
+    missing: List[str] = []  # requested ids with no node
+
+
+class LinkBatchCreate(BaseModel):
+    links: List[LinkCreate] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class LinkBatch(BaseModel):
+    items: List[LinkResponse]
+
+
 class GraphData(BaseModel):
     nodes: List[NodeResponse]
-    links: List[LinkResponse]
\ No newline at end of file
+    links: List[LinkResponse]
+
+
+class PositionedNode(NodeResponse):
+    x: float
+    y: float
+
+
+class PositionedGraphData(BaseModel):
+    nodes: List[PositionedNode]
+    links: List[LinkResponse]
+
+
+class NodePage(BaseModel):
+    items: List[NodeResponse]
+    next_cursor: Optional[str] = None
+
+
+class LinkPage(BaseModel):
+    items: List[LinkResponse]
+    next_cursor: Optional[str] = None
+
+
+class SearchHit(NodeResponse):
+    score: Optional[float] = None  # BM25 relevance, higher is better
+    snippet: Optional[str] = None  # best matching fragment, hits wrapped in <mark>
+
+
+class SearchPage(BaseModel):
+    items: List[SearchHit]
+    next_cursor: Optional[str] = None
+
+
+class NodeSummary(BaseModel):
+    id: str
+    name: str
+    type: str
+
+    class Config:
+        from_attributes = True
+
+
+class Neighbor(BaseModel):
+    node: NodeSummary
+    link: LinkResponse
+    direction: str  # "out" when the queried node is the source, "in" otherwise
+
+
+class Neighborhood(BaseModel):
+    node_id: str
+    neighbors: List[Neighbor]
+
+
+class Subgraph(BaseModel):
+    nodes: List[NodeSummary]
+    links: List[LinkResponse]
+
+
+class Suggestion(BaseModel):
+    id: str
+    name: str
+    type: str
+    degree: int
+    match: str  # exact, prefix (start of the name), word (start of a later word) or fuzzy (typo corrected)
+
+
+class Suggestions(BaseModel):
+    q: str
+    items: List[Suggestion]  # best match first, then most links
+
+
+class BulkImportError(BaseModel):
+    kind: str  # "node" or "link"
+    line: int
+    id: Optional[str] = None
+    error: str
+
+
+class BulkImportResult(BaseModel):
+    inserted: Dict[str, int]
+    failed: Dict[str, int]
+    errors: List[BulkImportError]
+    errors_truncated: bool = False
+
+
+class NodeMetrics(BaseModel):
+    degree: int
+    weighted_degree: float
+    pagerank: float
+    betweenness: float
+    component: int  # 0 is the largest connected component
+
+
+class NodeWithMetrics(NodeResponse):
+    metrics: Optional[NodeMetrics] = None
+
+
+class RankedNode(BaseModel):
+    id: str
+    name: str
+    type: str
+    value: float
+
+
+class GraphAnalytics(BaseModel):
+    version: int
+    stale: bool  # computed for an older graph version; a recompute is under way
+    node_count: int
+    link_count: int
+    component_count: int
+    largest_component: int
+    top: Dict[str, List[RankedNode]]
+    nodes: Dict[str, NodeMetrics] = {}
+
+
+class GraphPath(BaseModel):
+    cost: float  # hop count, or the sum of 1 / strength for weighted searches
+    hops: int
+    nodes: List[NodeSummary]
+    links: List[LinkResponse]
+    explanation: str
+
+
+class PathSearch(BaseModel):
+    source_id: str
+    target_id: str
+    weighted: bool
+    paths: List[GraphPath]
+
+
+class GraphChanges(BaseModel):
+    since: int
+    seq: int  # pass as `since` on the next poll
+    resync: bool = False  # too far behind (or the graph was replaced): refetch /api/graph-data
+    nodes: List[NodeResponse] = []
+    links: List[LinkResponse] = []
+    deleted_nodes: List[str] = []
+    deleted_links: List[str] = []
+
+
+class TypePairCount(BaseModel):
+    source_type: Optional[str]  # None for links whose endpoint node is missing
+    target_type: Optional[str]
+    count: int
+
+
+class StrengthHistogram(BaseModel):
+    edges: List[float]  # counts[i] covers edges[i] <= strength < edges[i + 1]; the end bins take values outside [0, 1]
+    counts: List[int]
+    missing: int = 0  # links without a strength
+
+
+class GraphStats(BaseModel):
+    node_count: int
+    link_count: int
+    node_types: Dict[str, int]
+    relationship_types: Dict[str, int]
+    type_pairs: List[TypePairCount]  # most frequent first
+    strength: StrengthHistogram
+    strength_by_relationship_type: Dict[str, StrengthHistogram]
@@ -0,0 +1,95 @@
+import re
+from typing import Optional
+
+from sqlalchemy import column, func, literal_column, table, text
+from sqlalchemy.engine import Engine
+
+# Columns of `nodes` covered by the full-text index, with their BM25 weights
+SEARCH_COLUMNS = {
+    "name": 10.0,
+    "bio": 2.0,
+    "description": 2.0,
+    "methods": 1.0,
+    "steps": 1.0,
+    "challenges": 1.0,
+    "conditions": 1.0,
+}
+
+nodes_fts = table("nodes_fts", column("rowid"))
+
+
+def _column_list(prefix: str = "") -> str:
+    return ", ".join(prefix + name for name in SEARCH_COLUMNS)
+
+
+def create_search_index(engine: Engine) -> bool:
+    """Create the FTS5 index over `nodes` and its sync triggers, building it from existing rows
+
+    The index is an external-content table keyed on the implicit rowid of `nodes`,
+    so it must be rebuilt after a VACUUM (`python migrate.py reindex`).
+    Returns False when the database cannot provide FTS5.
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+
+    columns = _column_list()
+    new_values = _column_list("new.")
+    old_values = _column_list("old.")
+    with engine.begin() as conn:
+        exists = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'nodes_fts'"
+        )).first()
+        if not exists:
+            try:
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE nodes_fts USING fts5({columns}, content='nodes', "
+                    "content_rowid='rowid', tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+                ))
+            except Exception:
+                return False
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS nodes_fts_ai AFTER INSERT ON nodes BEGIN "
+            f"INSERT INTO nodes_fts(rowid, {columns}) VALUES (new.rowid, {new_values}); END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS nodes_fts_ad AFTER DELETE ON nodes BEGIN "
+            f"INSERT INTO nodes_fts(nodes_fts, rowid, {columns}) VALUES ('delete', old.rowid, {old_values}); END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS nodes_fts_au AFTER UPDATE ON nodes BEGIN "
+            f"INSERT INTO nodes_fts(nodes_fts, rowid, {columns}) VALUES ('delete', old.rowid, {old_values}); "
+            f"INSERT INTO nodes_fts(rowid, {columns}) VALUES (new.rowid, {new_values}); END"
+        ))
+        indexed = conn.execute(text("SELECT count(*) FROM nodes_fts_docsize")).scalar()
+        total = conn.execute(text("SELECT count(*) FROM nodes")).scalar()
+        if not exists or indexed != total:
+            conn.execute(text("INSERT INTO nodes_fts(nodes_fts) VALUES ('rebuild')"))
+    return True
+
+
+def rebuild_search_index(engine: Engine):
+    """Rebuild the full-text index from the current contents of `nodes`"""
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO nodes_fts(nodes_fts) VALUES ('rebuild')"))
+
+
+def build_match_query(q: str) -> Optional[str]:
+    """Turn free text into an FTS5 query matching every word as a prefix, None if q has no words"""
+    words = re.findall(r"\w+", q)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search_score():
+    """BM25 rank of the current match; lower is better"""
+    return func.bm25(literal_column("nodes_fts"), *SEARCH_COLUMNS.values())
+
+
+def search_snippet(tokens: int = 12):
+    """Fragment of the best matching column with hits wrapped in <mark>"""
+    return func.snippet(literal_column("nodes_fts"), -1, "<mark>", "</mark>", "…", tokens)
+
+
+def search_match(match_query: str):
+    return literal_column("nodes_fts").op("MATCH")(match_query)
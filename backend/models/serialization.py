@@ -0,0 +1,49 @@
+"""Encode node and link rows straight to JSON, without per-row pydantic models
+
+Rows are selected as plain column tuples in the response models' field order
+and encoded with orjson, giving the same bytes as `model_dump_json` on
+NodeResponse/LinkResponse. Endpoints using this keep their `response_model`
+for the OpenAPI schema but return the bytes directly, so nothing is validated
+twice.
+"""
+import json
+from typing import Iterable, List, Sequence
+
+try:
+    import orjson
+except ImportError:  # the stdlib encoder produces the same bytes, only slower
+    orjson = None
+
+from .db import Node, Link
+from .response import NodeResponse, LinkResponse
+
+NODE_FIELDS = tuple(NodeResponse.model_fields)
+LINK_FIELDS = tuple(LinkResponse.model_fields)
+NODE_COLUMNS = tuple(getattr(Node, field) for field in NODE_FIELDS)
+LINK_COLUMNS = tuple(getattr(Link, field) for field in LINK_FIELDS)
+
+# Built-in node projections for `view=`; `fields=` picks any other subset of NODE_FIELDS
+NODE_VIEWS = {"full": NODE_FIELDS, "summary": ("name", "type", "id")}
+
+
+def node_columns(fields: Sequence[str]) -> tuple:
+    """The Node columns to select for `fields`, so unselected text is never read"""
+    return tuple(getattr(Node, field) for field in fields)
+
+
+def dumps(value) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def as_dicts(fields: Sequence[str], rows: Iterable[Sequence]) -> List[dict]:
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def node_dicts(rows: Iterable[Sequence]) -> List[dict]:
+    return as_dicts(NODE_FIELDS, rows)
+
+
+def link_dicts(rows: Iterable[Sequence]) -> List[dict]:
+    return as_dicts(LINK_FIELDS, rows)
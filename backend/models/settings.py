@@ -0,0 +1,38 @@
+import os
+from dataclasses import dataclass, fields
+from typing import Mapping
+
+
+@dataclass(frozen=True)
+class DatabaseSettings:
+    """Database configuration, overridable through DB_* environment variables (and DATABASE_URL)"""
+
+    url: str = "sqlite:///./relationship_graph.db"
+    mode: str = "sync"  # "sync" runs read queries in the threadpool, "async" uses aiosqlite
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0  # seconds to wait for a pooled connection
+    connect_timeout: float = 5.0  # seconds SQLite waits on a locked database (busy_timeout)
+    slow_query_ms: float = 100.0  # statements taking longer are logged with their parameters
+
+    # SQLite pragmas applied to every connection
+    journal_mode: str = "wal"  # readers no longer block on the writer
+    synchronous: str = "normal"  # durable at checkpoints; safe against corruption in WAL mode
+    cache_size: int = -65536  # page cache per connection, negative values are KiB (64 MiB)
+    mmap_size: int = 268435456  # bytes of the database file read through mmap (256 MiB)
+
+    @classmethod
+    def from_env(cls, environ: Mapping[str, str] = os.environ) -> "DatabaseSettings":
+        values = {}
+        for f in fields(cls):
+            name = "DATABASE_URL" if f.name == "url" else f"DB_{f.name.upper()}"
+            if name in environ:
+                values[f.name] = f.type(environ[name]) if f.type is not str else environ[name]
+        settings = cls(**values)
+        if settings.mode not in ("sync", "async"):
+            raise ValueError(f"DB_MODE must be 'sync' or 'async', not {settings.mode!r}")
+        return settings
+
+    @property
+    def async_url(self) -> str:
+        return self.url.replace("sqlite://", "sqlite+aiosqlite://", 1)
@@ -1,5 +1,6 @@
 from models import Node, Link
 from models.db import SessionLocal
+from models.changes import record_resync
 import uuid
 
 
@@ -251,6 +252,7 @@ def populate_database():
         db.add(link)
 
     # Commit all changes
+    record_resync(db)
     db.commit()
     db.close()
 
@@ -1,19 +1,70 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, File, Query, Request, Response, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Integer, case, cast, func, insert, literal_column
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Callable, Hashable, Iterator, List, NamedTuple, Optional, Tuple, Union
+import asyncio
+import base64
+import binascii
+import io
+import json
+import os
 
 # FIXED IMPORTS - Use the same as your working populate_data.py
-from models.db import SessionLocal
+from models.db import (
+    AsyncSessionLocal, ReadSessionLocal, SessionLocal, SEARCH_INDEX_ENABLED, async_engine, data_version, engine
+)
+from models.changes import MAX_DELTA_ENTITIES, changes_since, latest_seq, record_change, record_changes, record_resync
+from models.serialization import (
+    LINK_COLUMNS, LINK_FIELDS, NODE_COLUMNS, NODE_FIELDS, NODE_VIEWS, as_dicts, dumps, link_dicts, node_columns,
+    node_dicts
+)
+from models.columnar import MEDIA_TYPE as COLUMNAR_MEDIA_TYPE, choose_encoding, compress, encode_graph, wants_columnar
+from models.metrics import REGISTRY, MetricsMiddleware
+from models.search import build_match_query, nodes_fts, search_match, search_score, search_snippet
 from models import (
     Node,
+    Change,
     NodeBase,
     NodeCreate,
     LinkCreate,
     Link,
     GraphData,
+    PositionedGraphData,
     LinkResponse,
-    NodeResponse
+    NodeResponse,
+    NodePage,
+    LinkPage,
+    SearchPage,
+    NodeSummary,
+    Neighbor,
+    Neighborhood,
+    Subgraph,
+    Suggestion,
+    Suggestions,
+    BulkImportResult,
+    NodeWithMetrics,
+    RankedNode,
+    GraphAnalytics,
+    GraphPath,
+    PathSearch,
+    GraphChanges,
+    GraphStats,
+    NodeBatchGet,
+    NodeBatch,
+    LinkBatchCreate,
+    LinkBatch
+)
+from bulk_import import DEFAULT_CHUNK_SIZE, detect_format, import_graph
+from graph import (
+    MAX_SUGGESTIONS, METRICS, AdjacencyIndex, AnalyticsWorker, CachedResponse, ChangeFollower, EventBroker, FacetCounters, GraphMetrics,
+    GraphSnapshot, GraphVersion, IndexedLink, IndexedNode, LayoutWorker, ResponseCache, STRENGTH_BINS, SharedSnapshot,
+    SnapshotData, resync_event, strength_bin
 )
 
 # FastAPI app
@@ -28,8 +79,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Added last so it is outermost and its timings include the other middleware;
+# API_PROFILING=1 lets requests with an X-Profile header return a profile instead
+app.add_middleware(MetricsMiddleware, profiling=os.environ.get("API_PROFILING") == "1")
+
 
-# Dependency to get DB session
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    # Pooled aiosqlite connections each hold a worker thread until closed
+    if async_engine is not None:
+        await async_engine.dispose()
+
+
+# Dependency to get DB session (the serialized writer; read endpoints use get_read_db)
 def get_db():
     db = SessionLocal()
     try:
@@ -38,6 +100,520 @@ def get_db():
         db.close()
 
 
+# Read endpoints are async: an AsyncSession when DB_MODE=async, otherwise a
+# sync session whose queries run in the threadpool. Either way, cache hits
+# are answered on the event loop without taking a worker thread.
+async def get_read_db() -> AsyncIterator[Any]:
+    await follow_other_writers()
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = ReadSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+async def run_db(db, fn: Callable[[Session], Any]) -> Any:
+    """Run sync query code `fn(session)` against a read session of either kind"""
+    if AsyncSessionLocal is not None:
+        return await db.run_sync(fn)
+    return await run_in_threadpool(fn, db)
+
+
+# Read responses are cached per graph version; every write endpoint bumps it
+graph_version = GraphVersion()
+response_cache = ResponseCache()
+
+
+
+# Push channel for /api/events; write endpoints publish after they commit
+event_broker = EventBroker()
+
+
+def publish_event(seq: int, entity: str, op: str, entity_id: str, types: Optional[List[str]], data: Optional[dict] = None):
+    """`types` are the node types the change touches, matched against subscriber filters (None: unknown)"""
+    event_broker.publish({"seq": seq, "entity": entity, "op": op, "id": entity_id, "types": types, "data": data})
+
+
+# Adjacency lists for neighborhood queries, loaded on first use
+graph_index = AdjacencyIndex()
+
+
+def load_index(db: Session) -> int:
+    """Load the index from one read snapshot, returning the last change-log seq it includes"""
+    seq = latest_seq(db)
+    graph_index.load(
+        db.query(Node.id, Node.name, Node.type).all(),
+        db.query(Link.id, Link.source_id, Link.target_id, Link.relationship_type, Link.strength).all()
+    )
+    return seq
+
+
+def replay_index_changes(since: int):
+    """Apply to the index what was committed after the snapshot it was loaded from
+
+    Writes are dropped while the index is not loaded, so one committed between
+    the snapshot and load() would otherwise never reach it. The follower's lock
+    keeps local writes from committing meanwhile; theirs follow these updates.
+    """
+    with change_follower.lock:
+        with ReadSessionLocal() as db:
+            delta = changes_since(db, since)
+            if delta.resync:
+                graph_index.reset()
+                return
+            nodes = links = []
+            if delta.upserted["node"]:
+                nodes = db.query(Node.id, Node.name, Node.type).filter(Node.id.in_(delta.upserted["node"])).all()
+            if delta.upserted["link"]:
+                links = db.query(Link.id, Link.source_id, Link.target_id, Link.relationship_type, Link.strength) \
+                    .filter(Link.id.in_(delta.upserted["link"])).all()
+        for link_id in delta.deleted["link"]:
+            graph_index.remove_link(link_id)
+        for node_id in delta.deleted["node"]:
+            graph_index.remove_node(node_id)
+        for row in nodes:
+            graph_index.upsert_node(*row)
+        for row in links:
+            graph_index.add_link(*row)
+
+
+async def get_index(db=Depends(get_read_db)) -> AdjacencyIndex:
+    # A replay that finds the log truncated or replaced resets the index, so load again
+    while not graph_index.loaded:
+        seq = await run_db(db, load_index)
+        await run_in_threadpool(replay_index_changes, seq)
+    return graph_index
+
+
+def analytics_graph():
+    """Runs on the analytics and layout threads, so it loads the index with its own session"""
+    while not graph_index.loaded:
+        with ReadSessionLocal() as db:
+            seq = load_index(db)
+        replay_index_changes(seq)
+    return graph_index.snapshot()
+
+
+# Degree, PageRank, components and betweenness, recomputed in the background per graph version
+analytics_worker = AnalyticsWorker(analytics_graph)
+# Force-directed positions, recomputed in the background (warm-started) per graph version
+layout_worker = LayoutWorker(analytics_graph)
+
+
+def link_facet_counts(db: Session, condition=None) -> list:
+    """(LinkFacet, count) for the links matching `condition`, grouped in SQL"""
+    source, target = aliased(Node), aliased(Node)
+    # Same binning as graph.strength_bin
+    strength = case(
+        (Link.strength.is_(None), None),
+        (Link.strength >= 1, STRENGTH_BINS - 1),
+        (Link.strength < 0, 0),
+        else_=cast(Link.strength * STRENGTH_BINS, Integer)
+    )
+    query = (
+        db.query(Link.relationship_type, source.type, target.type, strength, func.count())
+        .outerjoin(source, source.id == Link.source_id)
+        .outerjoin(target, target.id == Link.target_id)
+    )
+    if condition is not None:
+        query = query.filter(condition)
+    rows = query.group_by(Link.relationship_type, source.type, target.type, strength).all()
+    return [((relationship_type, source_type, target_type, bin_), count)
+            for relationship_type, source_type, target_type, bin_, count in rows]
+
+
+def fetch_facets():
+    """One snapshot of the change-log position, node type counts and link facet counts"""
+    with ReadSessionLocal() as db:
+        seq = latest_seq(db)
+        nodes = db.query(Node.type, func.count()).group_by(Node.type).all()
+        return seq, nodes, link_facet_counts(db)
+
+
+# Counts behind /api/stats, rebuilt at startup and adjusted by each write before it bumps the version
+facet_counters = FacetCounters()
+
+
+# Other worker processes (see API_WORKERS) and scripts such as bulk_import.py
+# write to the same database; their entries in the change log are applied
+# to this process's caches, index and event subscribers
+change_follower = ChangeFollower()
+# Seconds between checks for other writers' changes while /api/events has subscribers
+FOLLOW_INTERVAL = 0.1
+
+
+async def follow_other_writers():
+    """Catch up with other writers if anything was committed since the last check
+
+    The check is one PRAGMA data_version on the event loop, so requests pay
+    for a catch-up only after a commit, their own process's included.
+    """
+    if data_version.read() != change_follower.stamp:
+        await run_in_threadpool(catch_up_with_other_writers)
+
+
+def catch_up_with_other_writers():
+    with change_follower.lock:
+        stamp = data_version.read()
+        if stamp is not None and stamp == change_follower.stamp:
+            return
+        change_follower.stamp = stamp
+        with ReadSessionLocal() as db:
+            latest = latest_seq(db)
+            foreign = change_follower.foreign(latest)
+            if foreign == []:
+                return
+            entries = None
+            if foreign is not None and len(foreign) <= MAX_DELTA_ENTITIES:
+                wanted = set(foreign)
+                entries = [
+                    entry for entry in db.query(Change.seq, Change.entity, Change.entity_id, Change.op)
+                    .filter(Change.seq.between(foreign[0], foreign[-1])).order_by(Change.seq)
+                    if entry.seq in wanted
+                ]
+                # Compaction may have dropped some in favour of later local entries
+                if len(entries) < len(foreign):
+                    entries = None
+            if entries is not None:
+                rows = fetch_changed_rows(db, entries)
+
+        # Previous states are gone, so the counters are rebuilt on the next /api/stats
+        facet_counters.reset()
+        graph_version.bump()
+        if entries is None:
+            graph_index.reset()
+            event_broker.publish(resync_event(latest, "reset"))
+            return
+        apply_foreign_changes(entries, *rows)
+
+
+def fetch_changed_rows(db: Session, entries: list):
+    """Current rows of the nodes and links upserted by `entries`, and the types of the links' endpoints"""
+    upserted = {"node": set(), "link": set()}
+    for entry in entries:
+        if entry.entity in upserted and entry.op != "delete":
+            upserted[entry.entity].add(entry.entity_id)
+    nodes = {}
+    if upserted["node"]:
+        nodes = {row["id"]: row for row in node_dicts(db.query(*NODE_COLUMNS).filter(Node.id.in_(upserted["node"])))}
+    links = {}
+    if upserted["link"]:
+        links = {row["id"]: row for row in link_dicts(db.query(*LINK_COLUMNS).filter(Link.id.in_(upserted["link"])))}
+    node_types = {node_id: row["type"] for node_id, row in nodes.items()}
+    endpoints = {row[end] for row in links.values() for end in ("source_id", "target_id")} - node_types.keys()
+    if endpoints:
+        node_types.update(db.query(Node.id, Node.type).filter(Node.id.in_(endpoints)).all())
+    return nodes, links, node_types
+
+
+def apply_foreign_changes(entries: list, nodes: dict, links: dict, node_types: dict):
+    """Apply other writers' log entries, in order, to the index and publish them as events
+
+    Upserts carry the current row, so an entity changed again since its entry
+    is published in its latest state, and one deleted since is skipped.
+    """
+    for seq, entity, entity_id, op in entries:
+        if entity == "graph":
+            graph_index.reset()
+            event_broker.publish(resync_event(seq, "reset"))
+            continue
+        # Entries written before create and update were told apart
+        op = "update" if op == "upsert" else op
+        if entity == "node":
+            if op == "delete":
+                known = graph_index.nodes.get(entity_id)
+                graph_index.remove_node(entity_id)
+                # Without the index the node's type is unknown, so every subscriber is told
+                publish_event(seq, "node", "delete", entity_id, [known.type] if known else None)
+            elif entity_id in nodes:
+                row = nodes[entity_id]
+                known = graph_index.nodes.get(entity_id)
+                touched = sorted({row["type"], known.type if known else row["type"]})
+                graph_index.upsert_node(entity_id, row["name"], row["type"])
+                publish_event(seq, "node", op, entity_id, touched, row)
+        elif op == "delete":
+            known = graph_index.links.get(entity_id)
+            link_types = None
+            if known is not None:
+                link_types = sorted({node.type for node in map(graph_index.nodes.get, (known.source_id, known.target_id))
+                                     if node is not None})
+            graph_index.remove_link(entity_id)
+            publish_event(seq, "link", "delete", entity_id, link_types)
+        elif entity_id in links:
+            row = links[entity_id]
+            graph_index.add_link(entity_id, row["source_id"], row["target_id"], row["relationship_type"], row["strength"])
+            link_types = sorted({node_types.get(row["source_id"]), node_types.get(row["target_id"])} - {None})
+            publish_event(seq, "link", op, entity_id, link_types, row)
+
+
+@app.on_event("startup")
+async def load_facet_counters():
+    # Start following the change log first, so no other writer's entry falls between the two
+    await run_in_threadpool(catch_up_with_other_writers)
+    await run_in_threadpool(facet_counters.ensure_loaded, fetch_facets)
+
+
+async def poll_other_writers():
+    """Relay other writers' changes to /api/events subscribers even when no requests arrive"""
+    while True:
+        await asyncio.sleep(FOLLOW_INTERVAL)
+        if event_broker.subscriber_count:
+            await follow_other_writers()
+
+
+@app.on_event("startup")
+async def start_polling_other_writers():
+    app.state.poller = asyncio.ensure_future(poll_other_writers())
+
+
+@app.on_event("shutdown")
+async def stop_polling_other_writers():
+    app.state.poller.cancel()
+
+
+# With API_SNAPSHOT set to a file path, the graph is written to a memory-mapped
+# snapshot after each batch of writes, and every worker process serves the
+# unfiltered graph-data, neighbors and stats from it instead of its own copy
+SNAPSHOT_PATH = os.environ.get("API_SNAPSHOT")
+graph_snapshot = SharedSnapshot(SNAPSHOT_PATH) if SNAPSHOT_PATH else None
+
+
+@contextmanager
+def snapshot_data() -> Iterator[SnapshotData]:
+    """What the snapshot is written from; the graph-data body streams from the open transaction"""
+    with ReadSessionLocal() as db:
+        seq = latest_seq(db)
+        nodes = db.query(Node.id, Node.name, Node.type).all()
+        links = db.query(Link.id, Link.source_id, Link.target_id, Link.relationship_type, Link.strength).all()
+        # Counted from the rows in hand rather than with fetch_facets' GROUP BY
+        node_types = dict((node_id, node_type) for node_id, _, node_type in nodes)
+        counters = FacetCounters()
+        counters.ensure_loaded(lambda: (seq, Counter(node_types.values()).items(), Counter(
+            (relationship_type, node_types.get(source_id), node_types.get(target_id), strength_bin(strength))
+            for _, source_id, target_id, relationship_type, strength in links
+        ).items()))
+        # The same bytes the endpoints build, so ETags carry over between the two
+        yield SnapshotData(seq, nodes, links, blobs={
+            "graph_data": graph_data_chunks(db),
+            "stats": [dumps(counters.summary())],
+        })
+
+
+@app.on_event("startup")
+async def start_snapshot_writer():
+    if graph_snapshot is not None:
+        graph_snapshot.start(data_version.read, read_latest_seq, snapshot_data, FOLLOW_INTERVAL)
+
+
+def current_snapshot() -> Optional[GraphSnapshot]:
+    """The shared snapshot if it reflects exactly the changes this process has followed, else None
+
+    Callers follow other writers first. Until the snapshot is rewritten after
+    a write, they fall back to the database.
+    """
+    if graph_snapshot is None:
+        return None
+    snapshot = graph_snapshot.current()
+    if snapshot is None or snapshot.seq != change_follower.seq:
+        return None
+    return snapshot
+
+
+def split_csv(value: Optional[str]) -> Optional[set]:
+    """Parse a comma-separated query parameter into a set, None when absent"""
+    if not value:
+        return None
+    return {item.strip() for item in value.split(",") if item.strip()}
+
+
+def node_projection(fields: Optional[str], view: Optional[str]) -> Tuple[str, ...]:
+    """The node fields asked for by `fields=` or `view=`, in NODE_FIELDS order and always with the id"""
+    if fields and view:
+        raise HTTPException(status_code=400, detail="Pass either fields or view, not both")
+    if view:
+        if view not in NODE_VIEWS:
+            raise HTTPException(status_code=400, detail=f"Unknown view; expected one of {', '.join(NODE_VIEWS)}")
+        return NODE_VIEWS[view]
+    requested = split_csv(fields)
+    if not requested:
+        return NODE_FIELDS
+    unknown = requested.difference(NODE_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown node fields: {', '.join(sorted(unknown))}")
+    return tuple(field for field in NODE_FIELDS if field in requested or field == "id")
+
+
+FIELDS_QUERY = Query(None, description="Comma-separated node fields to return (the id is always included)")
+VIEW_QUERY = Query(None, description="Named set of node fields: full (the default) or summary (id, name, type)")
+
+
+class GraphFilter(NamedTuple):
+    """Filters of /api/graph-data, normalised so equal filters share one cache entry
+
+    Nodes must match `types` and `ids`; links must match `relationship_types`
+    and `min_strength` and have both endpoints among the matching nodes.
+    """
+    types: Optional[Tuple[str, ...]] = None
+    relationship_types: Optional[Tuple[str, ...]] = None
+    min_strength: Optional[float] = None
+    ids: Optional[Tuple[str, ...]] = None
+
+    @classmethod
+    def parse(cls, types: Optional[str], relationship_types: Optional[str], min_strength: Optional[float],
+              ids: Optional[str]) -> "GraphFilter":
+        def normalised(value: Optional[str]) -> Optional[Tuple[str, ...]]:
+            items = split_csv(value)
+            return tuple(sorted(items)) if items else None
+
+        return cls(normalised(types), normalised(relationship_types), min_strength, normalised(ids))
+
+    def node_condition(self, node) -> list:
+        """Conditions on `node` (Node or an alias of it) for it to be included"""
+        conditions = []
+        if self.types is not None:
+            conditions.append(node.type.in_(self.types))
+        if self.ids is not None:
+            conditions.append(node.id.in_(self.ids))
+        return conditions
+
+    def nodes(self, db: Session, columns: tuple = NODE_COLUMNS):
+        return db.query(*columns).filter(*self.node_condition(Node))
+
+    def links(self, db: Session):
+        query = db.query(*LINK_COLUMNS)
+        if self.relationship_types is not None:
+            query = query.filter(Link.relationship_type.in_(self.relationship_types))
+        if self.min_strength is not None:
+            query = query.filter(Link.strength >= self.min_strength)
+        if self.ids is not None:
+            query = query.filter(Link.source_id.in_(self.ids), Link.target_id.in_(self.ids))
+        if self.types is not None:
+            # Both endpoints are looked up by primary key, so this stays an indexed join
+            source, target = aliased(Node), aliased(Node)
+            query = (
+                query.join(source, source.id == Link.source_id)
+                .join(target, target.id == Link.target_id)
+                .filter(source.type.in_(self.types), target.type.in_(self.types))
+            )
+        return query
+
+
+NO_FILTER = GraphFilter()
+
+
+# Keyset pagination limits; `unpaginated=true` keeps the old bare-list responses
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_UNPAGINATED_ROWS = 10000
+
+
+def encode_cursor(key: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor: str, ranked: bool = False) -> list:
+    """The [id] (or [rank, id] when `ranked`) a cursor encodes; 400 for anything else"""
+    try:
+        key = json.loads(base64.b64decode(cursor.encode(), altchars=b"-_", validate=True))
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # Values are bound into the keyset comparison, so only the types it was encoded from will do
+    if not isinstance(key, list) or len(key) != (2 if ranked else 1) or not isinstance(key[-1], str) or (
+        ranked and (isinstance(key[0], bool) or not isinstance(key[0], (int, float)))
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key
+
+
+def keyset_page(query, key_column, limit: int, after: Optional[str], unpaginated: bool, rank=None):
+    """Fetch one page of `query` ordered by `key_column`, returning (rows, next_cursor)
+
+    With `rank`, rows are ordered by that expression first; the query must then
+    also select the rank as a column labelled "rank".
+    """
+    order = (key_column,) if rank is None else (rank, key_column)
+    query = query.order_by(*order)
+    if unpaginated:
+        rows = query.limit(MAX_UNPAGINATED_ROWS + 1).all()
+        if len(rows) > MAX_UNPAGINATED_ROWS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Result exceeds {MAX_UNPAGINATED_ROWS} rows; use limit/after pagination"
+            )
+        return rows, None
+
+    if after:
+        key = decode_cursor(after, ranked=rank is not None)
+        if rank is None:
+            query = query.filter(key_column > key[0])
+        else:
+            query = query.filter((rank > key[0]) | ((rank == key[0]) & (key_column > key[1])))
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    if rank is None:
+        return rows, encode_cursor([getattr(last, key_column.key)])
+    return rows, encode_cursor([last.rank, getattr(last, key_column.key)])
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check If-None-Match against an ETag (weak comparison, as RFC 9110 requires)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+async def cached_json(
+    request: Request,
+    key: Hashable,
+    db,
+    build: Callable[[Session], bytes],
+    media_type: str = "application/json",
+    headers: Optional[dict] = None
+) -> Response:
+    """Serve a body (JSON unless told otherwise) built once per graph version, answering 304 to matching clients"""
+    version = graph_version.current
+    entry = response_cache.get(key, version)
+    if entry is None:
+        entry = response_cache.put(key, version, await run_db(db, build))
+    return cached_response(request, entry, media_type, headers)
+
+
+def cached_response(
+    request: Request, entry: CachedResponse, media_type: str = "application/json", headers: Optional[dict] = None
+) -> Response:
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache", **(headers or {})}
+    if etag_matches(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type=media_type, headers=headers)
+
+
+class SnapshotResponse(Response):
+    """Sends a memoryview into the snapshot as the body, without copying it first"""
+
+    def render(self, content: memoryview) -> memoryview:
+        return content
+
+
+def snapshot_response(
+    request: Request, snapshot: GraphSnapshot, section: str, headers: Optional[dict] = None
+) -> Response:
+    """Serve a pre-encoded JSON body from the snapshot, answering 304 to matching clients"""
+    etag = snapshot.etags[section]
+    headers = {"ETag": etag, "Cache-Control": "no-cache", **(headers or {})}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return SnapshotResponse(content=snapshot.section(section), media_type="application/json", headers=headers)
+
+
 # API Endpoints
 
 @app.get("/")
@@ -45,35 +621,312 @@ def read_root():
     return {"message": "Relationship Graph API"}
 
 
-@app.get("/api/graph-data", response_model=GraphData)
-def get_graph_data(db: Session = Depends(get_db)):
-    """Get all nodes and links for the graph"""
-    nodes = db.query(Node).all()
-    links = db.query(Link).all()
+REGISTRY.collect("response_cache_hits_total", "Read responses served from the cache", lambda: response_cache.hits,
+                 kind="counter")
+REGISTRY.collect("response_cache_misses_total", "Read responses built because the cache had no current entry",
+                 lambda: response_cache.misses, kind="counter")
+REGISTRY.collect("response_cache_entries", "Responses held in the cache", lambda: len(response_cache))
+REGISTRY.collect("response_cache_bytes", "Bytes of the response bodies held in the cache", lambda: response_cache.size)
+REGISTRY.collect("graph_version", "Writes to the graph since startup", lambda: graph_version.current)
+REGISTRY.collect("event_subscribers", "Connected /api/events WebSockets", lambda: event_broker.subscriber_count)
 
-    return GraphData(
-        nodes=[NodeResponse.from_orm(node) for node in nodes],
-        links=[LinkResponse.from_orm(link) for link in links]
-    )
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Request, SQL and cache metrics in the Prometheus text format"""
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
-@app.get("/api/nodes", response_model=List[NodeResponse])
-def get_nodes(node_type: Optional[str] = None, db: Session = Depends(get_db)):
-    """Get all nodes, optionally filtered by type"""
-    query = db.query(Node)
-    if node_type:
-        query = query.filter(Node.type == node_type)
-    nodes = query.all()
-    return [NodeResponse.from_orm(node) for node in nodes]
 
+@app.get(
+    "/api/graph-data",
+    response_model=Union[GraphData, PositionedGraphData],
+    responses={200: {"content": {COLUMNAR_MEDIA_TYPE: {}}, "description": "JSON, or columnar MessagePack on request"}}
+)
+async def get_graph_data(
+    request: Request,
+    layout: bool = Query(False, description="Include precomputed x/y positions for every node"),
+    types: Optional[str] = Query(None, description="Comma-separated node types to include"),
+    relationship_types: Optional[str] = Query(None, description="Comma-separated relationship types to include"),
+    min_strength: Optional[float] = Query(None, description="Leave out links weaker than this"),
+    ids: Optional[str] = Query(None, description="Comma-separated node ids to include"),
+    fields: Optional[str] = FIELDS_QUERY,
+    view: Optional[str] = VIEW_QUERY,
+    db=Depends(get_read_db)
+):
+    """Get all nodes and links for the graph, or the subgraph matching the filters
 
-@app.get("/api/nodes/{node_id}", response_model=NodeResponse)
-def get_node(node_id: str, db: Session = Depends(get_db)):
+    A link is only included when both of its endpoints are. Send
+    `Accept: application/x-msgpack` for the compact columnar encoding
+    described in models/columnar.py, gzip- or brotli-compressed per Accept-Encoding.
+    `view=summary` leaves out the text fields, which make up most of the payload;
+    fetch them per node from /api/nodes/{id} or /api/nodes:batchGet when needed.
+    """
+    graph_filter = GraphFilter.parse(types, relationship_types, min_strength, ids)
+    node_fields = node_projection(fields, view)
+    projection = () if node_fields == NODE_FIELDS else (node_fields,)
+    positions = layout_version = None
+    if layout:
+        # The last finished layout, which may predate the latest writes
+        result = layout_worker.request(graph_version.current)
+        if result is None:
+            raise HTTPException(
+                status_code=503,
+                detail="The layout is being computed; retry shortly",
+                headers={"Retry-After": "1"}
+            )
+        positions, layout_version = result.positions, result.version
+
+    if wants_columnar(request.headers.get("accept", "")):
+        encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+        headers = {"Vary": "Accept, Accept-Encoding"}
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+
+        def build_columnar(db: Session):
+            node_rows = graph_filter.nodes(db, node_columns(node_fields)).all()
+            payload = encode_graph(node_rows, graph_filter.links(db).all(), positions, node_fields)
+            return compress(payload, encoding)
+
+        key = ("graph-data", "columnar", layout_version, encoding, graph_filter, *projection)
+        return await cached_json(request, key, db, build_columnar, COLUMNAR_MEDIA_TYPE, headers)
+
+    if graph_filter == NO_FILTER and not layout and not projection:
+        snapshot = current_snapshot()
+        if snapshot is not None:
+            # Drop the body cached while the snapshot lagged behind
+            response_cache.discard(("graph-data",))
+            return snapshot_response(request, snapshot, "graph_data", headers={"Vary": "Accept, Accept-Encoding"})
+
+    def build(db: Session):
+        nodes = as_dicts(node_fields, graph_filter.nodes(db, node_columns(node_fields)))
+        if positions is not None:
+            for node in nodes:
+                node["x"], node["y"] = positions.get(node["id"], (0.0, 0.0))
+        return dumps({"nodes": nodes, "links": link_dicts(graph_filter.links(db))})
+
+    key = ("graph-data", "layout", layout_version) if layout else ("graph-data",)
+    if graph_filter != NO_FILTER:
+        key += (graph_filter,)
+    key += projection
+    return await cached_json(request, key, db, build, headers={"Vary": "Accept, Accept-Encoding"})
+
+
+# Rows fetched from the database cursor per NDJSON chunk
+STREAM_BATCH_SIZE = 500
+
+
+def stream_graph_ndjson(batch_size: int = STREAM_BATCH_SIZE) -> Iterator[bytes]:
+    """Yield the graph as NDJSON chunks, nodes first, never holding more than one batch
+
+    The generator owns its session because it runs after the request's
+    dependencies may already have been torn down.
+    """
+    db = ReadSessionLocal()
+    try:
+        for kind, model, columns, fields in (
+            ("node", Node, NODE_COLUMNS, NODE_FIELDS),
+            ("link", Link, LINK_COLUMNS, LINK_FIELDS),
+        ):
+            chunk = []
+            for row in db.query(*columns).order_by(model.id).yield_per(batch_size):
+                chunk.append(dumps({"kind": kind, "data": dict(zip(fields, row))}) + b"\n")
+                if len(chunk) >= batch_size:
+                    yield b"".join(chunk)
+                    chunk = []
+            if chunk:
+                yield b"".join(chunk)
+    finally:
+        db.close()
+
+
+def graph_data_chunks(db: Session, batch_size: int = STREAM_BATCH_SIZE) -> Iterator[bytes]:
+    """The unfiltered /api/graph-data JSON body in pieces, the same bytes as building it whole"""
+    for opening, query, to_dicts in ((b'{"nodes":[', NO_FILTER.nodes(db), node_dicts),
+                                     (b'],"links":[', NO_FILTER.links(db), link_dicts)):
+        yield opening
+        separator, batch = b"", []
+        for row in query.yield_per(batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield separator + dumps(to_dicts(batch))[1:-1]
+                separator, batch = b",", []
+        if batch:
+            yield separator + dumps(to_dicts(batch))[1:-1]
+    yield b"]}"
+
+
+@app.get("/api/graph-data/stream")
+def stream_graph_data():
+    """Stream all nodes then all links as newline-delimited JSON records"""
+    return StreamingResponse(stream_graph_ndjson(), media_type="application/x-ndjson")
+
+
+@app.get("/api/nodes", response_model=Union[NodePage, List[NodeResponse]])
+async def get_nodes(
+    request: Request,
+    node_type: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    unpaginated: bool = False,
+    fields: Optional[str] = FIELDS_QUERY,
+    view: Optional[str] = VIEW_QUERY,
+    db=Depends(get_read_db)
+):
+    """Get a page of nodes, optionally filtered by type"""
+    node_fields = node_projection(fields, view)
+
+    def build(db: Session):
+        query = db.query(*node_columns(node_fields))
+        if node_type:
+            query = query.filter(Node.type == node_type)
+        rows, next_cursor = keyset_page(query, Node.id, limit, after, unpaginated)
+        items = as_dicts(node_fields, rows)
+        if unpaginated:
+            return dumps(items)
+        return dumps({"items": items, "next_cursor": next_cursor})
+
+    key = ("nodes", node_type or None, limit, after, unpaginated)
+    if node_fields != NODE_FIELDS:
+        key += (node_fields,)
+    return await cached_json(request, key, db, build)
+
+
+@app.get("/api/nodes/{node_id}", response_model=Union[NodeResponse, NodeWithMetrics])
+async def get_node(
+    node_id: str,
+    metrics: bool = Query(False, description="Include graph metrics (null until the first analytics run finishes)"),
+    db=Depends(get_read_db)
+):
     """Get a specific node by ID"""
-    node = db.query(Node).filter(Node.id == node_id).first()
+    def fetch(db: Session):
+        node = db.query(Node).filter(Node.id == node_id).first()
+        return NodeResponse.from_orm(node) if node else None
+
+    node = await run_db(db, fetch)
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
-    return NodeResponse.from_orm(node)
+    if not metrics:
+        return node
+    result = analytics_worker.request(graph_version.current)
+    values = result.node(node_id) if result else None
+    body = NodeWithMetrics(**node.dict(), metrics=values).model_dump_json()
+    return Response(content=body, media_type="application/json")
+
+
+@app.post("/api/nodes:batchGet", response_model=NodeBatch)
+async def batch_get_nodes(batch: NodeBatchGet, db=Depends(get_read_db)):
+    """Get many nodes by id with one indexed IN query"""
+    ids = list(dict.fromkeys(batch.ids))
+
+    def build(db: Session):
+        found = {row["id"]: row for row in node_dicts(db.query(*NODE_COLUMNS).filter(Node.id.in_(ids)))}
+        return dumps({
+            "items": [found[node_id] for node_id in ids if node_id in found],
+            "missing": [node_id for node_id in ids if node_id not in found]
+        })
+
+    return Response(content=await run_db(db, build), media_type="application/json")
+
+
+def fetch_neighbors(db: Session, node_id: str) -> Optional[List[Tuple[IndexedLink, IndexedNode]]]:
+    """AdjacencyIndex.neighbors answered by indexed lookups; None if the node does not exist"""
+    if db.query(Node.id).filter(Node.id == node_id).first() is None:
+        return None
+    other = aliased(Node)
+    rows = (
+        db.query(Link.id, Link.source_id, Link.target_id, Link.relationship_type, func.coalesce(Link.strength, 1.0),
+                 other.id, other.name, other.type)
+        .join(other, other.id == case((Link.source_id == node_id, Link.target_id), else_=Link.source_id))
+        .filter((Link.source_id == node_id) | (Link.target_id == node_id))
+        .order_by(Link.id)
+    )
+    return [(IndexedLink(*row[:5]), IndexedNode(*row[5:])) for row in rows]
+
+
+@app.get("/api/nodes/{node_id}/neighbors", response_model=Neighborhood)
+async def get_node_neighbors(node_id: str, db=Depends(get_read_db)):
+    """Get the nodes directly linked to a node"""
+    snapshot = current_snapshot()
+    if snapshot is not None:
+        neighbors = snapshot.neighbors(node_id) if node_id in snapshot else None
+    elif graph_snapshot is not None:
+        # Until the snapshot catches up, query rather than load a copy of the graph into this process
+        neighbors = await run_db(db, lambda db: fetch_neighbors(db, node_id))
+    else:
+        index = await get_index(db)
+        neighbors = index.neighbors(node_id) if node_id in index.nodes else None
+    if neighbors is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+
+    return Neighborhood(node_id=node_id, neighbors=[
+        Neighbor(
+            node=NodeSummary.from_orm(other),
+            link=LinkResponse.from_orm(link),
+            direction="out" if link.source_id == node_id else "in"
+        )
+        for link, other in neighbors
+    ])
+
+
+@app.get("/api/nodes/{node_id}/subgraph", response_model=Subgraph)
+async def get_node_subgraph(
+    node_id: str,
+    depth: int = Query(1, ge=1, le=5),
+    types: Optional[str] = Query(None, description="Comma-separated node types to traverse"),
+    min_strength: Optional[float] = None,
+    index: AdjacencyIndex = Depends(get_index)
+):
+    """Get the k-hop neighborhood of a node"""
+    if node_id not in index.nodes:
+        raise HTTPException(status_code=404, detail="Node not found")
+
+    nodes, links = index.subgraph(node_id, depth=depth, types=split_csv(types), min_strength=min_strength)
+    return Subgraph(
+        nodes=[NodeSummary.from_orm(node) for node in nodes],
+        links=[LinkResponse.from_orm(link) for link in links]
+    )
+
+
+def explain_path(nodes: list, links: list) -> str:
+    """Render a path as text, e.g. Ana -[member_of]-> Waag <-[hosts]- Synocene"""
+    parts = [nodes[0].name]
+    for link, previous, node in zip(links, nodes, nodes[1:]):
+        if link.source_id == previous.id:
+            parts.append(f"-[{link.relationship_type}]-> {node.name}")
+        else:
+            parts.append(f"<-[{link.relationship_type}]- {node.name}")
+    return " ".join(parts)
+
+
+@app.get("/api/path", response_model=PathSearch)
+async def get_path(
+    source_id: str = Query(..., alias="from"),
+    target_id: str = Query(..., alias="to"),
+    weighted: bool = Query(False, description="Minimise the sum of 1 / strength instead of the hop count"),
+    k: int = Query(1, ge=1, le=10, description="Number of alternative paths, best first"),
+    index: AdjacencyIndex = Depends(get_index)
+):
+    """Find how two nodes are connected, following links in either direction"""
+    for node_id in (source_id, target_id):
+        if node_id not in index.nodes:
+            raise HTTPException(status_code=404, detail=f"Node {node_id} not found")
+
+    paths = await run_in_threadpool(index.paths, source_id, target_id, k, weighted)
+    return PathSearch(
+        source_id=source_id,
+        target_id=target_id,
+        weighted=weighted,
+        paths=[
+            GraphPath(
+                cost=cost,
+                hops=len(links),
+                nodes=[NodeSummary.from_orm(node) for node in nodes],
+                links=[LinkResponse.from_orm(link) for link in links],
+                explanation=explain_path(nodes, links)
+            )
+            for cost, nodes, links in paths
+        ]
+    )
 
 
 @app.post("/api/nodes", response_model=NodeResponse)
@@ -86,9 +939,16 @@ def create_node(node: NodeCreate, db: Session = Depends(get_db)):
 
     db_node = Node(**node.dict())
     db.add(db_node)
-    db.commit()
-    db.refresh(db_node)
-    return NodeResponse.from_orm(db_node)
+    seq = record_change(db, "node", db_node.id, "create")
+    with change_follower.lock:
+        db.commit()
+        change_follower.local(seq)
+        facet_counters.apply(seq, nodes=[(node.type, 1)])
+        graph_version.bump()
+        graph_index.upsert_node(db_node.id, db_node.name, db_node.type)
+    created = NodeResponse.from_orm(db_node)
+    publish_event(seq, "node", "create", created.id, [created.type], created.model_dump(mode="json"))
+    return created
 
 
 @app.put("/api/nodes/{node_id}", response_model=NodeResponse)
@@ -98,12 +958,29 @@ def update_node(node_id: str, node: NodeBase, db: Session = Depends(get_db)):
     if not db_node:
         raise HTTPException(status_code=404, detail="Node not found")
 
-    for field, value in node.dict(exclude_unset=True).items():
+    previous_type = db_node.type
+    changes = node.dict(exclude_unset=True)
+    retyped = changes.get("type", previous_type) != previous_type
+    # A new type moves every attached link to another type pair
+    attached = (Link.source_id == node_id) | (Link.target_id == node_id)
+    link_facets = [(facet, -count) for facet, count in link_facet_counts(db, attached)] if retyped else []
+    for field, value in changes.items():
         setattr(db_node, field, value)
+    if retyped:
+        db.flush()
+        link_facets += link_facet_counts(db, attached)
 
-    db.commit()
-    db.refresh(db_node)
-    return NodeResponse.from_orm(db_node)
+    seq = record_change(db, "node", node_id, "update")
+    with change_follower.lock:
+        db.commit()
+        change_follower.local(seq)
+        if retyped:
+            facet_counters.apply(seq, nodes=[(previous_type, -1), (db_node.type, 1)], links=link_facets)
+        graph_version.bump()
+        graph_index.upsert_node(db_node.id, db_node.name, db_node.type)
+    updated = NodeResponse.from_orm(db_node)
+    publish_event(seq, "node", "update", node_id, sorted({previous_type, updated.type}), updated.model_dump(mode="json"))
+    return updated
 
 
 @app.delete("/api/nodes/{node_id}")
@@ -114,37 +991,202 @@ def delete_node(node_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Node not found")
 
     # Delete all links connected to this node
-    db.query(Link).filter(
-        (Link.source_id == node_id) | (Link.target_id == node_id)
-    ).delete()
+    attached = db.query(Link).filter((Link.source_id == node_id) | (Link.target_id == node_id))
+    cascaded = attached.with_entities(
+        Link.id, Link.source_id, Link.target_id, Link.relationship_type, Link.strength
+    ).order_by(Link.id).all()
+    neighbors = {link.source_id for link in cascaded} | {link.target_id for link in cascaded}
+    node_types = dict(db.query(Node.id, Node.type).filter(Node.id.in_(neighbors)).all())
+    last_link_seq = record_changes(db, "link", "delete", [link.id for link in cascaded])
+    attached.delete()
 
     db.delete(db_node)
-    db.commit()
+    seq = record_change(db, "node", node_id, "delete")
+    with change_follower.lock:
+        db.commit()
+        change_follower.local(seq - len(cascaded), seq)
+        facet_counters.apply(seq, nodes=[(db_node.type, -1)], links=[
+            ((link.relationship_type, node_types.get(link.source_id), node_types.get(link.target_id),
+              strength_bin(link.strength)), -1)
+            for link in cascaded
+        ])
+        graph_version.bump()
+        graph_index.remove_node(node_id)
+
+    # The cascaded entries were appended in order, just before the node's own
+    for offset, (link_id, source_id, target_id, _, _) in enumerate(cascaded, start=1 - len(cascaded)):
+        link_types = sorted({node_types.get(source_id), node_types.get(target_id)} - {None})
+        publish_event(last_link_seq + offset, "link", "delete", link_id, link_types)
+    publish_event(seq, "node", "delete", node_id, [db_node.type])
     return {"message": "Node deleted successfully"}
 
 
-@app.get("/api/links", response_model=List[LinkResponse])
-def get_links(db: Session = Depends(get_db)):
-    """Get all links"""
-    links = db.query(Link).all()
-    return [LinkResponse.from_orm(link) for link in links]
+@app.get("/api/links", response_model=Union[LinkPage, List[LinkResponse]])
+async def get_links(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    unpaginated: bool = False,
+    db=Depends(get_read_db)
+):
+    """Get a page of links"""
+    def build(db: Session):
+        rows, next_cursor = keyset_page(db.query(*LINK_COLUMNS), Link.id, limit, after, unpaginated)
+        items = link_dicts(rows)
+        if unpaginated:
+            return dumps(items)
+        return dumps({"items": items, "next_cursor": next_cursor})
+
+    return await cached_json(request, ("links", limit, after, unpaginated), db, build)
+
+
+@app.get("/api/changes", response_model=GraphChanges)
+async def get_changes(request: Request, since: int = Query(0, ge=0), db=Depends(get_read_db)):
+    """Nodes and links created, updated or deleted after sequence number `since`
+
+    Poll with the returned `seq`. To start, read `seq` first and only then fetch
+    /api/graph-data: applying a delta twice is harmless, missing one is not.
+    """
+    def build(db: Session):
+        delta = changes_since(db, since)
+        changes = GraphChanges(since=since, seq=delta.seq, resync=delta.resync)
+        if delta.resync:
+            return changes.model_dump_json().encode()
+        body = changes.model_dump()
+        if delta.upserted["node"]:
+            rows = db.query(*NODE_COLUMNS).filter(Node.id.in_(delta.upserted["node"])).order_by(Node.id)
+            body["nodes"] = node_dicts(rows)
+        if delta.upserted["link"]:
+            rows = db.query(*LINK_COLUMNS).filter(Link.id.in_(delta.upserted["link"])).order_by(Link.id)
+            body["links"] = link_dicts(rows)
+        body["deleted_nodes"] = sorted(delta.deleted["node"])
+        body["deleted_links"] = sorted(delta.deleted["link"])
+        return dumps(body)
+
+    return await cached_json(request, ("changes", since), db, build)
+
+
+def read_latest_seq() -> int:
+    with ReadSessionLocal() as db:
+        return latest_seq(db)
+
+
+async def forward_events(websocket: WebSocket, subscription):
+    try:
+        while True:
+            await websocket.send_json(await subscription.get())
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+
+
+async def wait_for_disconnect(websocket: WebSocket):
+    # Messages from the client are ignored; this only notices when it goes away
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+
+@app.websocket("/api/events")
+async def graph_events(websocket: WebSocket, types: Optional[str] = None, since: Optional[int] = None):
+    """Push node and link mutations to the client as JSON messages
+
+    Messages look like {"seq", "entity", "op", "id", "types", "data"} with op
+    create, update or delete. `types` keeps only changes touching those node
+    types (a link matches through either endpoint). {"op": "resync"} means
+    events were dropped or the graph was replaced; catch up with
+    /api/changes?since=<last seq applied>. Pass `since` when reconnecting.
+    """
+    await websocket.accept()
+    # Subscribe before reading the latest seq, so nothing falls in between
+    subscription = event_broker.subscribe(split_csv(types))
+    try:
+        if since is not None:
+            latest = await run_in_threadpool(read_latest_seq)
+            if since < latest:
+                await websocket.send_json(resync_event(latest, "behind"))
+        tasks = {
+            asyncio.ensure_future(forward_events(websocket, subscription)),
+            asyncio.ensure_future(wait_for_disconnect(websocket)),
+        }
+        _, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+    finally:
+        event_broker.unsubscribe(subscription)
+
+
+def endpoint_types(db: Session, links: List[LinkCreate]) -> dict:
+    """Node type by id for the endpoints of `links` that exist, from one IN query"""
+    ids = {node_id for link in links for node_id in (link.source_id, link.target_id)}
+    return dict(db.query(Node.id, Node.type).filter(Node.id.in_(ids)).all())
 
 
 @app.post("/api/links", response_model=LinkResponse)
 def create_link(link: LinkCreate, db: Session = Depends(get_db)):
     """Create a new link"""
     # Verify that both nodes exist
-    source_exists = db.query(Node).filter(Node.id == link.source_id).first()
-    target_exists = db.query(Node).filter(Node.id == link.target_id).first()
-
-    if not source_exists or not target_exists:
+    node_types = endpoint_types(db, [link])
+    if link.source_id not in node_types or link.target_id not in node_types:
         raise HTTPException(status_code=400, detail="Source or target node does not exist")
+    source_type, target_type = node_types[link.source_id], node_types[link.target_id]
 
     db_link = Link(**link.dict())
     db.add(db_link)
-    db.commit()
-    db.refresh(db_link)
-    return LinkResponse.from_orm(db_link)
+    seq = record_change(db, "link", db_link.id, "create")
+    link_types = sorted({source_type, target_type})
+    with change_follower.lock:
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(status_code=400, detail="Link with this ID or the same endpoints and relationship type already exists")
+        change_follower.local(seq)
+        facet_counters.apply(seq, links=[
+            ((link.relationship_type, source_type, target_type, strength_bin(link.strength)), 1)
+        ])
+        graph_version.bump()
+        graph_index.add_link(db_link.id, db_link.source_id, db_link.target_id, db_link.relationship_type, db_link.strength)
+    created = LinkResponse.from_orm(db_link)
+    publish_event(seq, "link", "create", created.id, link_types, created.model_dump(mode="json"))
+    return created
+
+
+@app.post("/api/links:batch", response_model=LinkBatch)
+def create_links(batch: LinkBatchCreate, db: Session = Depends(get_db)):
+    """Create many links in one transaction; none are created if any is invalid"""
+    links = batch.links
+    node_types = endpoint_types(db, links)
+    missing = sorted({link_id for link in links for link_id in (link.source_id, link.target_id)} - node_types.keys())
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Source or target nodes do not exist: {', '.join(missing)}")
+
+    rows = [link.dict() for link in links]
+    with change_follower.lock:
+        try:
+            db.execute(insert(Link), rows)
+            last_seq = record_changes(db, "link", "create", [link.id for link in links])
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(
+                status_code=400,
+                detail="A link with one of these IDs, or the same endpoints and relationship type, already exists"
+            )
+        change_follower.local(last_seq - len(links) + 1, last_seq)
+        facet_counters.apply(last_seq, links=[
+            ((link.relationship_type, node_types[link.source_id], node_types[link.target_id],
+              strength_bin(link.strength)), 1)
+            for link in links
+        ])
+        graph_version.bump()
+        for link in links:
+            graph_index.add_link(link.id, link.source_id, link.target_id, link.relationship_type, link.strength)
+
+    created = [LinkResponse(**row) for row in rows]
+    # The entries were appended in request order, ending at last_seq
+    for offset, link in enumerate(created, start=1 - len(created)):
+        link_types = sorted({node_types[link.source_id], node_types[link.target_id]})
+        publish_event(last_seq + offset, "link", "create", link.id, link_types, link.model_dump(mode="json"))
+    return LinkBatch(items=created)
 
 
 @app.delete("/api/links/{link_id}")
@@ -154,23 +1196,206 @@ def delete_link(link_id: str, db: Session = Depends(get_db)):
     if not db_link:
         raise HTTPException(status_code=404, detail="Link not found")
 
+    # An endpoint may be missing, e.g. after a node row was removed outside the API
+    node_types = endpoint_types(db, [db_link])
+    link_types = sorted({node_types.get(db_link.source_id), node_types.get(db_link.target_id)} - {None})
+    facet = (db_link.relationship_type, node_types.get(db_link.source_id), node_types.get(db_link.target_id),
+             strength_bin(db_link.strength))
     db.delete(db_link)
-    db.commit()
+    seq = record_change(db, "link", link_id, "delete")
+    with change_follower.lock:
+        db.commit()
+        change_follower.local(seq)
+        facet_counters.apply(seq, links=[(facet, -1)])
+        graph_version.bump()
+        graph_index.remove_link(link_id)
+    publish_event(seq, "link", "delete", link_id, link_types)
     return {"message": "Link deleted successfully"}
 
 
-@app.get("/api/search")
-def search_nodes(q: str, db: Session = Depends(get_db)):
-    """Search nodes by name, bio, or description"""
+@app.get("/api/search", response_model=Union[SearchPage, List[NodeResponse]])
+async def search_nodes(
+    q: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    unpaginated: bool = False,
+    fields: Optional[str] = FIELDS_QUERY,
+    view: Optional[str] = VIEW_QUERY,
+    db=Depends(get_read_db)
+):
+    """Search nodes by word prefixes in their name and text fields, best matches first
+
+    `fields` and `view` only narrow the returned nodes; every indexed field is still searched.
+    """
+    node_fields = node_projection(fields, view)
+    body = await run_db(db, lambda db: search_nodes_fts(q, limit, after, unpaginated, db, node_fields))
+    return Response(content=body, media_type="application/json")
+
+
+def search_page(node_fields: Tuple[str, ...], rows: list, next_cursor: Optional[str], unpaginated: bool,
+                ranked: bool = True) -> bytes:
+    """Encode search results; the old bare-list responses are plain nodes, without score and snippet"""
+    items = as_dicts(node_fields, rows)
+    if unpaginated:
+        return dumps(items)
+    for item, row in zip(items, rows):
+        item["score"], item["snippet"] = (-row.rank, row.snippet) if ranked else (None, None)
+    return dumps({"items": items, "next_cursor": next_cursor})
+
+
+def search_nodes_fts(q: str, limit: int, after: Optional[str], unpaginated: bool, db: Session,
+                     node_fields: Tuple[str, ...] = NODE_FIELDS) -> bytes:
+    """Ranked full-text search, falling back to the ILIKE scan without an FTS index"""
+    if not SEARCH_INDEX_ENABLED:
+        return search_nodes_ilike(q, limit, after, unpaginated, db, node_fields)
+
+    match_query = build_match_query(q)
+    if match_query is None:
+        return search_page(node_fields, [], None, unpaginated)
+
+    rank = search_score()
+    query = db.query(*node_columns(node_fields), rank.label("rank"), search_snippet().label("snippet")).join(
+        nodes_fts, nodes_fts.c.rowid == literal_column("nodes.rowid")
+    ).filter(search_match(match_query))
+    rows, next_cursor = keyset_page(query, Node.id, limit, after, unpaginated, rank=rank)
+
+    return search_page(node_fields, rows, next_cursor, unpaginated)
+
+
+def search_nodes_ilike(q: str, limit: int, after: Optional[str], unpaginated: bool, db: Session,
+                       node_fields: Tuple[str, ...] = NODE_FIELDS) -> bytes:
+    """Unranked substring search, used when the database has no full-text index"""
     search_term = f"%{q}%"
-    nodes = db.query(Node).filter(
+    query = db.query(*node_columns(node_fields)).filter(
         (Node.name.ilike(search_term)) |
         (Node.bio.ilike(search_term)) |
         (Node.description.ilike(search_term)) |
         (Node.methods.ilike(search_term))
-    ).all()
+    )
+    rows, next_cursor = keyset_page(query, Node.id, limit, after, unpaginated)
+
+    return search_page(node_fields, rows, next_cursor, unpaginated, ranked=False)
+
+
+@app.get("/api/autocomplete", response_model=Suggestions)
+async def autocomplete(
+    q: str,
+    limit: int = Query(10, ge=1, le=MAX_SUGGESTIONS),
+    index: AdjacencyIndex = Depends(get_index)
+):
+    """Node names completing `q` as it is typed, from an in-memory index over names
 
-    return [NodeResponse.from_orm(node) for node in nodes]
+    A name matches when it, or one of its later words, starts with `q`; best
+    matches come first, then the best-connected nodes. When that finds too
+    few, misspelt words in `q` are replaced by similar ones.
+    """
+    return Suggestions(q=q, items=[
+        Suggestion(id=node.id, name=node.name, type=node.type, degree=degree, match=match)
+        for node, match, degree in index.complete(q, limit)
+    ])
+
+
+def build_analytics(result: GraphMetrics, index: AdjacencyIndex, stale: bool, top: int, ids: List[str]) -> bytes:
+    rankings = {}
+    for metric in METRICS:
+        rankings[metric] = [
+            RankedNode(id=node_id, name=node.name, type=node.type, value=value)
+            for node_id, value in result.top(metric, top)
+            for node in [index.nodes.get(node_id)]
+            if node is not None
+        ]
+    return GraphAnalytics(
+        version=result.version,
+        stale=stale,
+        node_count=len(result.node_ids),
+        link_count=result.link_count,
+        component_count=len(result.component_sizes),
+        largest_component=int(result.component_sizes[0]) if len(result.component_sizes) else 0,
+        top=rankings,
+        nodes={node_id: result.node(node_id) for node_id in ids if node_id in result.position}
+    ).model_dump_json().encode()
+
+
+@app.get("/api/stats", response_model=GraphStats)
+async def get_stats(request: Request):
+    """Node counts by type, link counts by relationship type and type pair, and strength histograms
+
+    Served from counters kept in memory, or from the shared snapshot when one
+    is configured, so neither the graph nor a GROUP BY scan is needed per request.
+    """
+    await follow_other_writers()
+    snapshot = current_snapshot()
+    if snapshot is not None:
+        return snapshot_response(request, snapshot, "stats")
+    if not facet_counters.loaded:
+        await run_in_threadpool(facet_counters.ensure_loaded, fetch_facets)
+    entry = response_cache.get_or_build(("stats",), graph_version.current, lambda: dumps(facet_counters.summary()))
+    return cached_response(request, entry)
+
+
+@app.get("/api/analytics", response_model=GraphAnalytics)
+async def get_analytics(
+    request: Request,
+    top: int = Query(10, ge=1, le=100, description="Nodes to list per metric"),
+    ids: Optional[str] = Query(None, description="Comma-separated node IDs to return full metrics for"),
+    index: AdjacencyIndex = Depends(get_index)
+):
+    """Degree, weighted degree, PageRank, betweenness and components over the whole graph
+
+    Served from the most recent finished computation, so requests never wait
+    on a recompute; `stale` is true while a newer version is being computed.
+    """
+    version = graph_version.current
+    result = analytics_worker.request(version)
+    if result is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Analytics are being computed; retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    stale = result.version != version
+    requested = sorted(split_csv(ids) or ())
+    key = ("analytics", stale, top, tuple(requested))
+    entry = response_cache.get(key, result.version)
+    if entry is None:
+        entry = response_cache.put(key, result.version, build_analytics(result, index, stale, top, requested))
+    return cached_response(request, entry)
+
+
+@app.post("/api/bulk", response_model=BulkImportResult)
+def bulk_import(
+    nodes: Optional[UploadFile] = File(None, description="Nodes as JSON lines or CSV (.csv)"),
+    links: Optional[UploadFile] = File(None, description="Links as JSON lines or CSV (.csv)"),
+    chunk_size: int = Query(DEFAULT_CHUNK_SIZE, ge=1, le=10000),
+):
+    """Import nodes and links in chunked transactions, reporting per-row errors"""
+    if nodes is None and links is None:
+        raise HTTPException(status_code=400, detail="Upload a nodes and/or links file")
+
+    def text_stream(upload: Optional[UploadFile]):
+        return io.TextIOWrapper(upload.file, encoding="utf-8", newline="") if upload else None
+
+    report = import_graph(
+        engine,
+        nodes=text_stream(nodes),
+        links=text_stream(links),
+        nodes_format=detect_format(nodes.filename if nodes else None),
+        links_format=detect_format(links.filename if links else None),
+        chunk_size=chunk_size
+    )
+    if sum(report.inserted.values()):
+        with change_follower.lock:
+            change_follower.local(report.seq)
+            facet_counters.reset()
+            graph_version.bump()
+            graph_index.reset()
+        event_broker.publish(resync_event(report.seq, "reset"))
+    return BulkImportResult(
+        inserted=report.inserted,
+        failed=report.failed,
+        errors=report.errors,
+        errors_truncated=report.errors_truncated
+    )
 
 
 @app.post("/api/initialise-data")
@@ -236,7 +1461,14 @@ def initialize_data(db: Session = Depends(get_db)):
         for link in sample_links:
             db.add(link)
 
-        db.commit()
+        seq = record_resync(db)
+        with change_follower.lock:
+            db.commit()
+            change_follower.local(seq)
+            facet_counters.reset()
+            graph_version.bump()
+            graph_index.reset()
+        event_broker.publish(resync_event(seq, "reset"))
         return {"message": "Database initialized successfully!", "nodes": len(sample_nodes), "links": len(sample_links)}
 
     except Exception as e:
@@ -247,4 +1479,7 @@ def initialize_data(db: Session = Depends(get_db)):
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Each worker is a separate process with its own caches, kept in step through the change log
+    workers = int(os.environ.get("API_WORKERS", "1"))
+    uvicorn.run("run:app" if workers > 1 else app, host=os.environ.get("API_HOST", "0.0.0.0"),
+                port=int(os.environ.get("API_PORT", "8000")), workers=workers)
\ No newline at end of file
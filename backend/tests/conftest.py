@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# The engines are created when models.db is imported, so point them at a scratch
+# database before any test module imports the app
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
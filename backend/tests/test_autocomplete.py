@@ -0,0 +1,89 @@
+import random
+
+import pytest
+
+from graph.autocomplete import MATCHES, NameIndex, normalize
+
+NAMES = {
+    "1": "Mivelren River Collective",
+    "2": "River Col",
+    "3": "Riviera Colour Lab",
+    "4": "Riv Col",
+    "5": "River",
+    "6": "Colony of the River",
+}
+# Shared prefixes, so earlier query words expand to several indexed words
+WORDS = ["riv", "river", "riviera", "rivet", "col", "cola", "colony", "collective", "lab", "labour", "art", "arts"]
+
+
+def matches(key: str, query: str) -> tuple:
+    """Best (kind, start) of a name for a query, or None: each query word starts one of successive name words"""
+    words, wanted = key.split(), query.split()
+    starts = [
+        i for i in range(len(words) - len(wanted) + 1)
+        if all(words[i + j].startswith(word) for j, word in enumerate(wanted))
+    ]
+    if not starts:
+        return None
+    return 0 if key == query else 1 if starts[0] == 0 else 2
+
+
+def expected(names: dict, degrees: dict, query: str, limit: int) -> list:
+    query = normalize(query)
+    ranked = []
+    for node_id, name in names.items():
+        key = normalize(name)
+        kind = matches(key, query)
+        if kind is not None:
+            ranked.append((kind, -degrees[node_id], len(key), key, node_id))
+    return [(node_id, MATCHES[kind]) for kind, _, _, _, node_id in sorted(ranked)[:limit]]
+
+
+def complete(index: NameIndex, query: str, limit: int = 20) -> list:
+    return [(node_id, kind) for node_id, kind, _ in index.complete(query, limit) if kind != "fuzzy"]
+
+
+@pytest.fixture
+def index():
+    index = NameIndex(lambda node_id: 0)
+    index.load(NAMES.items())
+    return index
+
+
+def test_every_query_word_is_a_prefix_of_successive_name_words(index):
+    assert complete(index, "riv col") == [("4", "exact"), ("2", "prefix"), ("3", "prefix"), ("1", "word")]
+    assert complete(index, "river col") == [("2", "exact"), ("1", "word")]
+    assert complete(index, "Riv Col Lab") == [("3", "prefix")]
+    assert complete(index, "mivelren riv co") == [("1", "prefix")]
+    assert complete(index, "c o t r") == [("6", "prefix")]
+    # Words match in order, and successive query words need successive name words
+    assert complete(index, "col riv") == []
+    assert complete(index, "mivelren col") == []
+
+
+def test_multi_word_prefixes_follow_writes(index):
+    assert complete(index, "riv col") == [("4", "exact"), ("2", "prefix"), ("3", "prefix"), ("1", "word")]
+    index.upsert("7", "Rivet Colony Works")
+    index.remove("3")
+    index.upsert("2", "River Lab")
+    assert complete(index, "riv col") == [("4", "exact"), ("7", "prefix"), ("1", "word")]
+    assert complete(index, "riv l") == [("2", "prefix")]
+
+
+def test_lookups_agree_with_a_scan_of_every_name():
+    rng = random.Random(7)
+    names = {f"N{i}": " ".join(rng.choices(WORDS, k=rng.randint(1, 4))).title() for i in range(400)}
+    degrees = {node_id: rng.randint(0, 5) for node_id in names}
+    index = NameIndex(degrees.get)
+    index.load(names.items())
+
+    def query() -> str:
+        return " ".join(rng.choice(WORDS)[:rng.randint(1, 4)] for _ in range(rng.randint(1, 3)))
+
+    for step in range(300):
+        q = query()
+        assert complete(index, q, 10) == expected(names, degrees, q, 10), q
+        if step % 10 == 0:
+            node_id = rng.choice(sorted(names))
+            names[node_id] = " ".join(rng.choices(WORDS, k=rng.randint(1, 4)))
+            index.upsert(node_id, names[node_id])
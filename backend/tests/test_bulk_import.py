@@ -0,0 +1,130 @@
+import io
+import json
+
+import pytest
+from sqlalchemy import create_engine, select
+
+import bulk_import
+from bulk_import import import_graph
+from models import Link, Node
+from models.db import Base
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'import.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def jsonl(*rows) -> io.StringIO:
+    return io.StringIO("".join((row if isinstance(row, str) else json.dumps(row)) + "\n" for row in rows))
+
+
+def node(node_id: str, node_type: str = "People") -> dict:
+    return {"id": node_id, "name": f"Node {node_id}", "type": node_type}
+
+
+def link(link_id: str, source: str, target: str, relationship: str = "leads") -> dict:
+    return {"id": link_id, "source_id": source, "target_id": target, "relationship_type": relationship}
+
+
+def ids(engine, model) -> list:
+    with engine.connect() as conn:
+        return sorted(conn.execute(select(model.id)).scalars())
+
+
+def errors(report) -> list:
+    return [(e["kind"], e["line"], e["id"], e["error"]) for e in report.errors]
+
+
+def test_bad_rows_are_reported_and_the_rest_inserted(engine):
+    report = import_graph(engine, nodes=jsonl(
+        node("P1"),
+        '{"id": "P2", "name": ',
+        "[1, 2]",
+        {"id": "P3", "name": "No type"},
+        node("P1", "Projects"),
+        node("P2"),
+    ))
+
+    assert report.inserted == {"node": 2, "link": 0}
+    assert report.failed == {"node": 4, "link": 0}
+    (invalid, not_an_object, missing_type, duplicate) = errors(report)
+    assert invalid[:3] == ("node", 2, None) and invalid[3].startswith("Invalid JSON: ")
+    assert not_an_object == ("node", 3, None, "Expected a JSON object")
+    assert missing_type[:3] == ("node", 4, "P3") and missing_type[3].startswith("type: ")
+    assert duplicate == ("node", 5, "P1", "Duplicate ID in file")
+    assert ids(engine, Node) == ["P1", "P2"]
+    assert report.seq is not None
+
+
+def test_rows_conflicting_with_the_database_are_rejected(engine):
+    first = import_graph(engine, nodes=jsonl(node("P1"), node("P2")), links=jsonl(link("L1", "P1", "P2")))
+    assert first.inserted == {"node": 2, "link": 1}
+
+    report = import_graph(
+        engine,
+        nodes=jsonl(node("P2"), node("P3")),
+        links=jsonl(
+            link("L1", "P2", "P3"),  # id taken
+            link("L2", "P1", "P2"),  # same edge as L1
+            link("L3", "P1", "P9"),  # unknown target
+            link("L4", "P2", "P3"),
+            link("L5", "P2", "P3"),  # same edge as L4, earlier in the file
+            link("L6", "P1", "P2", "mentors"),
+        ),
+    )
+
+    assert report.inserted == {"node": 1, "link": 2}
+    assert errors(report) == [
+        ("node", 1, "P2", "Node with this ID already exists"),
+        ("link", 1, "L1", "Link with this ID already exists"),
+        ("link", 2, "L2", "Link with the same endpoints and relationship type already exists"),
+        ("link", 3, "L3", "Source or target node does not exist"),
+        ("link", 5, "L5", "Link with the same endpoints and relationship type already exists"),
+    ]
+    assert ids(engine, Link) == ["L1", "L4", "L6"]
+
+
+def test_nothing_inserted_records_no_resync(engine):
+    report = import_graph(engine, nodes=jsonl("not json"))
+    assert report.inserted == {"node": 0, "link": 0}
+    assert report.seq is None
+
+
+def test_chunk_conflict_falls_back_to_row_by_row(engine, monkeypatch):
+    insert = bulk_import._insert
+
+    def insert_after_another_writer(engine, table, kind, rows, report):
+        # Another writer commits P2 after the chunk was checked but before it is inserted
+        monkeypatch.setattr(bulk_import, "_insert", insert)
+        with engine.begin() as conn:
+            conn.execute(Node.__table__.insert(), node("P2", "Institutions"))
+        insert(engine, table, kind, rows, report)
+
+    monkeypatch.setattr(bulk_import, "_insert", insert_after_another_writer)
+    report = import_graph(engine, nodes=jsonl(node("P1"), node("P2"), node("P3")))
+
+    assert report.inserted == {"node": 2, "link": 0}
+    assert errors(report) == [("node", 2, "P2", "Conflicts with an existing row")]
+    assert ids(engine, Node) == ["P1", "P2", "P3"]
+    with engine.connect() as conn:
+        assert conn.execute(select(Node.type).where(Node.id == "P2")).scalar() == "Institutions"
+
+
+def test_chunks_are_checked_and_committed_independently(engine):
+    report = import_graph(
+        engine,
+        nodes=jsonl(node("P1"), node("P2"), node("P1"), node("P3")),
+        links=jsonl(link("L1", "P1", "P2"), link("L2", "P2", "P3"), link("L3", "P1", "P2")),
+        chunk_size=2,
+    )
+
+    # Duplicates in a later chunk are caught by the database checks rather than the in-file ones
+    assert errors(report) == [
+        ("node", 3, "P1", "Node with this ID already exists"),
+        ("link", 3, "L3", "Link with the same endpoints and relationship type already exists"),
+    ]
+    assert report.inserted == {"node": 3, "link": 2}
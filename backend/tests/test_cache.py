@@ -0,0 +1,37 @@
+from graph import ResponseCache
+
+
+def test_bodies_are_evicted_to_stay_within_the_byte_budget():
+    cache = ResponseCache(max_entries=10, max_bytes=100)
+    cache.put("a", 1, b"a" * 40)
+    cache.put("b", 1, b"b" * 40)
+    cache.put("c", 2, b"c" * 10)
+    assert (len(cache), cache.size) == (3, 90)
+
+    # Stale versions go first, then the oldest current ones
+    cache.put("d", 2, b"d" * 50)
+    assert cache.get("a", 1) is None and cache.get("b", 1) is None
+    assert (len(cache), cache.size) == (2, 60)
+    cache.put("e", 2, b"e" * 45)
+    assert cache.get("c", 2) is None
+    assert [cache.get(key, 2).body[:1] for key in ("d", "e")] == [b"d", b"e"]
+    assert cache.size == 95
+
+    # Replacing a key frees its old body
+    cache.put("d", 2, b"D" * 5)
+    assert (len(cache), cache.size) == (2, 50)
+
+
+def test_body_over_the_budget_is_served_but_not_kept():
+    cache = ResponseCache(max_entries=10, max_bytes=100)
+    cache.put("small", 1, b"s" * 10)
+    cache.put("big", 1, b"b" * 60)
+
+    entry = cache.put("big", 1, b"B" * 101)
+    assert entry.body == b"B" * 101 and entry.etag
+    assert cache.get("big", 1) is None
+    assert cache.get("small", 1).body == b"s" * 10
+    assert cache.size == 10
+
+    cache.discard("small")
+    assert (len(cache), cache.size) == (0, 0)
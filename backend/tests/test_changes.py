@@ -0,0 +1,155 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func
+
+import run
+from models.changes import compact_changes, latest_seq
+from models.db import Change, ReadSessionLocal, SessionLocal
+
+
+@pytest.fixture
+def client():
+    with TestClient(run.app) as client:
+        yield client
+
+
+def changes(client: TestClient, since: int) -> dict:
+    response = client.get("/api/changes", params={"since": since})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def create_node(client: TestClient, node_id: str, name: str = "Logged node"):
+    response = client.post("/api/nodes", json={"id": node_id, "name": name, "type": "Methods"})
+    assert response.status_code == 200
+
+
+def create_link(client: TestClient, link_id: str, source: str, target: str):
+    response = client.post("/api/links", json={
+        "id": link_id, "source_id": source, "target_id": target, "relationship_type": "applies"
+    })
+    assert response.status_code == 200
+
+
+def current_seq() -> int:
+    with ReadSessionLocal() as db:
+        return latest_seq(db)
+
+
+def compact(retention: int):
+    with SessionLocal() as db:
+        compact_changes(db, retention=retention)
+        db.commit()
+
+
+def logged(entity_id: str) -> int:
+    with ReadSessionLocal() as db:
+        return db.query(func.count()).select_from(Change).filter(Change.entity_id == entity_id).scalar()
+
+
+def summary(body: dict) -> tuple:
+    return (
+        [node["id"] for node in body["nodes"]],
+        [link["id"] for link in body["links"]],
+        body["deleted_nodes"],
+        body["deleted_links"],
+    )
+
+
+def test_polling_returns_each_entity_once_in_its_latest_state(client):
+    start = current_seq()
+    create_node(client, "CH-A1")
+    create_node(client, "CH-A2")
+    create_link(client, "CH-L1", "CH-A1", "CH-A2")
+
+    body = changes(client, start)
+    assert (body["since"], body["seq"], body["resync"]) == (start, current_seq(), False)
+    assert summary(body) == (["CH-A1", "CH-A2"], ["CH-L1"], [], [])
+
+    # Nothing new since the returned seq, which is the cursor for the next poll
+    cursor = body["seq"]
+    assert summary(changes(client, cursor)) == ([], [], [], [])
+    assert changes(client, cursor)["seq"] == cursor
+
+    assert client.put("/api/nodes/CH-A1", json={"name": "First rename", "type": "Methods"}).status_code == 200
+    assert client.put("/api/nodes/CH-A1", json={"name": "Second rename", "type": "Methods"}).status_code == 200
+    assert client.delete("/api/nodes/CH-A2").status_code == 200  # cascades to CH-L1
+    create_node(client, "CH-A3")
+    assert client.delete("/api/nodes/CH-A3").status_code == 200
+
+    body = changes(client, cursor)
+    assert summary(body) == (["CH-A1"], [], ["CH-A2", "CH-A3"], ["CH-L1"])
+    assert body["nodes"][0]["name"] == "Second rename"
+    # An older cursor sees the same net effect
+    assert summary(changes(client, start)) == (["CH-A1"], [], ["CH-A2", "CH-A3"], ["CH-L1"])
+
+
+def test_cursor_from_the_future_is_told_to_resync(client):
+    create_node(client, "CH-F1")
+    body = changes(client, current_seq() + 1)
+    assert body["resync"] is True
+    assert body["seq"] == current_seq()
+    assert summary(body) == ([], [], [], [])
+    assert client.get("/api/changes", params={"since": -1}).status_code == 422
+
+
+def test_compaction_keeps_the_delta_and_drops_superseded_entries(client):
+    start = current_seq()
+    create_node(client, "CH-C1")
+    for name in ("One", "Two", "Three"):
+        assert client.put("/api/nodes/CH-C1", json={"name": name, "type": "Methods"}).status_code == 200
+    create_node(client, "CH-C2")
+    assert client.delete("/api/nodes/CH-C2").status_code == 200
+    before = changes(client, start)
+    assert logged("CH-C1") == 4
+
+    compact(retention=current_seq())
+    # A write moves the graph version on, so nothing is answered from the cache
+    create_node(client, "CH-C3")
+
+    assert logged("CH-C1") == logged("CH-C2") == 1
+    after = changes(client, start)
+    assert after["resync"] is False
+    assert summary(after) == (["CH-C1", "CH-C3"], [], ["CH-C2"], [])
+    assert after["nodes"][0] == before["nodes"][0]
+
+
+def test_cursors_older_than_the_retained_log_must_resync(client):
+    create_node(client, "CH-R0")
+    old = current_seq()
+    create_node(client, "CH-R1")
+    create_node(client, "CH-R2")
+    create_node(client, "CH-R3")
+    cutoff = current_seq() - 1
+    # Keep only the last entry (CH-R3); everything up to the cutoff is truncated
+    compact(retention=1)
+    create_node(client, "CH-R4")
+
+    for since in (0, old, cutoff - 1):
+        body = changes(client, since)
+        assert body["resync"] is True, since
+        assert summary(body) == ([], [], [], [])
+
+    # The cut-off is the oldest cursor still answered with a delta
+    body = changes(client, cutoff)
+    assert body["resync"] is False
+    assert summary(body) == (["CH-R3", "CH-R4"], [], [], [])
+
+    # Having resynced, a client carries on from the seq it was given
+    resynced = changes(client, old)["seq"]
+    create_node(client, "CH-R5")
+    assert summary(changes(client, resynced)) == (["CH-R5"], [], [], [])
+
+
+def test_writes_compact_the_log_every_interval(client, monkeypatch):
+    monkeypatch.setattr("models.changes.COMPACTION_INTERVAL", 1)
+    start = current_seq()
+    create_node(client, "CH-I1")
+    for name in ("One", "Two"):
+        assert client.put("/api/nodes/CH-I1", json={"name": name, "type": "Methods"}).status_code == 200
+
+    # Each write compacted the log it appended to, leaving only the latest entry
+    assert logged("CH-I1") == 1
+    body = changes(client, start)
+    assert summary(body) == (["CH-I1"], [], [], [])
+    assert body["nodes"][0]["name"] == "Two"
@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import run
+
+
+@pytest.fixture
+def client():
+    with TestClient(run.app) as client:
+        yield client
+
+
+def wait_for_subscribers(count: int, timeout: float = 5):
+    # The handler subscribes just after accepting, which may be after websocket_connect returns
+    deadline = time.monotonic() + timeout
+    while run.event_broker.subscriber_count < count:
+        assert time.monotonic() < deadline, "subscriber did not register"
+        time.sleep(0.01)
+
+
+def create_node(client: TestClient, node_id: str, node_type: str):
+    response = client.post("/api/nodes", json={"id": node_id, "name": f"Node {node_id}", "type": node_type})
+    assert response.status_code == 200
+
+
+def test_events_follow_node_and_link_writes_of_the_subscribed_types(client):
+    with client.websocket_connect("/api/events?types=People") as websocket:
+        wait_for_subscribers(1)
+        create_node(client, "EV-I1", "Institutions")
+        create_node(client, "EV-P1", "People")
+
+        # The institution was filtered out, so the person's event comes first
+        created = websocket.receive_json()
+        assert (created["entity"], created["op"], created["id"]) == ("node", "create", "EV-P1")
+        assert created["types"] == ["People"]
+        assert created["data"]["name"] == "Node EV-P1"
+
+        response = client.put("/api/nodes/EV-P1", json={"name": "Renamed", "type": "People"})
+        assert response.status_code == 200
+        updated = websocket.receive_json()
+        assert (updated["op"], updated["id"], updated["data"]["name"]) == ("update", "EV-P1", "Renamed")
+        assert updated["seq"] > created["seq"]
+
+        # A link matches through either endpoint
+        response = client.post("/api/links", json={
+            "id": "EV-L1", "source_id": "EV-P1", "target_id": "EV-I1", "relationship_type": "mentored_by"
+        })
+        assert response.status_code == 200
+        linked = websocket.receive_json()
+        assert (linked["entity"], linked["op"], linked["id"]) == ("link", "create", "EV-L1")
+        assert linked["types"] == ["Institutions", "People"]
+
+        # Deleting the node cascades to its link, which is announced first
+        assert client.delete("/api/nodes/EV-P1").status_code == 200
+        unlinked = websocket.receive_json()
+        deleted = websocket.receive_json()
+        assert (unlinked["entity"], unlinked["op"], unlinked["id"]) == ("link", "delete", "EV-L1")
+        assert (deleted["entity"], deleted["op"], deleted["id"]) == ("node", "delete", "EV-P1")
+        assert deleted["data"] is None
+
+
+def test_overflowing_queue_is_replaced_by_one_resync(client, monkeypatch):
+    monkeypatch.setattr(run.event_broker, "max_queue", 4)
+    with client.websocket_connect("/api/events") as websocket:
+        wait_for_subscribers(1)
+        (subscription,) = run.event_broker._subscriptions
+
+        # Hold the subscriber's loop so that every offer runs before anything is sent
+        release = threading.Event()
+        subscription.loop.call_soon_threadsafe(release.wait)
+        for seq in range(1001, 1006):
+            run.publish_event(seq, "node", "update", f"EV-{seq}", ["People"])
+        release.set()
+
+        assert websocket.receive_json() == {"op": "resync", "seq": 1005, "reason": "overflow"}
+        assert subscription.dropped == 5
+
+        # The subscription carries on after the resync
+        create_node(client, "EV-P2", "People")
+        event = websocket.receive_json()
+        assert (event["op"], event["id"]) == ("create", "EV-P2")
+
+
+def test_link_delete_is_announced_with_its_endpoint_types(client):
+    create_node(client, "EV-P3", "People")
+    create_node(client, "EV-M1", "Methods")
+    response = client.post("/api/links", json={
+        "id": "EV-L2", "source_id": "EV-P3", "target_id": "EV-M1", "relationship_type": "applies"
+    })
+    assert response.status_code == 200
+
+    with client.websocket_connect("/api/events?types=Methods") as websocket:
+        wait_for_subscribers(1)
+        assert client.delete("/api/links/EV-L2").status_code == 200
+        event = websocket.receive_json()
+        assert (event["entity"], event["op"], event["id"]) == ("link", "delete", "EV-L2")
+        assert event["types"] == ["Methods", "People"]
@@ -0,0 +1,31 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import run
+from models import NodeCreate
+from models.db import SessionLocal
+
+
+@pytest.fixture
+def client():
+    with TestClient(run.app) as client:
+        yield client
+
+
+def test_write_committed_while_the_index_loads_is_not_lost(client, monkeypatch):
+    assert client.post("/api/nodes", json={"id": "IX-P1", "name": "Before", "type": "People"}).status_code == 200
+    run.graph_index.reset()
+    load = run.graph_index.load
+
+    def load_after_a_write(nodes, links):
+        # Committed after the rows were selected, while the index still drops updates
+        monkeypatch.setattr(run.graph_index, "load", load)
+        with SessionLocal() as db:
+            run.create_node(NodeCreate(id="IX-P2", name="Zwischenzug", type="People"), db)
+        load(nodes, links)
+
+    monkeypatch.setattr(run.graph_index, "load", load_after_a_write)
+    response = client.get("/api/nodes/IX-P2/subgraph")
+    assert response.status_code == 200
+    assert [node["id"] for node in response.json()["nodes"]] == ["IX-P2"]
+    assert [item["id"] for item in client.get("/api/autocomplete?q=zwisch").json()["items"]] == ["IX-P2"]
@@ -0,0 +1,92 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import IntegrityError
+
+import migrate
+from models.migrations import HEAD, MIGRATIONS, current_version, upgrade
+
+# The schema as it was before migrations: no secondary indexes, duplicate edges allowed
+BASELINE_SCHEMA = [
+    "CREATE TABLE nodes (id VARCHAR PRIMARY KEY, name VARCHAR NOT NULL, type VARCHAR NOT NULL, bio TEXT, "
+    "description TEXT, website VARCHAR, connections VARCHAR, budget VARCHAR, methods TEXT, "
+    "involved_institutions TEXT, category VARCHAR, steps TEXT, challenges TEXT, conditions TEXT, links VARCHAR)",
+    "CREATE TABLE links (id VARCHAR PRIMARY KEY, source_id VARCHAR NOT NULL REFERENCES nodes (id), "
+    "target_id VARCHAR NOT NULL REFERENCES nodes (id), relationship_type VARCHAR NOT NULL, strength FLOAT)",
+]
+
+# (id, source, target, relationship type, strength), in insertion order
+BASELINE_LINKS = [
+    ("L9", "P1", "P2", "leads", 0.2),
+    ("L2", "P1", "P2", "leads", 0.9),  # same edge as L9, inserted later
+    ("L5", "P1", "P2", "mentors", 0.5),  # same endpoints, another type
+    ("L1", "P2", "P1", "leads", 0.4),  # reversed direction is a different edge
+    ("L7", "P1", "P2", "mentors", 0.6),  # same edge as L5
+    ("L3", "P1", "P2", "leads", 0.1),  # third copy of L9
+]
+
+
+@pytest.fixture
+def baseline(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with engine.begin() as conn:
+        for statement in BASELINE_SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(text("INSERT INTO nodes (id, name, type) VALUES ('P1', 'One', 'People'), ('P2', 'Two', 'People')"))
+        for row in BASELINE_LINKS:
+            conn.execute(text("INSERT INTO links VALUES (:id, :s, :t, :r, :w)"),
+                         dict(zip(("id", "s", "t", "r", "w"), row)))
+    yield engine
+    engine.dispose()
+
+
+def run_migrate(monkeypatch, capsys, engine, *args) -> str:
+    monkeypatch.setattr(migrate, "engine", engine)
+    monkeypatch.setattr("sys.argv", ["migrate.py", *args])
+    migrate.main()
+    return capsys.readouterr().out
+
+
+def link_rows(engine) -> list:
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT id, source_id, target_id, relationship_type, strength FROM links ORDER BY rowid")).all()
+
+
+def test_upgrade_keeps_the_first_copy_of_each_duplicated_edge(baseline):
+    applied = upgrade(baseline)
+
+    assert [migration.version for migration in applied] == [migration.version for migration in MIGRATIONS]
+    assert current_version(baseline) == HEAD
+    # The earliest inserted copy survives, whatever its id or strength
+    assert link_rows(baseline) == [
+        ("L9", "P1", "P2", "leads", 0.2),
+        ("L5", "P1", "P2", "mentors", 0.5),
+        ("L1", "P2", "P1", "leads", 0.4),
+    ]
+    assert "uq_links_edge" in {index["name"] for index in inspect(baseline).get_indexes("links")}
+    with pytest.raises(IntegrityError):
+        with baseline.begin() as conn:
+            conn.execute(text("INSERT INTO links VALUES ('L8', 'P1', 'P2', 'leads', 1.0)"))
+    assert upgrade(baseline) == []
+
+
+def test_upgrade_stops_at_the_target_version(baseline):
+    upgrade(baseline, 1)
+    assert current_version(baseline) == 1
+    assert len(link_rows(baseline)) == len(BASELINE_LINKS)
+
+
+def test_status_and_stamp_report_applied_and_pending_migrations(baseline, monkeypatch, capsys):
+    status = run_migrate(monkeypatch, capsys, baseline, "status").splitlines()
+    assert [line.split()[:2] for line in status] == [[str(m.version), "pending"] for m in MIGRATIONS]
+
+    assert run_migrate(monkeypatch, capsys, baseline, "stamp", "2") == "Schema stamped at version 2\n"
+    status = run_migrate(monkeypatch, capsys, baseline, "status").splitlines()
+    assert [line.split()[1] for line in status] == ["applied", "applied", "pending"]
+    # Stamped migrations were not run, so the duplicates are still there
+    assert len(link_rows(baseline)) == len(BASELINE_LINKS)
+
+    output = run_migrate(monkeypatch, capsys, baseline, "upgrade")
+    assert output == f"Applied 1 migration(s); schema is at version {HEAD}\n"
+    status = run_migrate(monkeypatch, capsys, baseline, "status").splitlines()
+    assert [line.split()[1] for line in status] == ["applied"] * len(MIGRATIONS)
+    assert inspect(baseline).has_table("changes")
@@ -0,0 +1,102 @@
+import base64
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import run
+
+
+@pytest.fixture
+def client():
+    with TestClient(run.app) as client:
+        yield client
+
+
+def create_node(client: TestClient, node_id: str, name: str = "Paged node"):
+    response = client.post("/api/nodes", json={"id": node_id, "name": name, "type": "Projects"})
+    assert response.status_code == 200
+
+
+def walk(client: TestClient, path: str, limit: int, between_pages=None) -> list:
+    """Every id from following next_cursor to the end, calling between_pages(page number) after each page"""
+    ids, after, page = [], None, 0
+    while True:
+        params = {"limit": limit, **({"after": after} if after else {})}
+        response = client.get(path, params=params)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        assert len(body["items"]) <= limit
+        ids += [item["id"] for item in body["items"]]
+        after = body["next_cursor"]
+        if after is None:
+            return ids
+        page += 1
+        if between_pages:
+            between_pages(page)
+
+
+def cursor(key) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def test_cursors_walk_every_row_once_in_id_order(client):
+    for i in range(7):
+        create_node(client, f"PG-A{i}")
+    client.post("/api/links", json={"id": "PG-L1", "source_id": "PG-A0", "target_id": "PG-A1", "relationship_type": "x"})
+
+    everything = [node["id"] for node in client.get("/api/nodes", params={"unpaginated": True}).json()]
+    assert walk(client, "/api/nodes", 3) == sorted(everything)
+    assert walk(client, "/api/nodes", 1000) == sorted(everything)
+    links = [link["id"] for link in client.get("/api/links", params={"unpaginated": True}).json()]
+    assert walk(client, "/api/links", 1) == sorted(links)
+
+
+def test_rows_inserted_between_pages_do_not_shift_the_cursor(client):
+    for i in range(6):
+        create_node(client, f"PG-B{i}")
+    before = sorted(node["id"] for node in client.get("/api/nodes", params={"unpaginated": True}).json())
+
+    def insert(page: int):
+        if page == 1:
+            # One id sorts before every row already served, one after all of them
+            create_node(client, "0-PG-early")
+            create_node(client, "~PG-late")
+
+    ids = walk(client, "/api/nodes", 2, insert)
+    assert len(ids) == len(set(ids))
+    assert ids == sorted(ids)
+    assert "0-PG-early" not in ids
+    assert ids == sorted(before + ["~PG-late"])
+
+
+def test_search_cursor_round_trip(client):
+    for i in range(5):
+        create_node(client, f"PG-S{i}", name=f"Quillwort survey {i}")
+    ids = walk(client, "/api/search?q=quillwort", 2)
+    assert sorted(ids) == [f"PG-S{i}" for i in range(5)]
+
+
+@pytest.mark.parametrize("after", [
+    "not base64!",
+    "e30",  # unpadded
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+    base64.urlsafe_b64encode(b"not json").decode(),
+    cursor({"id": "PG-A1"}),
+    cursor([]),
+    cursor(["PG-A1", "PG-A2"]),
+    cursor([{"id": "PG-A1"}]),
+    cursor([["PG-A1"]]),
+    cursor([None]),
+])
+def test_malformed_or_tampered_cursors_are_rejected(client, after):
+    for path in ("/api/nodes", "/api/links"):
+        response = client.get(path, params={"after": after})
+        assert response.status_code == 400, (path, response.text)
+        assert response.json()["detail"] == "Invalid cursor"
+
+
+@pytest.mark.parametrize("key", [["PG-S1"], [{"rank": 1}, "PG-S1"], [-1.5, ["PG-S1"]], ["low", "PG-S1"]])
+def test_tampered_search_cursors_are_rejected(client, key):
+    response = client.get("/api/search", params={"q": "quillwort", "after": cursor(key)})
+    assert response.status_code == 400, response.text
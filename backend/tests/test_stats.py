@@ -0,0 +1,60 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+import run
+from models.db import SessionLocal
+
+
+@pytest.fixture
+def client():
+    with TestClient(run.app) as client:
+        yield client
+
+
+def reload_in_memory_state():
+    # What a restart or another writer's bulk change does: everything is rebuilt from the database
+    run.facet_counters.reset()
+    run.graph_index.reset()
+    run.graph_version.bump()
+
+
+def stats(client: TestClient) -> dict:
+    response = client.get("/api/stats")
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_deleting_a_dangling_link_keeps_the_counters_in_step(client):
+    response = client.post("/api/nodes", json={"id": "ST-P1", "name": "Anchor", "type": "People"})
+    assert response.status_code == 200
+    # Links whose endpoint row is gone can be left behind by writes made outside the API
+    with SessionLocal() as db:
+        db.execute(text(
+            "INSERT INTO links (id, source_id, target_id, relationship_type, strength) "
+            "VALUES ('ST-L1', 'ST-P1', 'ST-GONE', 'st_dangles', 0.35)"
+        ))
+        db.commit()
+    reload_in_memory_state()
+
+    before = stats(client)
+    assert before["relationship_types"]["st_dangles"] == 1
+    assert {"source_type": "People", "target_type": None, "count": 1} in before["type_pairs"]
+
+    with client.websocket_connect("/api/events") as websocket:
+        deadline = time.monotonic() + 5
+        while run.event_broker.subscriber_count < 1:
+            assert time.monotonic() < deadline, "subscriber did not register"
+            time.sleep(0.01)
+        assert client.delete("/api/links/ST-L1").status_code == 200
+        event = websocket.receive_json()
+        assert (event["entity"], event["op"], event["id"], event["types"]) == ("link", "delete", "ST-L1", ["People"])
+
+    after = stats(client)
+    assert "st_dangles" not in after["relationship_types"]
+    assert after["link_count"] == before["link_count"] - 1
+    # The counters adjusted in place agree with a rebuild from the database
+    reload_in_memory_state()
+    assert stats(client) == after
@@ -1,4 +1,4 @@
-import React, {useEffect, useRef, useState} from 'react';
+import React, {useEffect, useMemo, useRef, useState} from 'react';
 import {
     ExternalLink,
     Eye,
@@ -34,20 +34,43 @@ const RelationshipGraphApp = () => {
 
     // API state
     const [data, setData] = useState({nodes: [], links: []});
+    const [typeCounts, setTypeCounts] = useState(null); // node counts per type from /api/stats
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
     const [apiUrl, setApiUrl] = useState('http://localhost:8000');
 
+    const countsByType = useMemo(() => {
+        if (typeCounts) {
+            return typeCounts;
+        }
+        const counts = {};
+        data.nodes.forEach(n => {
+            counts[n.type] = (counts[n.type] || 0) + 1;
+        });
+        return counts;
+    }, [typeCounts, data.nodes]);
+
     const svgRef = useRef();
     const simulationRef = useRef();
 
     // API functions
     const fetchGraphData = async () => {
-        setLoading(true);
+        const shownTypes = Object.keys(visibleTypes).filter(type => visibleTypes[type]);
+        if (shownTypes.length === 0) {
+            return; // nothing to draw; getFilteredData hides what is loaded
+        }
+        // The server drops hidden types, and links to them, before sending anything
+        const query = shownTypes.length < Object.keys(visibleTypes).length
+            ? `?types=${shownTypes.map(encodeURIComponent).join(',')}`
+            : '';
+        // Only the first load blanks the page; refetches after a filter toggle swap the data in place
+        if (data.nodes.length === 0) {
+            setLoading(true);
+        }
         setError(null);
         try {
-            console.log(`Fetching data from: ${apiUrl}/api/graph-data`);
-            const response = await fetch(`${apiUrl}/api/graph-data`);
+            console.log(`Fetching data from: ${apiUrl}/api/graph-data${query}`);
+            const response = await fetch(`${apiUrl}/api/graph-data${query}`);
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
@@ -67,11 +90,20 @@ const RelationshipGraphApp = () => {
 
             console.log('Transformed data:', transformedData);
             setData(transformedData);
+
+            // Legend counts come from the server's counters; without them they are counted locally
+            try {
+                const statsResponse = await fetch(`${apiUrl}/api/stats`);
+                setTypeCounts(statsResponse.ok ? (await statsResponse.json()).node_types : null);
+            } catch (statsErr) {
+                setTypeCounts(null);
+            }
         } catch (err) {
             console.error('Error fetching graph data:', err);
             setError(`Failed to fetch data: ${err.message}`);
             // Fallback to sample data if API fails
             setData(getFallbackData());
+            setTypeCounts(null);
         } finally {
             setLoading(false);
         }
@@ -126,10 +158,10 @@ const RelationshipGraphApp = () => {
         ]
     });
 
-    // Load data on component mount
+    // Load data on component mount, and again when the visible types change
     useEffect(() => {
         fetchGraphData();
-    }, [apiUrl]);
+    }, [apiUrl, visibleTypes]);
 
     const toggleNodeType = (type) => {
         setVisibleTypes(prev => ({
@@ -546,7 +578,7 @@ const RelationshipGraphApp = () => {
                                                 )}
                                             </div>
                                             <span className="text-sm select-none">
-                        {item.type} ({data.nodes.filter(n => n.type === item.type).length})
+                        {item.type} ({countsByType[item.type] || 0})
                       </span>
                                         </div>
                                     ))}
@@ -602,7 +634,7 @@ const RelationshipGraphApp = () => {
                                             backgroundColor: '#5F5BA3'
                                         }}></div>
                                         People
-                                        ({data.nodes.filter(n => n.type === 'People' && visibleTypes.People).length})
+                                        ({visibleTypes.People ? countsByType.People || 0 : 0})
                                     </div>
                                     <div style={{flex: '1', display: 'flex', alignItems: 'center'}}>
                                         <div style={{
@@ -613,7 +645,7 @@ const RelationshipGraphApp = () => {
                                             backgroundColor: '#DC2680'
                                         }}></div>
                                         Institutions
-                                        ({data.nodes.filter(n => n.type === 'Institutions' && visibleTypes.Institutions).length})
+                                        ({visibleTypes.Institutions ? countsByType.Institutions || 0 : 0})
                                     </div>
                                     <div style={{flex: '1', display: 'flex', alignItems: 'center'}}>
                                         <div style={{
@@ -624,7 +656,7 @@ const RelationshipGraphApp = () => {
                                             backgroundColor: '#EB631A'
                                         }}></div>
                                         Projects
-                                        ({data.nodes.filter(n => n.type === 'Projects' && visibleTypes.Projects).length})
+                                        ({visibleTypes.Projects ? countsByType.Projects || 0 : 0})
                                     </div>
                                     <div style={{flex: '1', display: 'flex', alignItems: 'center'}}>
                                         <div style={{
@@ -635,7 +667,7 @@ const RelationshipGraphApp = () => {
                                             backgroundColor: '#F8AE15'
                                         }}></div>
                                         Methods
-                                        ({data.nodes.filter(n => n.type === 'Methods' && visibleTypes.Methods).length})
+                                        ({visibleTypes.Methods ? countsByType.Methods || 0 : 0})
                                     </div>
                                 </div>
 